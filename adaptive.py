@@ -0,0 +1,346 @@
+"""Adaptive question selection with an item response theory model.
+
+The chance that a learner with ability ``theta`` answers a question of
+difficulty ``b`` correctly is modelled as
+
+    P = GUESS + (1 - GUESS) / (1 + exp(b - theta))
+
+where ``GUESS`` is the chance of guessing one of four options.  After
+every answer both estimates move Elo-style towards the observed result,
+and ``AdaptiveSampler.next`` picks the question carrying the most
+information at the current ability.  That is one vectorized pass over
+the whole bank, well under a millisecond for 100k questions.
+
+``AbilityModel`` keeps the learner's ability and their adjustments to
+question difficulties between sessions.  Starting difficulties come from
+a calibration file, fitted offline from answer logs (one log per
+learner):
+
+    python adaptive.py path/to/answers.log [more logs...]
+
+NumPy is imported here, so only load this module when the adaptive mode
+is actually used.
+"""
+import argparse
+import io
+import json
+import math
+import os
+
+import numpy
+
+from answer_log import load_stats, read_log
+from question_bank import BASE_DIR
+from sampler import Sampler
+
+CALIBRATION_PATH = os.path.join(BASE_DIR, 'questions.calibration.npz')
+
+GUESS = 0.25
+# Ability steps start large and shrink as answers accumulate
+ABILITY_STEP = 0.4
+MIN_ABILITY_STEP = 0.05
+STEP_DECAY = 0.05
+DIFFICULTY_STEP = 0.1
+# last_asked value of questions not asked yet
+NEVER = -(1 << 40)
+
+
+def probability(theta, difficulty):
+    """Chance of a correct answer; works on scalars and arrays"""
+    return GUESS + (1 - GUESS) / (1 + numpy.exp(difficulty - theta))
+
+
+def information(theta, difficulty):
+    """Fisher information each question gives about ``theta``.
+
+    Computed in place on as few temporaries as possible, in the dtype of
+    ``difficulty``: this runs over the whole bank for every question.
+    """
+    difficulty = numpy.asarray(difficulty)
+    # s = 1 / (1 + exp(b - theta)), P = GUESS + (1 - GUESS) s
+    s = numpy.subtract(difficulty, difficulty.dtype.type(theta))
+    numpy.exp(s, out=s)
+    s += 1
+    numpy.reciprocal(s, out=s)
+    p = s * (1 - GUESS)
+    p += GUESS
+    # ((P - GUESS) / (1 - GUESS))^2 (1 - P) / P = s^2 (1 - GUESS)(1 - s) / P
+    info = 1 - s
+    info *= s
+    info *= s
+    info *= 1 - GUESS
+    info /= p
+    return info
+
+
+def rating(theta):
+    """Ability on the familiar Elo scale, 1500 being an average learner"""
+    return round(1500 + 400 / math.log(10) * theta)
+
+
+class AdaptiveSampler(Sampler):
+    """Asks the most informative question at the learner's current ability.
+
+    ``difficulty`` holds one estimate per question in bank order, kept
+    as float32 to halve the work per draw.  A question is not asked
+    again within ``cooldown`` draws, and excluded ones never are.
+    """
+    mode = 'adaptive'
+    cooldown = 20
+
+    def __init__(self, size, seed=None, difficulty=None, ability=0.0, answered=0):
+        super().__init__(size, seed)
+        if difficulty is None:
+            self.difficulty = numpy.zeros(size, dtype=numpy.float32)
+        else:
+            self.difficulty = numpy.array(difficulty, dtype=numpy.float32)
+        self.ability = ability
+        self.answered = answered
+        self.step = 0
+        self.last_asked = numpy.full(size, NEVER, dtype=numpy.int64)
+        self.changed = {}  # question index -> difficulty, for saving
+        self._removed = numpy.zeros(0, dtype=numpy.int64)
+
+    def exclude(self, removed):
+        super().exclude(removed)
+        self._removed = numpy.fromiter(sorted(self.removed), dtype=numpy.int64, count=len(self.removed))
+
+    def next(self):
+        if len(self._removed) >= self.size:
+            raise ValueError("every question was removed from the bank")
+        self.step += 1
+        info = information(self.ability, self.difficulty)
+        cooldown = min(self.cooldown, self.size - 1)
+        info[self.last_asked >= self.step - cooldown] = -1.0
+        # Below any question on cooldown, so removed ones are never picked
+        info[self._removed] = -numpy.inf
+        # argmax takes the first of equally informative questions (common
+        # before calibration), so search from a random starting point
+        start = self.rng.randrange(self.size)
+        index = start + int(info[start:].argmax())
+        if start:
+            before = int(info[:start].argmax())
+            if info[before] > info[index]:
+                index = before
+        self.last_asked[index] = self.step
+        return index
+
+    def grow(self, size):
+        # New questions start at average difficulty, like uncalibrated ones
+        added = size - self.size
+        if added <= 0:
+            return
+        self.difficulty = numpy.concatenate([self.difficulty, numpy.zeros(added, dtype=numpy.float32)])
+        self.last_asked = numpy.concatenate([self.last_asked, numpy.full(added, NEVER, dtype=numpy.int64)])
+        super().grow(size)
+
+    def record(self, index, correct):
+        if index in self.removed:
+            return
+        error = float(correct) - float(probability(self.ability, float(self.difficulty[index])))
+        step = max(ABILITY_STEP / (1 + STEP_DECAY * self.answered), MIN_ABILITY_STEP)
+        self.ability += step * error
+        self.difficulty[index] -= DIFFICULTY_STEP * error
+        self.changed[index] = float(self.difficulty[index])
+        self.answered += 1
+
+    def get_state(self):
+        state = super().get_state()
+        recent = numpy.flatnonzero(self.last_asked > self.step - self.cooldown)
+        state.update(ability=self.ability, answered=self.answered, step=self.step,
+                     last_asked=[[int(i), int(self.last_asked[i])] for i in recent],
+                     difficulty=[[k, v] for k, v in self.changed.items()])
+        return state
+
+    def set_state(self, state):
+        super().set_state(state)
+        self.ability = state['ability']
+        self.answered = state['answered']
+        self.step = state['step']
+        self.last_asked = numpy.full(self.size, NEVER, dtype=numpy.int64)
+        for index, step in state['last_asked']:
+            self.last_asked[index] = step
+        if len(self.difficulty) != self.size:
+            self.difficulty = numpy.zeros(self.size, dtype=numpy.float32)
+        self.changed = {k: v for k, v in state['difficulty']}
+        for index, difficulty in self.changed.items():
+            self.difficulty[index] = difficulty
+
+
+def _align(ids, keys, values, out):
+    """Copy ``values`` into ``out`` wherever ``ids`` matches ``keys``"""
+    if not len(keys):
+        return out
+    order = numpy.argsort(keys)
+    keys, values = keys[order], values[order]
+    positions = numpy.minimum(numpy.searchsorted(keys, ids), len(keys) - 1)
+    found = keys[positions] == ids
+    out[found] = values[positions[found]]
+    return out
+
+
+class AbilityModel:
+    """A learner's ability per language and their difficulty adjustments.
+
+    Saved as JSON at ``path``: ``{"ability": {language: [theta, answered]},
+    "difficulty": {language: {question id: difficulty}}}``.
+    """
+    def __init__(self, path, calibration_path=CALIBRATION_PATH):
+        self.path = path
+        self.calibration_path = calibration_path
+        self._data = None
+        self._calibration = None
+        self._samplers = {}
+
+    def _load(self):
+        if self._data is None:
+            self._data = {'ability': {}, 'difficulty': {}}
+            if os.path.exists(self.path):
+                with open(self.path, encoding='utf-8') as f:
+                    self._data.update(json.load(f))
+        return self._data
+
+    def ability(self, language):
+        return self._load()['ability'].get(language, [0.0, 0])[0]
+
+    def difficulties(self, language, questions):
+        """Difficulty of every question in ``questions``, in bank order"""
+        ids = numpy.asarray(questions.ids, dtype=numpy.int64)
+        difficulty = numpy.zeros(len(ids))
+        if self._calibration is None:
+            self._calibration = load_calibration(self.calibration_path)
+        if language in self._calibration:
+            _align(ids, *self._calibration[language], difficulty)
+        adjusted = self._load()['difficulty'].get(language, {})
+        if adjusted:
+            keys = numpy.array([int(k) for k in adjusted], dtype=numpy.int64)
+            _align(ids, keys, numpy.array(list(adjusted.values())), difficulty)
+        return difficulty
+
+    def sampler(self, language, questions, seed=None):
+        """Start an adaptive session over ``questions``"""
+        theta, answered = self._load()['ability'].get(language, [0.0, 0])
+        sampler = AdaptiveSampler(len(questions), seed, self.difficulties(language, questions),
+                                  theta, answered)
+        self._samplers[language] = (questions, sampler)
+        return sampler
+
+    def save(self):
+        """Fold the live sessions' estimates in and write the file"""
+        data = self._load()
+        for language, (questions, sampler) in self._samplers.items():
+            data['ability'][language] = [sampler.ability, sampler.answered]
+            ids = questions.ids
+            adjusted = data['difficulty'].setdefault(language, {})
+            for index, difficulty in sampler.changed.items():
+                adjusted[str(ids[index])] = round(difficulty, 4)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+
+# Offline calibration ------------------------------------------------------
+
+def load_calibration(path=CALIBRATION_PATH):
+    """Return {language: (question ids, difficulties)} from a calibration file"""
+    if not os.path.exists(path):
+        return {}
+    calibration = {}
+    with numpy.load(path) as data:
+        for name in data.files:
+            language, field = name.rsplit('.', 1)
+            if field == 'ids':
+                calibration[language] = (data[name].astype(numpy.int64),
+                                         data[f'{language}.difficulty'])
+    return calibration
+
+
+def save_calibration(calibration, path=CALIBRATION_PATH):
+    arrays = {}
+    for language, (ids, difficulty) in calibration.items():
+        arrays[f'{language}.ids'] = numpy.asarray(ids, dtype=numpy.uint32)
+        arrays[f'{language}.difficulty'] = numpy.asarray(difficulty, dtype=numpy.float64)
+    buffer = io.BytesIO()
+    numpy.savez(buffer, **arrays)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(buffer.getvalue())
+    os.replace(tmp_path, path)
+
+
+def _answer_counts(log_path):
+    """{(language, question id): [answered, correct]} for one learner's log"""
+    counts = {}
+    # Compaction folds old records into the stats file; count those too
+    stats_path = os.path.splitext(log_path)[0] + '.stats.json'
+    for key, entry in load_stats(stats_path).items():
+        language, question_id = key.rsplit('/', 1)
+        counts[(language, int(question_id))] = [entry['answered'], entry['correct']]
+    for timestamp, language, question_id, chosen, correct, latency in read_log(log_path):
+        entry = counts.setdefault((language, question_id), [0, 0])
+        entry[0] += 1
+        entry[1] += int(correct)
+    return counts
+
+
+def calibrate(log_paths, iterations=50, prior=0.5):
+    """Fit question difficulties to answer logs, one learner per log.
+
+    Abilities and difficulties are fitted jointly by Fisher scoring on
+    the aggregated (learner, question) answer counts; ``prior`` pulls
+    both towards 0 so questions with few answers stay near average.
+    """
+    items = {}
+    person, item, answered, correct = [], [], [], []
+    for number, path in enumerate(log_paths):
+        for key, (n, k) in _answer_counts(path).items():
+            person.append(number)
+            item.append(items.setdefault(key, len(items)))
+            answered.append(n)
+            correct.append(k)
+    if not items:
+        return {}
+
+    person = numpy.array(person)
+    item = numpy.array(item)
+    answered = numpy.array(answered, dtype=numpy.float64)
+    correct = numpy.array(correct, dtype=numpy.float64)
+    theta = numpy.zeros(len(log_paths))
+    difficulty = numpy.zeros(len(items))
+
+    def scores():
+        # Gradient and Fisher information of the log-likelihood per row
+        p = probability(theta[person], difficulty[item])
+        slope = (p - GUESS) * (1 - p) / (1 - GUESS)
+        return ((correct - answered * p) * slope / (p * (1 - p)),
+                answered * slope ** 2 / (p * (1 - p)))
+
+    for _ in range(iterations):
+        gradient, info = scores()
+        theta += ((numpy.bincount(person, gradient, len(theta)) - prior * theta)
+                  / (numpy.bincount(person, info, len(theta)) + prior))
+        gradient, info = scores()
+        difficulty += ((-numpy.bincount(item, gradient, len(difficulty)) - prior * difficulty)
+                       / (numpy.bincount(item, info, len(difficulty)) + prior))
+
+    calibration = {}
+    for (language, question_id), number in items.items():
+        calibration.setdefault(language, ([], []))
+        calibration[language][0].append(question_id)
+        calibration[language][1].append(difficulty[number])
+    return {language: (numpy.array(ids), numpy.array(values))
+            for language, (ids, values) in calibration.items()}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Calibrate question difficulties from answer logs")
+    parser.add_argument('logs', nargs='+', help='answers.log files, one per learner')
+    parser.add_argument('--output', default=CALIBRATION_PATH)
+    parser.add_argument('--iterations', type=int, default=50)
+    args = parser.parse_args()
+
+    calibration = calibrate(args.logs, args.iterations)
+    save_calibration(calibration, args.output)
+    for language, (ids, difficulty) in sorted(calibration.items()):
+        print(f"{language}: {len(ids)} questions, difficulty {difficulty.min():+.2f} to {difficulty.max():+.2f}")
@@ -0,0 +1,422 @@
+"""Analytics over the answer history.
+
+Answer events are kept in a columnar store: chunks of ``CHUNK_ROWS``
+events saved as one NumPy array per column, the language
+dictionary-encoded, and each chunk's time range in the manifest so time
+queries skip whole chunks.  Next to the events, rollups per question
+(answers, correct answers, option picks, time-to-answer histogram) and
+per language and day are updated with vectorized group-bys as events
+arrive, so reports read the rollups and never rescan the history.
+
+``sync`` pulls new records from answer logs.  Only what was appended
+since the last sync is read, straight into NumPy; a log that was
+compacted in between is picked up again after its newest synced record.
+Records compacted away before they were synced are not recovered, so
+sync at least as often as the log compacts (every 100k answers).
+
+    python analytics.py ~/.config/learning/answers.log --store class.analytics
+"""
+import argparse
+import json
+import os
+
+import numpy
+
+from answer_log import RECORD
+
+# Same layout as answer_log.RECORD, so logs load straight into NumPy
+LOG_DTYPE = numpy.dtype([('timestamp', '<f8'), ('language', 'S8'), ('question_id', '<u4'),
+                         ('chosen', 'i1'), ('correct', 'u1'), ('latency', '<f4')])
+assert LOG_DTYPE.itemsize == RECORD.size
+
+# Stored columns; language and source are codes into the manifest's lists
+COLUMNS = {
+    'timestamp': numpy.float64,
+    'source': numpy.uint16,
+    'language': numpy.uint8,
+    'question_id': numpy.uint32,
+    'chosen': numpy.int8,
+    'correct': numpy.uint8,
+    'latency': numpy.float32,
+}
+CHUNK_ROWS = 1 << 16
+# Questions have four options (see bank_pipeline.validate)
+OPTION_SLOTS = 4
+# Upper edges in seconds of the time-to-answer bins; the last bin is open
+LATENCY_EDGES = numpy.array([1, 2, 3, 5, 8, 13, 21, 34, 55, 89], dtype=numpy.float32)
+LATENCY_BINS = len(LATENCY_EDGES) + 1
+DAY = 86400
+VERSION = 1
+
+# Rollup columns: (slots per key, dtype).  One slot sums a weight (or
+# counts events); more slots count events per slot index.
+QUESTION_COLUMNS = {
+    'answered': (1, numpy.int64),
+    'correct': (1, numpy.int64),
+    'latency_total': (1, numpy.float64),
+    'chosen': (OPTION_SLOTS, numpy.int64),
+    'latency_hist': (LATENCY_BINS, numpy.int64),
+}
+DAY_COLUMNS = {
+    'answered': (1, numpy.int64),
+    'correct': (1, numpy.int64),
+    'latency_total': (1, numpy.float64),
+}
+
+
+def _group_key(high, low):
+    return (high.astype(numpy.uint64) << numpy.uint64(32)) | low.astype(numpy.uint64)
+
+
+class GroupTable:
+    """Running sums per integer key, grown as new keys show up"""
+    def __init__(self, columns):
+        self.columns = columns
+        self.keys = numpy.zeros(0, dtype=numpy.uint64)
+        self.values = {name: numpy.zeros((0, slots), dtype=dtype)
+                       for name, (slots, dtype) in columns.items()}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, keys, **columns):
+        """Group events by ``keys`` and add them in.
+
+        Each keyword gives a column's per-event values: weights for a
+        one-slot column (None counts events), slot indexes otherwise.
+        """
+        if not len(keys):
+            return
+        batch_keys, inverse = numpy.unique(keys, return_inverse=True)
+        merged = numpy.union1d(self.keys, batch_keys)
+        if len(merged) != len(self.keys):
+            positions = numpy.searchsorted(merged, self.keys)
+            for name, values in self.values.items():
+                grown = numpy.zeros((len(merged), values.shape[1]), dtype=values.dtype)
+                grown[positions] = values
+                self.values[name] = grown
+            self.keys = merged
+
+        groups = numpy.searchsorted(merged, batch_keys)[inverse]
+        count = len(merged)
+        for name, data in columns.items():
+            slots, dtype = self.columns[name]
+            if slots == 1:
+                sums = numpy.bincount(groups, weights=data, minlength=count)
+                self.values[name][:, 0] += sums.astype(dtype)
+            else:
+                counts = numpy.bincount(groups * slots + data, minlength=count * slots)
+                self.values[name] += counts.reshape(count, slots).astype(dtype)
+
+    def rows(self, high=None):
+        """Positions of the keys whose high half is ``high`` (all if None)"""
+        if high is None:
+            return numpy.arange(len(self.keys))
+        return numpy.flatnonzero((self.keys >> numpy.uint64(32)) == high)
+
+    def to_arrays(self, prefix):
+        arrays = {f'{prefix}.keys': self.keys}
+        arrays.update({f'{prefix}.{name}': values for name, values in self.values.items()})
+        return arrays
+
+    def load_arrays(self, prefix, data):
+        self.keys = data[f'{prefix}.keys']
+        for name in self.columns:
+            self.values[name] = data[f'{prefix}.{name}']
+
+
+def read_log_records(path, offset=0):
+    """The records of an answer log from byte ``offset`` on, as one array"""
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    # A crash mid-write can leave a partial record at the end; skip it
+    count = max(size - offset, 0) // LOG_DTYPE.itemsize
+    if not count:
+        return numpy.zeros(0, dtype=LOG_DTYPE)
+    return numpy.fromfile(path, dtype=LOG_DTYPE, count=count, offset=offset)
+
+
+def _write_atomic(path, write):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class Analytics:
+    """Columnar answer events plus the rollups reports are read from.
+
+    Everything lives in ``directory``: immutable event chunks
+    (``chunk_NNNNNN.npz``), a state file holding the rollups and the
+    unfinished chunk, and ``manifest.json``, which names them and is
+    replaced last, so a crash mid-save leaves the previous state intact.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.manifest = {
+            'version': VERSION,
+            'generation': 0,
+            'languages': [],
+            'sources': [],
+            'offsets': {},  # log path -> [bytes synced, timestamp of the last record]
+            'chunks': [],   # {'file', 'rows', 'min_time', 'max_time'}
+        }
+        self.questions = GroupTable(QUESTION_COLUMNS)
+        self.days = GroupTable(DAY_COLUMNS)
+        self.tail = {name: numpy.zeros(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+        self._load()
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.directory, 'manifest.json')
+
+    def _state_path(self, generation):
+        return os.path.join(self.directory, f'state_{generation:06d}.npz')
+
+    def _load(self):
+        if not os.path.exists(self.manifest_path):
+            return
+        with open(self.manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') != VERSION:
+            raise ValueError(f"{self.directory} holds version {manifest.get('version')} analytics")
+        self.manifest = manifest
+        with numpy.load(self._state_path(manifest['generation'])) as data:
+            self.questions.load_arrays('questions', data)
+            self.days.load_arrays('days', data)
+            self.tail = {name: data[f'tail.{name}'] for name in COLUMNS}
+
+    def save(self):
+        """Write the rollups and unfinished chunk, then switch the manifest over"""
+        os.makedirs(self.directory, exist_ok=True)
+        old = self.manifest['generation']
+        self.manifest['generation'] = old + 1
+        arrays = self.questions.to_arrays('questions')
+        arrays.update(self.days.to_arrays('days'))
+        arrays.update({f'tail.{name}': values for name, values in self.tail.items()})
+        _write_atomic(self._state_path(old + 1), lambda f: numpy.savez(f, **arrays))
+        _write_atomic(self.manifest_path,
+                      lambda f: f.write(json.dumps(self.manifest, indent=1).encode('utf-8')))
+        if os.path.exists(self._state_path(old)):
+            os.remove(self._state_path(old))
+
+    # Ingesting ------------------------------------------------------------
+
+    def _code(self, table, name):
+        names = self.manifest[table]
+        if name not in names:
+            names.append(name)
+        return names.index(name)
+
+    def add_records(self, records, source=''):
+        """Add answer log records (an array of ``LOG_DTYPE``) from ``source``"""
+        if not len(records):
+            return
+        # Only a handful of languages: one comparison pass per language
+        # beats sorting the strings
+        names = numpy.ascontiguousarray(records['language']).view(numpy.uint64)
+        language = numpy.zeros(len(records), dtype=numpy.uint8)
+        for name in numpy.unique(names):
+            text = name.tobytes().rstrip(b'\0').decode('ascii')
+            language[names == name] = self._code('languages', text)
+        columns = {
+            'timestamp': records['timestamp'],
+            'source': numpy.full(len(records), self._code('sources', source), dtype=numpy.uint16),
+            'language': language,
+            'question_id': records['question_id'],
+            'chosen': records['chosen'],
+            'correct': records['correct'],
+            'latency': records['latency'],
+        }
+        self.add(columns)
+
+    def add(self, columns):
+        """Add events given as one array per column of ``COLUMNS``"""
+        columns = {name: numpy.asarray(columns[name], dtype=dtype) for name, dtype in COLUMNS.items()}
+        self._roll_up(columns)
+
+        self.tail = {name: numpy.concatenate([self.tail[name], columns[name]]) for name in COLUMNS}
+        while len(self.tail['timestamp']) >= CHUNK_ROWS:
+            chunk = {name: values[:CHUNK_ROWS] for name, values in self.tail.items()}
+            self.tail = {name: values[CHUNK_ROWS:] for name, values in self.tail.items()}
+            self._seal(chunk)
+
+    def _seal(self, chunk):
+        # Chunks never change once written; the manifest only lists them on save
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"chunk_{len(self.manifest['chunks']):06d}.npz"
+        _write_atomic(os.path.join(self.directory, name), lambda f: numpy.savez(f, **chunk))
+        self.manifest['chunks'].append({
+            'file': name,
+            'rows': len(chunk['timestamp']),
+            'min_time': float(chunk['timestamp'].min()),
+            'max_time': float(chunk['timestamp'].max()),
+        })
+
+    def _roll_up(self, columns):
+        language = columns['language']
+        latency = columns['latency']
+        correct = columns['correct']
+        self.questions.add(
+            _group_key(language, columns['question_id']),
+            answered=None,
+            correct=correct,
+            latency_total=latency,
+            chosen=numpy.clip(columns['chosen'], 0, OPTION_SLOTS - 1).astype(numpy.intp),
+            latency_hist=numpy.searchsorted(LATENCY_EDGES, latency, side='right'),
+        )
+        day = numpy.maximum(columns['timestamp'] // DAY, 0)
+        self.days.add(_group_key(language, day), answered=None, correct=correct, latency_total=latency)
+
+    def sync(self, log_path):
+        """Add what was appended to an answer log since the last sync.
+
+        Returns the number of new records.
+        """
+        path = os.path.abspath(log_path)
+        offset, watermark = self.manifest['offsets'].get(path, [0, None])
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if offset:
+            last = read_log_records(path, offset - LOG_DTYPE.itemsize)[:1]
+            if size < offset or not len(last) or last['timestamp'][0] != watermark:
+                # Compacted since: carry on after the newest record synced
+                records = read_log_records(path)
+                records = records[records['timestamp'] > watermark]
+                offset = size - size % LOG_DTYPE.itemsize - len(records) * LOG_DTYPE.itemsize
+        records = read_log_records(path, offset)
+        self.add_records(records, path)
+        if len(records):
+            offset += len(records) * LOG_DTYPE.itemsize
+            watermark = float(records['timestamp'][-1])
+        self.manifest['offsets'][path] = [offset, watermark]
+        return len(records)
+
+    # Reports --------------------------------------------------------------
+
+    def _language_rows(self, table, language):
+        if language is None:
+            return table.rows()
+        if language not in self.manifest['languages']:
+            return numpy.zeros(0, dtype=numpy.intp)
+        return table.rows(high=self.manifest['languages'].index(language))
+
+    def question_stats(self, language=None, min_answers=1):
+        """Per-question aggregates as arrays, one entry per question answered"""
+        rows = self._language_rows(self.questions, language)
+        values = {name: column[rows] for name, column in self.questions.values.items()}
+        answered = values['answered'][:, 0]
+        keep = answered >= min_answers
+        rows, answered = rows[keep], answered[keep]
+        values = {name: column[keep] for name, column in values.items()}
+        keys = self.questions.keys[rows]
+        languages = numpy.array(self.manifest['languages'] or [''])
+        return {
+            'language': languages[(keys >> numpy.uint64(32)).astype(numpy.intp)],
+            'question_id': (keys & numpy.uint64(0xFFFFFFFF)).astype(numpy.uint32),
+            'answered': answered,
+            'accuracy': values['correct'][:, 0] / answered,
+            'mean_latency': values['latency_total'][:, 0] / answered,
+            'chosen': values['chosen'] / answered[:, None],
+            'latency_hist': values['latency_hist'],
+        }
+
+    def option_distribution(self, language, question_id):
+        """Share of answers that picked each option of one question"""
+        if language not in self.manifest['languages']:
+            return numpy.zeros(OPTION_SLOTS)
+        key = _group_key(numpy.array([self.manifest['languages'].index(language)]),
+                         numpy.array([question_id]))[0]
+        row = numpy.searchsorted(self.questions.keys, key)
+        if row == len(self.questions.keys) or self.questions.keys[row] != key:
+            return numpy.zeros(OPTION_SLOTS)
+        chosen = self.questions.values['chosen'][row]
+        return chosen / chosen.sum()
+
+    def language_trends(self, language):
+        """Daily (day, answers, accuracy, mean latency) for one language"""
+        rows = self._language_rows(self.days, language)
+        answered = self.days.values['answered'][rows, 0]
+        days = (self.days.keys[rows] & numpy.uint64(0xFFFFFFFF)).astype('datetime64[D]')
+        return {
+            'day': days,
+            'answered': answered,
+            'accuracy': self.days.values['correct'][rows, 0] / answered,
+            'mean_latency': self.days.values['latency_total'][rows, 0] / answered,
+        }
+
+    def latency_histogram(self, language=None):
+        """Time-to-answer histogram: (upper bin edges, counts)"""
+        rows = self._language_rows(self.questions, language)
+        return LATENCY_EDGES, self.questions.values['latency_hist'][rows].sum(axis=0)
+
+    def summary(self):
+        """{language: (answers, accuracy)} over the whole history"""
+        codes = (self.days.keys >> numpy.uint64(32)).astype(numpy.intp)
+        count = len(self.manifest['languages'])
+        answered = numpy.bincount(codes, self.days.values['answered'][:, 0], count)
+        correct = numpy.bincount(codes, self.days.values['correct'][:, 0], count)
+        return {language: (int(answered[i]), float(correct[i] / answered[i]) if answered[i] else 0.0)
+                for i, language in enumerate(self.manifest['languages'])}
+
+    def scan(self, columns=None, since=None, until=None):
+        """Yield the raw events chunk by chunk, as {column: array}.
+
+        Only the requested columns are read, and chunks entirely outside
+        ``[since, until)`` (Unix times) are skipped without being opened.
+        """
+        columns = list(columns or COLUMNS)
+        needed = set(columns) | ({'timestamp'} if since is not None or until is not None else set())
+        chunks = [(os.path.join(self.directory, chunk['file']), chunk) for chunk in self.manifest['chunks']]
+        for path, chunk in chunks + [(None, None)]:
+            if chunk is not None:
+                if since is not None and chunk['max_time'] < since:
+                    continue
+                if until is not None and chunk['min_time'] >= until:
+                    continue
+                with numpy.load(path) as data:
+                    values = {name: data[name] for name in needed}
+            else:
+                values = {name: self.tail[name] for name in needed}
+            if since is not None or until is not None:
+                timestamps = values['timestamp']
+                keep = numpy.ones(len(timestamps), dtype=bool)
+                if since is not None:
+                    keep &= timestamps >= since
+                if until is not None:
+                    keep &= timestamps < until
+                values = {name: column[keep] for name, column in values.items()}
+            yield {name: values[name] for name in columns}
+
+
+def report(analytics, hardest=10):
+    for language, (answered, accuracy) in sorted(analytics.summary().items()):
+        print(f"{language}: {answered} answers, {accuracy:.0%} correct")
+        trends = analytics.language_trends(language)
+        for day, count, share in list(zip(trends['day'], trends['answered'], trends['accuracy']))[-7:]:
+            print(f"  {day}  {count:6d} answers  {share:4.0%}")
+
+        stats = analytics.question_stats(language, min_answers=5)
+        for i in numpy.argsort(stats['accuracy'])[:hardest]:
+            print(f"  hard: #{stats['question_id'][i]}  {stats['accuracy'][i]:4.0%} of "
+                  f"{stats['answered'][i]}, picks {numpy.round(stats['chosen'][i], 2).tolist()}")
+
+    edges, counts = analytics.latency_histogram()
+    lower = 0
+    for edge, count in zip(list(edges) + [None], counts):
+        label = f"{lower:g}-{edge:g}s" if edge is not None else f">{lower:g}s"
+        print(f"{label:>8} {count}")
+        lower = edge
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Sync answer logs into the analytics store and report")
+    parser.add_argument('logs', nargs='+', help='answers.log files')
+    parser.add_argument('--store', help='analytics directory (default: next to the first log)')
+    args = parser.parse_args()
+
+    analytics = Analytics(args.store or os.path.join(os.path.dirname(os.path.abspath(args.logs[0])), 'analytics'))
+    added = sum(analytics.sync(path) for path in args.logs)
+    analytics.save()
+    print(f"{added} new answers synced\n")
+    report(analytics)
@@ -0,0 +1,208 @@
+"""Persistent answer history.
+
+Every answered question is appended to a binary log as a fixed-size
+record.  ``AnswerLog.record`` only appends to an in-memory buffer; a
+background writer thread flushes the buffer in batches, either when it
+is full, every ``flush_interval`` seconds, or when ``flush()`` is called
+(e.g. on a screen transition).  Nothing is fsynced per answer: the file
+is synced once per compaction and when the log is closed.
+
+Once the log grows past ``compact_after`` records, the writer thread
+rolls all but the newest ``keep_recent`` records up into per-question
+statistics kept in a JSON file next to the log.  The stats file also
+names the records it rolled up (their count and checksum); until the log
+is rewritten without them, readers skip them, and the next ``AnswerLog``
+on the file finishes the rewrite.  Rewriting the log is what commits a
+compaction, so a crash between the two files can't count answers twice.
+"""
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+
+# timestamp, language, question id, chosen option, correct, latency (s)
+RECORD = struct.Struct('<d8sIbBf')
+# Stats file entry naming the log records the last compaction rolled up
+COMPACTED = '_compacted'
+
+
+class AnswerLog:
+    """Append-only answer log with write-behind batching"""
+    def __init__(self, path, flush_interval=2.0, batch_size=256,
+                 compact_after=100000, keep_recent=10000):
+        self.path = path
+        self.stats_path = os.path.splitext(path)[0] + '.stats.json'
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.compact_after = compact_after
+        self.keep_recent = keep_recent
+
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._flushed = threading.Condition(self._lock)
+        self._pending = 0
+        self._closed = False
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._finish_compaction()
+        self._file = open(path, 'ab')
+        self._records = self._file.tell() // RECORD.size
+
+        self._thread = threading.Thread(target=self._run, name='answer-log', daemon=True)
+        self._thread.start()
+
+    def record(self, language, question_id, chosen, correct, latency):
+        """Queue one answer; never touches the disk on the calling thread"""
+        entry = (time.time(), language.encode('ascii')[:8], question_id, chosen, correct, latency)
+        with self._lock:
+            self._buffer.append(entry)
+            self._pending += 1
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def flush(self, wait=False):
+        """Ask the writer thread to flush now, optionally waiting for it"""
+        self._wake.set()
+        if wait:
+            with self._lock:
+                while self._pending and self._thread.is_alive():
+                    self._flushed.wait(0.1)
+
+    def close(self):
+        """Flush everything still buffered and stop the writer thread"""
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._thread.join()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self._write_batch()
+            if self._records > self.compact_after:
+                self._compact()
+            if self._closed:
+                self._write_batch()
+                return
+
+    def _write_batch(self):
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        if batch:
+            self._file.write(b''.join(RECORD.pack(*entry) for entry in batch))
+            self._file.flush()
+            self._records += len(batch)
+        with self._lock:
+            self._pending -= len(batch)
+            self._flushed.notify_all()
+
+    def _compact(self):
+        # Runs on the writer thread, so no batch can be written meanwhile
+        self._file.close()
+        self._finish_compaction()
+        data = _read_records(self.path)
+        split = max(len(data) // RECORD.size - self.keep_recent, 0) * RECORD.size
+        old, recent = data[:split], data[split:]
+
+        stats = load_stats(self.stats_path)
+        rollup(stats, _unpack(old))
+        stats[COMPACTED] = {'records': len(old) // RECORD.size, 'crc': zlib.crc32(old)}
+        _write_atomic(self.stats_path, json.dumps(stats).encode('utf-8'))
+        _write_atomic(self.path, recent)
+
+        self._file = open(self.path, 'ab')
+        self._records = len(recent) // RECORD.size
+
+    def _finish_compaction(self):
+        """Drop records a compaction rolled up from the log, if a crash left them"""
+        if not os.path.exists(self.path):
+            return
+        data = _read_records(self.path)
+        rolled_up = _rolled_up(self.stats_path, data)
+        if rolled_up:
+            _write_atomic(self.path, data[rolled_up:])
+
+
+def _write_atomic(path, data):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _read_records(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    # A crash mid-write can leave a partial record at the end; ignore it
+    return data[:len(data) - len(data) % RECORD.size]
+
+
+def _unpack(data):
+    for timestamp, language, question_id, chosen, correct, latency in RECORD.iter_unpack(data):
+        yield timestamp, language.rstrip(b'\0').decode('ascii'), question_id, chosen, bool(correct), latency
+
+
+def _load_json(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _rolled_up(stats_path, data):
+    """Length of the start of log ``data`` that is already counted in the stats"""
+    compacted = _load_json(stats_path).get(COMPACTED)
+    if compacted:
+        size = compacted['records'] * RECORD.size
+        if 0 < size <= len(data) and zlib.crc32(data[:size]) == compacted['crc']:
+            return size
+    return 0
+
+
+def read_log(path):
+    """Yield (timestamp, language, question id, chosen, correct, latency)
+
+    Records already rolled up into the stats file are skipped.
+    """
+    if not os.path.exists(path):
+        return
+    data = _read_records(path)
+    stats_path = os.path.splitext(path)[0] + '.stats.json'
+    yield from _unpack(data[_rolled_up(stats_path, data):])
+
+
+def load_stats(path):
+    """Load the per-question statistics written by compaction"""
+    stats = _load_json(path)
+    stats.pop(COMPACTED, None)
+    return stats
+
+
+def rollup(stats, records):
+    """Fold answer records into ``stats`` keyed by 'language/question id'"""
+    for timestamp, language, question_id, chosen, correct, latency in records:
+        entry = stats.setdefault(f'{language}/{question_id}', {
+            'answered': 0, 'correct': 0, 'latency_total': 0.0, 'chosen': [], 'last_answered': 0.0
+        })
+        entry['answered'] += 1
+        entry['correct'] += int(correct)
+        entry['latency_total'] += latency
+        chosen_counts = entry['chosen']
+        if chosen >= len(chosen_counts):
+            chosen_counts.extend([0] * (chosen + 1 - len(chosen_counts)))
+        chosen_counts[chosen] += 1
+        entry['last_answered'] = max(entry['last_answered'], timestamp)
+    return stats
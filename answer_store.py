@@ -0,0 +1,111 @@
+"""Storage backends for answers recorded by the quiz server.
+
+The server hands each backend batches of rows
+
+    (learner, timestamp, language, question id, chosen, correct, latency)
+
+from a single writer thread, so backends need no locking of their own.
+
+* ``sqlite`` (the default) keeps every learner's answers in one
+  ``answers`` table;
+* ``file`` appends to one binary answer log per learner, in the same
+  format as ``AnswerLog``, so ``python adaptive.py store/*/answers.log``
+  calibrates from them directly.
+"""
+import os
+import re
+import sqlite3
+
+from answer_log import RECORD, read_log
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    learner TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    language TEXT NOT NULL,
+    question_id INTEGER NOT NULL,
+    chosen INTEGER NOT NULL,
+    correct INTEGER NOT NULL,
+    latency REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS answers_by_learner ON answers (learner, timestamp);
+"""
+
+
+class SQLiteStore:
+    """Answers of all learners in one SQLite database"""
+    def __init__(self, path):
+        self.path = path
+        # Opened by the server's writer thread, which is the only user
+        self._db = None
+
+    def _connect(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.path)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.executescript(SCHEMA)
+        return self._db
+
+    def write(self, rows):
+        db = self._connect()
+        with db:
+            db.executemany('INSERT INTO answers VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def answers(self, learner):
+        """Yield (timestamp, language, question id, chosen, correct, latency)"""
+        rows = self._connect().execute(
+            'SELECT timestamp, language, question_id, chosen, correct, latency '
+            'FROM answers WHERE learner = ? ORDER BY timestamp', (learner,))
+        for timestamp, language, question_id, chosen, correct, latency in rows:
+            yield timestamp, language, question_id, chosen, bool(correct), latency
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+class FileStore:
+    """One ``AnswerLog``-format file per learner under ``directory``"""
+    def __init__(self, directory):
+        self.directory = directory
+
+    def log_path(self, learner):
+        # Learner names come from clients; keep them to one safe path part
+        name = re.sub(r'[^A-Za-z0-9_.-]', '_', learner).lstrip('.') or '_'
+        return os.path.join(self.directory, name, 'answers.log')
+
+    def write(self, rows):
+        batches = {}
+        for learner, timestamp, language, question_id, chosen, correct, latency in rows:
+            batches.setdefault(learner, []).append(
+                RECORD.pack(timestamp, language.encode('ascii')[:8], question_id, chosen, correct, latency))
+        # Files are only open while a batch is written: a classroom's worth
+        # of learners would otherwise run into the open file limit
+        for learner, records in batches.items():
+            path = self.log_path(learner)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'ab') as f:
+                f.write(b''.join(records))
+
+    def answers(self, learner):
+        return read_log(self.log_path(learner))
+
+    def close(self):
+        pass
+
+
+STORES = {
+    'sqlite': SQLiteStore,
+    'file': FileStore,
+}
+
+
+def open_store(kind, path):
+    """Create the ``kind`` backend storing at ``path``"""
+    try:
+        cls = STORES[kind]
+    except KeyError:
+        raise ValueError(f"unknown answer store {kind!r}") from None
+    return cls(path)
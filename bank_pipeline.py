@@ -0,0 +1,288 @@
+"""Validation and deduplication pass run when a bank is compiled.
+
+Every source question is checked for structural problems (field types,
+four distinct, non-empty options, a ``correct_index`` in range, a unique
+id) and hashed after normalization:
+
+* exact duplicates share the hash of their normalized question, option
+  set and correct option;
+* near duplicates are found with MinHash signatures over word shingles
+  (one hash per shingle, spread over signature slots), bucketed with
+  locality-sensitive hashing so only likely pairs are compared.
+
+Invalid questions and exact duplicates are left out of the compiled bank;
+near duplicates are only reported unless ``drop_near`` is set.  The
+report is written as JSON next to the bank.  Large banks are analyzed
+in parallel on a process pool.
+
+    python bank_pipeline.py --workers 8 --drop-near-duplicates
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from question_bank import BANK_PATH, COMPRESSION, SOURCE_DIR, iter_source, source_files, write_bank
+from question_generator import GENERATED_ID_BIT
+
+logger = logging.getLogger(__name__)
+
+OPTION_COUNT = 4
+# Ids are stored as 32-bit unsigned ints, and ids with the top bit set
+# belong to generated questions
+MAX_ID = GENERATED_ID_BIT - 1
+SHINGLE_SIZE = 3
+# 16 bands of 4 rows: pairs above ~0.5 similarity usually share a bucket
+BANDS = 16
+ROWS = 4
+SLOTS = BANDS * ROWS
+# Larger than any slot value, so borrowed values never equal real ones
+SPREAD = 1 << 64
+# Only the newest entries of a bucket are compared, so banks of
+# near-identical templated questions don't go quadratic
+BUCKET_LIMIT = 32
+PARALLEL_THRESHOLD = 20000
+CHUNK_SIZE = 2000
+
+WORD = re.compile(r'\w+')
+
+
+def report_path_for(bank_path):
+    return os.path.splitext(bank_path)[0] + '.report.json'
+
+
+def normalize(text):
+    return ' '.join(WORD.findall(text.lower()))
+
+
+def _is_int(value):
+    # bool is an int, but never a valid id or index
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def validate(record):
+    """Return a list of structural problems with one source record"""
+    if not isinstance(record, dict):
+        return ['is not a JSON object']
+    problems = []
+    if not _is_int(record.get('id')) or not 0 <= record['id'] <= MAX_ID:
+        problems.append(f'id must be an integer from 0 to {MAX_ID}')
+    question = record.get('question', '')
+    if not isinstance(question, str):
+        problems.append('question must be a string')
+    elif not normalize(question):
+        problems.append('question text is empty')
+    options = record.get('options', [])
+    if not isinstance(options, list) or not all(isinstance(option, str) for option in options):
+        problems.append('options must be a list of strings')
+        options = None
+    else:
+        if len(options) != OPTION_COUNT:
+            problems.append(f'has {len(options)} options, expected {OPTION_COUNT}')
+        normalized = [option.strip() for option in options]
+        if not all(normalized):
+            problems.append('has an empty option')
+        elif len(set(normalized)) != len(normalized):
+            problems.append('has duplicate options')
+    correct = record.get('correct_index')
+    if not _is_int(correct) or options is not None and not 0 <= correct < len(options):
+        problems.append(f'correct_index {correct!r} is out of range')
+    if not isinstance(record.get('explanation', ''), str):
+        problems.append('explanation must be a string')
+    return problems
+
+
+def content_hash(record):
+    """Hash of the normalized question, option set and correct option"""
+    options = record['options']
+    correct = options[record['correct_index']]
+    parts = [normalize(record['question']), *sorted(option.strip() for option in options), correct.strip()]
+    return hashlib.blake2b('\0'.join(parts).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def signature(record):
+    """MinHash signature over the word shingles of question and options.
+
+    Each shingle is hashed once; the hash picks a slot and the slot keeps
+    its smallest value.  Empty slots borrow from the next filled slot to
+    the right, so two similar questions still agree slot by slot.
+    """
+    words = normalize(' '.join([record['question'], *record['options']])).split()
+    slots = [None] * SLOTS
+    for i in range(max(len(words) - SHINGLE_SIZE + 1, 1)):
+        shingle = ' '.join(words[i:i + SHINGLE_SIZE]).encode('utf-8')
+        h = int.from_bytes(hashlib.blake2b(shingle, digest_size=8).digest(), 'little')
+        slot, value = h % SLOTS, h // SLOTS
+        if slots[slot] is None or value < slots[slot]:
+            slots[slot] = value
+
+    minhash = [0] * SLOTS
+    nearest = None
+    for i in range(2 * SLOTS - 1, -1, -1):
+        if slots[i % SLOTS] is not None:
+            nearest = i
+        if i < SLOTS:
+            minhash[i] = slots[nearest % SLOTS] + (nearest - i) * SPREAD
+    return minhash
+
+
+def similarity(first, second):
+    """Estimated Jaccard similarity of two signatures"""
+    return sum(x == y for x, y in zip(first, second)) / len(first)
+
+
+def analyze(records):
+    """Return (problems, content hash, signature) for each record.
+
+    Runs in worker processes, so it only takes and returns plain data.
+    """
+    results = []
+    for record in records:
+        problems = validate(record)
+        if problems:
+            results.append((problems, None, None))
+        else:
+            results.append((problems, content_hash(record), signature(record)))
+    return results
+
+
+class Report:
+    """Findings of one pipeline run, keyed by problem kind"""
+    def __init__(self):
+        self.questions = 0
+        self.kept = 0
+        self.invalid = []
+        self.duplicates = []
+        self.near_duplicates = []
+
+    def to_dict(self):
+        return {
+            'questions': self.questions,
+            'kept': self.kept,
+            'invalid': self.invalid,
+            'duplicates': self.duplicates,
+            'near_duplicates': self.near_duplicates,
+        }
+
+    def summary(self):
+        return (f"{self.kept} of {self.questions} questions kept: {len(self.invalid)} invalid, "
+                f"{len(self.duplicates)} duplicates, {len(self.near_duplicates)} near duplicates")
+
+
+def clean(banks, workers=None, threshold=0.8, drop_near=False):
+    """Validate and deduplicate ``(language, records)`` pairs.
+
+    Returns ``(cleaned, report)`` where ``cleaned`` is a list of
+    ``(language, kept records)``.  ``workers=None`` analyzes small banks
+    inline and large ones on a process pool; ``workers=1`` never forks.
+    """
+    banks = [(language, list(records)) for language, records in banks]
+    total = sum(len(records) for language, records in banks)
+    if workers is None:
+        workers = os.cpu_count() if total >= PARALLEL_THRESHOLD else 1
+
+    chunks = [
+        records[i:i + CHUNK_SIZE]
+        for language, records in banks
+        for i in range(0, len(records), CHUNK_SIZE)
+    ]
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            analyzed = [result for chunk in pool.map(analyze, chunks) for result in chunk]
+    else:
+        analyzed = [result for chunk in chunks for result in analyze(chunk)]
+
+    report = Report()
+    report.questions = total
+    cleaned = []
+    results = iter(analyzed)
+    for language, records in banks:
+        kept = []
+        ids = set()
+        hashes = {}
+        buckets = {}
+        signatures = {}
+        for record, (problems, digest, minhash) in zip(records, results):
+            question_id = record.get('id') if isinstance(record, dict) else None
+            # Ids of invalid records may not even be hashable
+            if not problems and question_id in ids:
+                problems = ['duplicate id']
+            if problems:
+                report.invalid.append({'language': language, 'id': question_id, 'problems': problems})
+                continue
+            ids.add(question_id)
+
+            if digest in hashes:
+                report.duplicates.append({'language': language, 'id': question_id,
+                                          'duplicate_of': hashes[digest]})
+                continue
+            hashes[digest] = question_id
+
+            near = _near_duplicate(minhash, buckets, signatures, threshold)
+            if near is not None:
+                other, score = near
+                report.near_duplicates.append({'language': language, 'id': question_id,
+                                               'similar_to': other, 'similarity': score})
+                if drop_near:
+                    continue
+            for band in range(BANDS):
+                key = (band, tuple(minhash[band * ROWS:(band + 1) * ROWS]))
+                buckets.setdefault(key, []).append(question_id)
+            signatures[question_id] = minhash
+            kept.append(record)
+        report.kept += len(kept)
+        cleaned.append((language, kept))
+    return cleaned, report
+
+
+def _near_duplicate(minhash, buckets, signatures, threshold):
+    # Only questions sharing at least one band bucket are compared
+    best = None
+    checked = set()
+    for band in range(BANDS):
+        key = (band, tuple(minhash[band * ROWS:(band + 1) * ROWS]))
+        for other in buckets.get(key, ())[-BUCKET_LIMIT:]:
+            if other in checked:
+                continue
+            checked.add(other)
+            score = similarity(minhash, signatures[other])
+            if score >= threshold and (best is None or score > best[1]):
+                best = (other, score)
+    return best
+
+
+def clean_bank(source_dir=SOURCE_DIR, bank_path=BANK_PATH, report_path=None,
+               compression=COMPRESSION, **kwargs):
+    """Compile the cleaned sources into ``bank_path`` and write the report"""
+    banks = [(language, iter_source(path)) for language, path in source_files(source_dir).items()]
+    cleaned, report = clean(banks, **kwargs)
+    write_bank(cleaned, bank_path, compression)
+
+    report_path = report_path or report_path_for(bank_path)
+    tmp_path = report_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(report.to_dict(), f, indent=2)
+    os.replace(tmp_path, report_path)
+
+    if report.invalid or report.duplicates or report.near_duplicates:
+        logger.warning("Question bank: %s (see %s)", report.summary(), report_path)
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Validate, deduplicate and compile the question bank")
+    parser.add_argument('--workers', type=int, help='worker processes (default: by bank size)')
+    parser.add_argument('--threshold', type=float, default=0.8,
+                        help='similarity above which questions count as near duplicates')
+    parser.add_argument('--drop-near-duplicates', action='store_true')
+    parser.add_argument('--report', help='report path (default: next to the bank)')
+    parser.add_argument('--compression', choices=['zlib', 'lzma', 'none'], default=COMPRESSION)
+    args = parser.parse_args()
+
+    report = clean_bank(report_path=args.report, workers=args.workers,
+                        threshold=args.threshold, drop_near=args.drop_near_duplicates,
+                        compression=None if args.compression == 'none' else args.compression)
+    print(report.summary())
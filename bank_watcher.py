@@ -0,0 +1,251 @@
+"""Hot reload of the question sources.
+
+While the app runs, ``BankWatcher`` polls the JSON Lines files in
+``questions/`` and turns every edit into a ``BankChange``: the questions
+of one language that were added, modified or removed, by id.  A changed
+file is read whole and compared with the copy kept from the previous
+poll, so reading, comparing and memory grow with the size of the file.
+The comparison skips the bytes before the first difference and after the
+last with block comparisons, at memcmp speed, and only the lines in
+between that really changed are parsed and validated; that part costs
+the same however large the bank.
+
+Changed records are checked with ``bank_pipeline.validate``; invalid ones
+are logged and skipped, which leaves the previous version of the
+question in place.  Duplicates are only caught when the bank is next
+compiled.
+
+The app lays each change over the loaded questions with
+``QuestionList.apply`` and grows the running session's sampler.  It
+keeps no search index; a tool that holds one can pass the change to
+``SearchIndex.apply``, while ``questions.index`` is rebuilt with the
+bank.  The compiled bank file itself is rebuilt from the sources at the
+next start, as usual.
+
+    python bank_watcher.py     # print changes as the sources are edited
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+
+from question_bank import SOURCE_DIR, SourceQuestion, source_files
+
+logger = logging.getLogger(__name__)
+
+INTERVAL = 1.0
+# Bytes compared at a time when looking for the changed part of a file
+BLOCK = 1 << 16
+
+
+class BankChange:
+    """Questions of one language added, modified or removed in its source"""
+    def __init__(self, language, added=None, modified=None, removed=None):
+        self.language = language
+        self.added = added or []        # SourceQuestion
+        self.modified = modified or []  # SourceQuestion
+        self.removed = removed or []    # question ids
+
+    def __bool__(self):
+        return bool(self.added or self.modified or self.removed)
+
+    def __repr__(self):
+        return (f'<BankChange {self.language}: {len(self.added)} added, '
+                f'{len(self.modified)} modified, {len(self.removed)} removed>')
+
+
+def _first_difference(old, new, limit, backwards=False):
+    """Number of bytes ``old`` and ``new`` share at their start (or end), up to ``limit``"""
+    def same(start, stop):
+        if backwards:
+            return old[len(old) - stop:len(old) - start] == new[len(new) - stop:len(new) - start]
+        return old[start:stop] == new[start:stop]
+
+    # Whole blocks are compared at memcmp speed, then the block that
+    # differs is bisected
+    start = 0
+    while start < limit:
+        stop = min(start + BLOCK, limit)
+        if not same(start, stop):
+            break
+        start = stop
+    else:
+        return limit
+    while stop - start > 1:
+        middle = (start + stop) // 2
+        if same(start, middle):
+            start = middle
+        else:
+            stop = middle
+    return start
+
+
+def _lines(data):
+    return [line for line in (line.strip() for line in data.split(b'\n')) if line]
+
+
+def diff(language, old, new):
+    """Return the ``BankChange`` between two versions of a source file"""
+    limit = min(len(old), len(new))
+    prefix = _first_difference(old, new, limit)
+    suffix = _first_difference(old, new, limit - prefix, backwards=True)
+    # Widen the changed part to whole lines; the bytes widened over are
+    # the same in both versions
+    start = old.rfind(b'\n', 0, prefix) + 1
+    end = old.find(b'\n', len(old) - suffix)
+    extra = suffix if end < 0 else end - (len(old) - suffix)
+    old_lines = _lines(old[start:len(old) - suffix + extra])
+    new_lines = _lines(new[start:len(new) - suffix + extra])
+
+    # Lines that merely moved are left alone
+    unchanged = set(old_lines).intersection(new_lines)
+    old_ids = set()
+    for line in old_lines:
+        if line not in unchanged:
+            try:
+                old_ids.add(json.loads(line)['id'])
+            except (ValueError, KeyError, TypeError):
+                pass  # was never in the bank
+
+    # Imported here as bank_pipeline imports question_bank
+    from bank_pipeline import validate
+
+    change = BankChange(language)
+    kept = set()
+    for line in new_lines:
+        if line in unchanged:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            logger.warning("%s: skipped a line that is not JSON (%s)", language, e)
+            continue
+        if not isinstance(record, dict):
+            logger.warning("%s: skipped a line that is not a JSON object", language)
+            continue
+        problems = validate(record)
+        if problems:
+            logger.warning("%s question %r skipped: %s", language, record.get('id'), '; '.join(problems))
+            if isinstance(record.get('id'), int):
+                # The previous version of the question stays
+                kept.add(record['id'])
+            continue
+        question = SourceQuestion(language, record)
+        (change.modified if question.id in old_ids else change.added).append(question)
+        kept.add(question.id)
+    change.removed = sorted(old_ids - kept)
+    return change
+
+
+class BankWatcher:
+    """Polls the source files on a background thread and reports their changes.
+
+    ``bind_change`` callbacks run on the watcher thread with every
+    non-empty ``BankChange``; the app hands them to the UI thread.
+    """
+    def __init__(self, source_dir=SOURCE_DIR, interval=INTERVAL):
+        self.source_dir = source_dir
+        self.interval = interval
+        self._sources = {}  # language -> ((mtime, size), contents)
+        self._callbacks = []
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='bank-watcher', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._closed.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def bind_change(self, callback):
+        """Call ``callback(change)`` for every change to the sources"""
+        self._callbacks.append(callback)
+
+    def _files(self):
+        if not os.path.isdir(self.source_dir):
+            # Shipped without sources: nothing to watch
+            return {}
+        return source_files(self.source_dir)
+
+    @staticmethod
+    def _read(path):
+        """Return (stat key, contents) of a file that isn't being written, or None"""
+        try:
+            stat = os.stat(path)
+            with open(path, 'rb') as f:
+                data = f.read()
+            after = os.stat(path)
+        except OSError:
+            return None
+        key = (stat.st_mtime_ns, stat.st_size)
+        if key != (after.st_mtime_ns, after.st_size) or len(data) != stat.st_size:
+            return None  # caught mid-write; read it on the next poll
+        return key, data
+
+    def snapshot(self):
+        """Take the sources as they are now as the starting point"""
+        self._sources = {}
+        for language, path in self._files().items():
+            source = self._read(path)
+            if source is not None:
+                self._sources[language] = source
+
+    def poll(self):
+        """Look at the sources once; returns the changes since the last look"""
+        changes = []
+        files = self._files()
+        for language in sorted(set(files) | set(self._sources)):
+            key, old = self._sources.get(language, (None, b''))
+            if language in files:
+                try:
+                    stat = os.stat(files[language])
+                except OSError:
+                    continue
+                if (stat.st_mtime_ns, stat.st_size) == key:
+                    continue
+                source = self._read(files[language])
+                if source is None:
+                    continue
+                self._sources[language] = source
+                new = source[1]
+            else:
+                del self._sources[language]
+                new = b''
+            change = diff(language, old, new)
+            if change:
+                changes.append(change)
+        return changes
+
+    def _run(self):
+        self.snapshot()
+        while not self._closed.wait(self.interval):
+            try:
+                changes = self.poll()
+            except Exception:
+                logger.exception("Could not reload the question sources")
+                continue
+            for change in changes:
+                for callback in list(self._callbacks):
+                    callback(change)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Print changes to the question sources as they happen")
+    parser.add_argument('--interval', type=float, default=INTERVAL)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    watcher = BankWatcher(interval=args.interval)
+    watcher.snapshot()
+    try:
+        while True:
+            time.sleep(args.interval)
+            for change in watcher.poll():
+                print(change)
+    except KeyboardInterrupt:
+        pass
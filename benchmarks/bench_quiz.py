@@ -0,0 +1,402 @@
+"""Headless benchmarks for the quiz app.
+
+Measures startup to the first frame of the language screen, question bank
+load time, memory, file size and random question reads for several bank
+sizes, adaptive question selection
+over a 100k bank, the load_question plus check_answer round trip, the
+latency from tapping Next to the next question being rendered, and how
+many widgets a quiz session leaves behind.  Results are written as JSON and compared against a stored
+baseline; any metric that got worse than the allowed tolerance makes the
+run exit with status 1.
+
+    python benchmarks/bench_quiz.py                    # run and compare
+    python benchmarks/bench_quiz.py --update-baseline  # accept results
+    python benchmarks/bench_quiz.py --sizes 400 10000  # skip the 1M bank
+
+No display is needed: SDL's offscreen video driver is used unless
+SDL_VIDEODRIVER is already set.
+"""
+import argparse
+import gc
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+APP_PATH = os.path.join(ROOT_DIR, 'programing quiz.py')
+BASELINE_PATH = os.path.join(BENCH_DIR, 'baseline.json')
+RESULTS_PATH = os.path.join(BENCH_DIR, 'results.json')
+
+DEFAULT_SIZES = [400, 10000, 1000000]
+ADAPTIVE_SIZE = 100000
+# Random question reads per bank size
+FETCHES = 500
+# Clock frames that pass while the result popup is read, before Next
+FRAMES_BEFORE_NEXT = 10
+DEFAULT_TOLERANCE = 1.5
+# Differences below these are noise, whatever the ratio to the baseline
+NOISE_FLOOR = {'ms': 1.0, 'us': 50.0, 'KiB': 64.0}
+
+sys.path.insert(0, ROOT_DIR)
+
+
+def headless_env():
+    os.environ.setdefault('SDL_VIDEODRIVER', 'offscreen')
+    os.environ.setdefault('KIVY_NO_ARGS', '1')
+    os.environ.setdefault('KIVY_NO_CONSOLELOG', '1')
+    os.environ.setdefault('KIVY_NO_FILELOG', '1')
+    # Don't sleep between frames when the benchmark ticks the clock
+    os.environ.setdefault('KCFG_GRAPHICS_MAXFPS', '0')
+
+
+def load_app_module():
+    """Import 'programing quiz.py', whose file name is not importable"""
+    spec = importlib.util.spec_from_file_location('programing_quiz', APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def metric(value, unit, better='lower'):
+    return {'value': value, 'unit': unit, 'better': better}
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+# Startup -----------------------------------------------------------------
+
+def probe_startup(data_dir):
+    """Run in a fresh process: time import and the first drawn frame"""
+    start = time.perf_counter()
+    headless_env()
+    app_module = load_app_module()
+    imported = time.perf_counter()
+
+    from kivy.core.window import Window
+
+    class BenchApp(app_module.LearningApp):
+        user_data_dir = data_dir
+
+    app = BenchApp()
+    timings = {}
+
+    def first_frame(*args):
+        if 'first_frame' not in timings:
+            timings['first_frame'] = time.perf_counter()
+            app.stop()
+
+    Window.bind(on_flip=first_frame)
+    app.run()
+    print(json.dumps({
+        'import_s': imported - start,
+        'first_frame_s': timings['first_frame'] - start,
+    }))
+
+
+def bench_startup(runs):
+    # Compile the bank up front so startup measures a warm install
+    from question_bank import open_bank
+    open_bank()
+
+    samples = []
+    with tempfile.TemporaryDirectory() as data_dir:
+        for _ in range(runs):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--probe-startup', data_dir],
+                check=True, capture_output=True, text=True
+            ).stdout
+            samples.append(json.loads(output.strip().splitlines()[-1]))
+    return {
+        'startup.import': metric(statistics.median(s['import_s'] for s in samples) * 1000, 'ms'),
+        'startup.first_frame': metric(statistics.median(s['first_frame_s'] for s in samples) * 1000, 'ms'),
+    }
+
+
+# Question bank -----------------------------------------------------------
+
+def synthetic_records(count):
+    for i in range(count):
+        yield {
+            'id': i + 1,
+            'question': f'Synthetic question {i + 1} - What is {i} + 1?',
+            'options': [str(i + 1), str(i), str(i + 2), str(i - 1)],
+            'correct_index': 0,
+            'explanation': f'Adding one to {i} gives {i + 1}, the next integer.',
+        }
+
+
+def bench_bank(size, work_dir):
+    from question_bank import QuestionBank, write_bank
+
+    path = os.path.join(work_dir, f'bank_{size}.bank')
+    start = time.perf_counter()
+    write_bank([('python', synthetic_records(size))], path)
+    compile_s = time.perf_counter() - start
+
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    bank = QuestionBank(path)
+    questions = bank.load('python')
+    # Touch both ends so the first and last pages are really mapped
+    questions[0].question
+    questions[len(questions) - 1].explanation
+    load_s = time.perf_counter() - start
+    heap = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    # Reading questions all over the bank, as a sampler would: mostly
+    # chunks that aren't decompressed yet
+    import random
+    rng = random.Random(0)
+    fetches = []
+    for _ in range(FETCHES):
+        start = time.perf_counter()
+        question = questions[rng.randrange(size)]
+        question.question
+        question.options
+        question.explanation
+        fetches.append(time.perf_counter() - start)
+    del questions, bank
+
+    return {
+        f'bank.{size}.compile': metric(compile_s * 1000, 'ms'),
+        f'bank.{size}.load': metric(load_s * 1000, 'ms'),
+        f'bank.{size}.load_heap': metric(heap / 1024, 'KiB'),
+        f'bank.{size}.file': metric(os.path.getsize(path) / 1024, 'KiB'),
+        f'bank.{size}.fetch.p50': metric(percentile(fetches, 0.5) * 1e6, 'us'),
+    }
+
+
+# Adaptive selection ------------------------------------------------------
+
+def bench_adaptive(size, draws=200):
+    import random
+    import numpy
+    from adaptive import AdaptiveSampler, probability
+
+    difficulty = numpy.random.default_rng(0).normal(0, 1.5, size)
+    sampler = AdaptiveSampler(size, seed=0, difficulty=difficulty)
+    rng = random.Random(0)
+    latencies = []
+    for _ in range(draws):
+        start = time.perf_counter()
+        index = sampler.next()
+        sampler.record(index, rng.random() < probability(1.0, difficulty[index]))
+        latencies.append(time.perf_counter() - start)
+    return {
+        f'adaptive.{size}.select.p50': metric(percentile(latencies, 0.5) * 1e6, 'us'),
+    }
+
+
+# Quiz screen -------------------------------------------------------------
+
+def build_quiz(data_dir):
+    from kivy.uix.screenmanager import ScreenManager
+    from answer_log import AnswerLog
+    from question_bank import open_bank
+    from question_generator import QuestionGenerator
+    from quiz_screen import QuizScreen
+    from session_snapshot import SnapshotWriter
+    from widgets import WidgetPool
+
+    sm = ScreenManager()
+    sm.questions = open_bank()
+    sm.sampler_mode = 'shuffle'
+    sm.generator = QuestionGenerator()
+    sm.widget_pool = WidgetPool()
+    sm.answer_log = AnswerLog(os.path.join(data_dir, 'answers.log'))
+    sm.ability = None
+    sm.ability_path = os.path.join(data_dir, 'ability.json')
+    sm.quiz_client = None
+    sm.snapshots = SnapshotWriter(os.path.join(data_dir, 'session.snapshot'))
+    sm.resume = None
+    sm.current_language = 'python'
+    sm.add_widget(QuizScreen(name='quiz'))
+    quiz = sm.get_screen('quiz')
+    quiz.on_enter()
+    return sm, quiz
+
+
+def count_widgets():
+    from kivy.uix.widget import Widget
+    gc.collect()
+    return sum(1 for obj in gc.get_objects() if isinstance(obj, Widget))
+
+
+def play_session(quiz, rounds):
+    """Answer a whole session.
+
+    Returns the check_answer + load_question round trips and the times
+    from tapping Next to the next question being rendered.  The clock
+    runs a few frames in between, as it does while the result is read.
+    """
+    from kivy.clock import Clock
+
+    latencies = []
+    taps = []
+    for i in range(rounds):
+        start = time.perf_counter()
+        quiz.check_answer(quiz.option_buttons[i % 4])
+        answered = time.perf_counter()
+        for _ in range(FRAMES_BEFORE_NEXT):
+            Clock.tick()
+
+        # What next_question does, without the dismiss animation
+        tapped = time.perf_counter()
+        quiz.result_popup.dismiss(animation=False)
+        for btn in quiz.option_buttons:
+            btn.disabled = False
+        quiz.load_question()
+        loaded = time.perf_counter()
+        Clock.tick()  # The frame that renders the question's labels
+        shown = time.perf_counter()
+        latencies.append(answered - start + loaded - tapped)
+        taps.append(shown - tapped)
+    return latencies, taps
+
+
+def bench_quiz(rounds, sessions):
+    from session_snapshot import load as load_snapshot, restore
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        sm, quiz = build_quiz(data_dir)
+
+        latencies = []
+        taps = []
+        play_session(quiz, quiz.max_questions)  # Warm up
+        quiz.show_final_score()
+        quiz.final_view.dismiss(animation=False)
+        widgets_before = count_widgets()
+
+        # The next question is only prefetched while the session goes on
+        quiz.max_questions = rounds
+        for _ in range(sessions):
+            quiz.restart_quiz()
+            session_latencies, session_taps = play_session(quiz, rounds)
+            latencies += session_latencies
+            taps += session_taps
+            quiz.show_final_score()
+            quiz.final_view.dismiss(animation=False)
+        widgets_after = count_widgets()
+
+        # Saving the round on pause, and reading it back on launch
+        quiz.restart_quiz()
+        play_session(quiz, rounds // 2)
+        saves = []
+        restores = []
+        path = sm.snapshots.path
+        for _ in range(200):
+            start = time.perf_counter()
+            quiz.save_snapshot()
+            saves.append(time.perf_counter() - start)
+            sm.snapshots.wait()
+            session = quiz.local_session('python')
+            start = time.perf_counter()
+            restore(load_snapshot(path), session, sm.questions['python'], sm.generator)
+            restores.append(time.perf_counter() - start)
+
+        sm.answer_log.close()
+        sm.snapshots.close()
+
+    return {
+        'quiz.round_trip.p50': metric(percentile(latencies, 0.5) * 1e6, 'us'),
+        'quiz.round_trip.p95': metric(percentile(latencies, 0.95) * 1e6, 'us'),
+        'quiz.next_question.p50': metric(percentile(taps, 0.5) * 1e6, 'us'),
+        'quiz.next_question.p95': metric(percentile(taps, 0.95) * 1e6, 'us'),
+        'quiz.widgets_per_session': metric(widgets_before, 'count'),
+        'quiz.widget_growth': metric((widgets_after - widgets_before) / sessions, 'count'),
+        'quiz.snapshot_save.p50': metric(percentile(saves, 0.5) * 1e6, 'us'),
+        'quiz.snapshot_restore.p50': metric(percentile(restores, 0.5) * 1e6, 'us'),
+    }
+
+
+# Baseline ----------------------------------------------------------------
+
+def compare(results, baseline, tolerance):
+    """Return a message for every metric that regressed past the baseline"""
+    regressions = []
+    for name, base in baseline.items():
+        if name not in results:
+            continue
+        value = results[name]['value']
+        noise = NOISE_FLOOR.get(base['unit'], 0.0)
+        if base['unit'] == 'count':
+            worse = value > base['value']
+        elif base.get('better', 'lower') == 'lower':
+            worse = value > base['value'] * tolerance and value - base['value'] > noise
+        else:
+            worse = value < base['value'] / tolerance and base['value'] - value > noise
+        if worse:
+            regressions.append(f"{name}: {value:.3f} {base['unit']} (baseline {base['value']:.3f})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='question bank sizes to benchmark')
+    parser.add_argument('--startup-runs', type=int, default=3)
+    parser.add_argument('--rounds', type=int, default=200,
+                        help='questions answered per measured session')
+    parser.add_argument('--sessions', type=int, default=5)
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='allowed slowdown factor before a metric counts as a regression')
+    parser.add_argument('--output', default=RESULTS_PATH)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--probe-startup', metavar='DATA_DIR', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.probe_startup:
+        probe_startup(args.probe_startup)
+        return 0
+
+    headless_env()
+    results = {}
+    results.update(bench_startup(args.startup_runs))
+    with tempfile.TemporaryDirectory() as work_dir:
+        for size in args.sizes:
+            results.update(bench_bank(size, work_dir))
+    results.update(bench_adaptive(ADAPTIVE_SIZE))
+    load_app_module()  # Sets up the window the same way the app does
+    results.update(bench_quiz(args.rounds, args.sessions))
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    for name, result in sorted(results.items()):
+        print(f"{name:32} {result['value']:12.3f} {result['unit']}")
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare against; run with --update-baseline")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("\nREGRESSIONS against baseline:")
+        for message in regressions:
+            print(f"  {message}")
+        return 1
+    print("\nNo regressions against baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,223 @@
+"""Simulated classroom load on the quiz flow.
+
+Runs thousands of virtual users through ``QuizSession`` at once, without
+a display.  Each user answers correctly with probability ``--accuracy``
+and thinks for an exponentially distributed time (``--think-time``
+seconds on average) before every answer and before moving on.  Think
+time passes on a virtual clock: users act in the order they would in a
+real classroom, but nobody actually waits, so a run only takes as long
+as the quiz logic needs.
+
+Reports throughput, latency percentiles of loading a question and of
+answering one, memory growth and Kivy widgets left behind.  With
+``--screen-sessions`` some sessions are also played through a headless
+QuizScreen, where widgets could leak.
+
+    python benchmarks/simulate_users.py --users 5000 --sessions 3
+    python benchmarks/simulate_users.py --accuracy 0.9 --mode adaptive --screen-sessions 20
+"""
+import argparse
+import gc
+import heapq
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from bench_quiz import build_quiz, count_widgets, headless_env, load_app_module, percentile
+
+
+class VirtualClock:
+    """Time as the simulated users see it"""
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class VirtualUser:
+    """One simulated learner playing ``sessions`` quiz sessions in a row"""
+    def __init__(self, session, rng, accuracy, think_time, sessions):
+        self.session = session
+        self.rng = rng
+        self.accuracy = accuracy
+        self.think_time = think_time
+        self.sessions_left = sessions
+        self.option_count = 0
+
+    def think(self):
+        return self.rng.expovariate(1 / self.think_time) if self.think_time > 0 else 0.0
+
+    def choose(self, question, option_count):
+        correct = question.correct_index
+        if self.rng.random() < self.accuracy:
+            return correct
+        return (correct + self.rng.randrange(1, option_count)) % option_count
+
+
+def percentiles(name, samples):
+    return {
+        f'{name}.p50_us': percentile(samples, 0.5) * 1e6,
+        f'{name}.p95_us': percentile(samples, 0.95) * 1e6,
+        f'{name}.p99_us': percentile(samples, 0.99) * 1e6,
+    }
+
+
+def simulate(bank, users, sessions, accuracy, think_time, mode='shuffle',
+             max_questions=10, answer_log=None, seed=0):
+    """Play every user's sessions on the engine, interleaved by virtual time"""
+    from question_generator import QuestionGenerator
+    from quiz_session import QuizSession
+    from sampler import make_sampler
+
+    clock = VirtualClock()
+    generator = QuestionGenerator()
+    languages = bank.languages
+    rng = random.Random(seed)
+
+    # (virtual time, sequence, user, action); the sequence keeps ties in order
+    events = []
+    for number in range(users):
+        language = languages[number % len(languages)]
+        questions = bank[language]
+        sampler = make_sampler(mode, len(questions), seed=rng.getrandbits(32))
+        session = QuizSession(language, questions, sampler, generator, answer_log,
+                              max_questions, clock=clock)
+        user = VirtualUser(session, random.Random(rng.getrandbits(32)), accuracy,
+                           think_time, sessions)
+        events.append((user.think(), number, user, 'load'))
+    heapq.heapify(events)
+    sequence = users
+
+    loads = []
+    answers = []
+    start = time.perf_counter()
+    while events:
+        clock.now, _, user, action = heapq.heappop(events)
+        session = user.session
+        if action == 'load':
+            began = time.perf_counter()
+            index, question, text, options = session.load_question()
+            loads.append(time.perf_counter() - began)
+            user.option_count = len(options)
+            action = 'answer'
+        else:
+            began = time.perf_counter()
+            session.answer(user.choose(session.current_question, user.option_count))
+            session.prefetch()
+            answers.append(time.perf_counter() - began)
+            action = 'load'
+            if session.finished:
+                user.sessions_left -= 1
+                if not user.sessions_left:
+                    continue
+                session.restart()
+        sequence += 1
+        heapq.heappush(events, (clock.now + user.think(), sequence, user, action))
+    elapsed = time.perf_counter() - start
+
+    results = {
+        'users': users,
+        'answers': len(answers),
+        'wall_s': elapsed,
+        'virtual_s': clock.now,
+        'answers_per_s': len(answers) / elapsed if elapsed else 0.0,
+    }
+    results.update(percentiles('load_question', loads))
+    results.update(percentiles('answer', answers))
+    return results
+
+
+def play_screen(quiz, sessions, accuracy, seed=0):
+    """Play sessions through a headless QuizScreen, the way taps would"""
+    from kivy.clock import Clock
+
+    user = VirtualUser(None, random.Random(seed), accuracy, 0.0, sessions)
+    for _ in range(sessions):
+        quiz.on_enter()
+        while True:
+            question = quiz.session.current_question
+            quiz.check_answer(quiz.option_buttons[user.choose(question, len(quiz.option_buttons))])
+            Clock.tick()
+            # The popup's fade-out runs on the real clock; skip it
+            quiz.result_popup.dismiss(animation=False)
+            if quiz.session.finished:
+                quiz.next_question(None)
+                quiz.final_view.dismiss(animation=False)
+                break
+            quiz.next_question(None)
+            Clock.tick()
+        quiz.on_leave()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--sessions', type=int, default=3, help='sessions each user plays')
+    parser.add_argument('--questions', type=int, default=10, help='questions per session')
+    parser.add_argument('--accuracy', type=float, default=0.7,
+                        help='chance that a user answers correctly')
+    parser.add_argument('--think-time', type=float, default=5.0,
+                        help='mean seconds a user thinks before each step')
+    parser.add_argument('--mode', default='shuffle', help='sampler mode')
+    parser.add_argument('--screen-sessions', type=int, default=0,
+                        help='sessions also played through a headless QuizScreen')
+    parser.add_argument('--no-log', action='store_true', help='do not write an answer log')
+    parser.add_argument('--no-trace', action='store_true',
+                        help='skip memory tracing, which slows the run down')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='also write the results as JSON')
+    args = parser.parse_args()
+
+    headless_env()
+    load_app_module()  # Sets up the window the same way the app does
+    from answer_log import AnswerLog
+    from question_bank import open_bank
+
+    bank = open_bank()
+    widgets_before = count_widgets()
+    if not args.no_trace:
+        tracemalloc.start()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        answer_log = None if args.no_log else AnswerLog(os.path.join(data_dir, 'answers.log'))
+        results = simulate(bank, args.users, args.sessions, args.accuracy, args.think_time,
+                           args.mode, args.questions, answer_log, args.seed)
+        if answer_log is not None:
+            answer_log.close()
+        # Everything the users held is gone now; what is left leaked
+        del answer_log
+        gc.collect()
+        if not args.no_trace:
+            memory_after, memory_peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results['memory_growth_kib'] = memory_after / 1024
+            results['memory_peak_kib'] = memory_peak / 1024
+        results['leaked_widgets'] = count_widgets() - widgets_before
+
+        if args.screen_sessions:
+            sm, quiz = build_quiz(data_dir)
+            sm.sampler_mode = args.mode
+            # The first sessions build the popups the screen keeps for reuse
+            play_screen(quiz, args.screen_sessions, args.accuracy, args.seed)
+            widgets_before = count_widgets()
+            play_screen(quiz, args.screen_sessions, args.accuracy, args.seed + 1)
+            results['screen_sessions'] = 2 * args.screen_sessions
+            results['screen_leaked_widgets'] = count_widgets() - widgets_before
+            sm.answer_log.close()
+            sm.snapshots.close()
+
+    for name, value in results.items():
+        print(f"{name:24} {value:14.3f}" if isinstance(value, float) else f"{name:24} {value:14}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
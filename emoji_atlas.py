@@ -0,0 +1,335 @@
+"""Emoji drawn from a texture atlas.
+
+Rendering an emoji as label text costs a texture per label.  Instead,
+emoji are rasterized once per cell size (``BUCKETS``, so every screen
+density gets crisp glyphs) into a page: one texture of ``GRID`` x
+``GRID`` cells.  ``EmojiBatch`` draws any number of emoji as a single
+mesh over that texture, so a screen full of emoji is one draw call and
+one texture bind.
+
+Cells are handed out in order and never move: adding emoji rasterizes
+and uploads only their own cells.  Emoji are rasterized as they are
+first drawn; once a page is in use, the rest of the ``EMOJI`` set
+follows a few per frame, so no frame pays for the whole set.  Pages are
+saved to ``emoji_atlas.directory`` (the app's data directory) and loaded
+from there, before anything is rasterized, while the emoji font stays
+the same.
+
+Emoji need a color emoji font: the system's is found in ``FONT_PATHS``,
+or set ``QUIZ_EMOJI_FONT``.  Without one, nothing is drawn.
+"""
+import json
+import os
+import struct
+import zlib
+
+from kivy.clock import Clock
+from kivy.core.text import Label as CoreLabel
+from kivy.graphics import Color, InstructionGroup, Mesh
+from kivy.graphics.texture import Texture
+from kivy.logger import Logger
+from kivy.metrics import dp
+from kivy.properties import ListProperty, NumericProperty
+from kivy.uix.widget import Widget
+
+from emoji_index import EMOJI
+
+# Cell sizes in pixels; emoji are drawn from the smallest at least as large
+BUCKETS = (32, 48, 64, 96, 128)
+# Cells per side of a page
+GRID = 16
+# Glyph size relative to the cell, leaving room for the font's line height
+GLYPH_SCALE = 0.75
+# Emoji of the ``EMOJI`` set rasterized per frame while a page fills up
+PREFILL_PER_FRAME = 2
+FONT_PATHS = [
+    '/system/fonts/NotoColorEmoji.ttf',  # Android
+    '/usr/share/fonts/truetype/noto/NotoColorEmoji.ttf',
+    '/usr/share/fonts/noto/NotoColorEmoji.ttf',
+    '/usr/share/fonts/google-noto-emoji/NotoColorEmoji.ttf',
+    'C:\\Windows\\Fonts\\seguiemj.ttf',
+    '/System/Library/Fonts/Apple Color Emoji.ttc',
+]
+
+MAGIC = b'QEMA'
+VERSION = 1
+# magic, format version, cell size, length of the JSON metadata that follows
+HEADER = struct.Struct('<4sHHI')
+
+
+def find_font():
+    """Path of the color emoji font to rasterize with, or None"""
+    configured = os.environ.get('QUIZ_EMOJI_FONT')
+    for path in [configured] if configured else FONT_PATHS:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def font_signature(font):
+    stat = os.stat(font)
+    return [font, stat.st_size, stat.st_mtime_ns]
+
+
+class AtlasPage:
+    """Emoji of one cell size, packed into one texture"""
+    def __init__(self, cell, font):
+        self.cell = cell
+        self.font = font
+        self.size = cell * GRID
+        self.symbols = []  # in cell order
+        self.cells = {}    # symbol -> texture coordinates (u0, v0, u1, v1)
+        # The texture's contents, kept to restore it when the GL context
+        # is lost and to save the page
+        self.pixels = bytearray(self.size * self.size * 4)
+        self.texture = Texture.create(size=(self.size, self.size), colorfmt='rgba')
+        self.texture.add_reload_observer(self._reload)
+        self.full = False
+
+    def __contains__(self, symbol):
+        return symbol in self.cells
+
+    def _used_rows(self):
+        return -(-len(self.symbols) // GRID) * self.cell
+
+    def _reload(self, texture):
+        rows = self._used_rows()
+        if rows:
+            texture.blit_buffer(bytes(self.pixels[:rows * self.size * 4]), size=(self.size, rows),
+                                colorfmt='rgba', bufferfmt='ubyte')
+
+    def _place(self, symbol):
+        number = len(self.symbols)
+        x = number % GRID * self.cell
+        y = number // GRID * self.cell
+        self.symbols.append(symbol)
+        self.cells[symbol] = (x / self.size, y / self.size,
+                              (x + self.cell) / self.size, (y + self.cell) / self.size)
+        return x, y
+
+    def rasterize(self, symbol):
+        """Return the emoji as the RGBA pixels of one cell, bottom row first"""
+        label = CoreLabel(text=symbol, font_name=self.font, font_size=self.cell * GLYPH_SCALE)
+        label.refresh()
+        texture = label.texture
+        if texture is None or texture.width < 2 or texture.height < 2:
+            return None
+
+        # Center the glyph in the cell, cutting off whatever doesn't fit.
+        # Label textures are stored top row first, and only drawn flipped
+        width, height = texture.size
+        glyph = texture.pixels
+        cell = self.cell
+        pixels = bytearray(cell * cell * 4)
+        left = max((cell - width) // 2, 0)
+        skip_x = max((width - cell) // 2, 0)
+        bottom = max((cell - height) // 2, 0)
+        skip_y = max((height - cell) // 2, 0)
+        span = min(width, cell) * 4
+        for row in range(min(height, cell)):
+            source = ((height - 1 - row - skip_y) * width + skip_x) * 4
+            target = ((row + bottom) * cell + left) * 4
+            pixels[target:target + span] = glyph[source:source + span]
+        return pixels
+
+    def add(self, symbols):
+        """Rasterize the ``symbols`` that aren't on the page yet; returns how many were added"""
+        added = 0
+        for symbol in symbols:
+            if symbol in self.cells:
+                continue
+            if len(self.symbols) >= GRID * GRID:
+                if not self.full:
+                    self.full = True
+                    Logger.warning(f'EmojiAtlas: the {self.cell}px page is full')
+                break
+            pixels = self.rasterize(symbol)
+            if pixels is None:
+                continue
+            x, y = self._place(symbol)
+            self.texture.blit_buffer(bytes(pixels), size=(self.cell, self.cell), pos=(x, y),
+                                     colorfmt='rgba', bufferfmt='ubyte')
+            row_bytes = self.cell * 4
+            for row in range(self.cell):
+                start = ((y + row) * self.size + x) * 4
+                self.pixels[start:start + row_bytes] = pixels[row * row_bytes:(row + 1) * row_bytes]
+            added += 1
+        return added
+
+    # Persistence ----------------------------------------------------------
+
+    def save(self, path):
+        meta = json.dumps({'signature': font_signature(self.font), 'symbols': self.symbols}).encode('utf-8')
+        data = zlib.compress(bytes(self.pixels[:self._used_rows() * self.size * 4]), 1)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.cell, len(meta)))
+            f.write(meta)
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, cell, font):
+        """Read a saved page, or return None if it is missing or stale"""
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            magic, version, saved_cell, meta_length = HEADER.unpack_from(data)
+            if magic != MAGIC or version != VERSION or saved_cell != cell:
+                return None
+            offset = HEADER.size + meta_length
+            meta = json.loads(data[HEADER.size:offset])
+            if meta['signature'] != font_signature(font):
+                return None
+            pixels = zlib.decompress(data[offset:])
+        except (OSError, ValueError, KeyError, struct.error, zlib.error):
+            return None
+
+        page = cls(cell, font)
+        for symbol in meta['symbols'][:GRID * GRID]:
+            page._place(symbol)
+        if len(pixels) != page._used_rows() * page.size * 4:
+            return None
+        page.pixels[:len(pixels)] = pixels
+        page._reload(page.texture)
+        return page
+
+
+class EmojiAtlas:
+    """Atlas pages by cell size, created as they are first drawn from"""
+    def __init__(self, directory=None, font=None):
+        self.directory = directory
+        self.font = font
+        self.font_missing = False
+        self.pages = {}
+        self.changed = set()  # cell sizes of pages to save
+        self.save_trigger = Clock.create_trigger(self.save, 2)
+
+    def bucket(self, size):
+        for cell in BUCKETS:
+            if cell >= size:
+                return cell
+        return BUCKETS[-1]
+
+    def page_path(self, cell):
+        return os.path.join(self.directory, f'emoji-{cell}.atlas')
+
+    def page(self, size):
+        """The page emoji of ``size`` pixels are drawn from, or None without an emoji font"""
+        cell = self.bucket(size)
+        page = self.pages.get(cell)
+        if page is None:
+            if self.font is None:
+                if self.font_missing:
+                    return None
+                self.font = find_font()
+                if self.font is None:
+                    self.font_missing = True
+                    Logger.info('EmojiAtlas: no emoji font found, emoji are not drawn')
+                    return None
+            if self.directory is not None:
+                page = AtlasPage.load(self.page_path(cell), cell, self.font)
+            if page is None:
+                page = AtlasPage(cell, self.font)
+            self.pages[cell] = page
+            self.prefill(page)
+        return page
+
+    def prefill(self, page):
+        """Rasterize the ``EMOJI`` set into ``page`` over the next frames"""
+        missing = [symbol for symbol in EMOJI if symbol not in page]
+
+        def step(dt):
+            batch = missing[:PREFILL_PER_FRAME]
+            del missing[:PREFILL_PER_FRAME]
+            self.add(page, batch)
+            return bool(missing) and not page.full
+
+        if missing:
+            Clock.schedule_interval(step, 0)
+
+    def add(self, page, symbols):
+        if page.add(symbols):
+            self.changed.add(page.cell)
+            self.save_trigger()
+
+    def save(self, *args):
+        """Write out the pages that gained emoji"""
+        if self.directory is None:
+            self.changed.clear()
+            return
+        for cell in sorted(self.changed):
+            try:
+                self.pages[cell].save(self.page_path(cell))
+            except OSError as e:
+                Logger.warning(f'EmojiAtlas: could not save the {cell}px page ({e})')
+        self.changed.clear()
+
+    def stats(self):
+        return {f'{cell}px': len(page.symbols) for cell, page in sorted(self.pages.items())}
+
+
+emoji_atlas = EmojiAtlas()
+
+
+class EmojiBatch(InstructionGroup):
+    """Emoji drawn as one mesh over an atlas page.
+
+    ``draw`` takes (symbol, x, y) placements, all ``size`` pixels
+    square, and replaces whatever the batch drew before; ``draw([])``
+    clears it.
+    """
+    def __init__(self, size, **kwargs):
+        super().__init__(**kwargs)
+        self.size = size
+        self.add(Color(1, 1, 1, 1))
+        self.mesh = Mesh(mode='triangles')
+        self.add(self.mesh)
+
+    def draw(self, placements):
+        page = emoji_atlas.page(self.size)
+        if page is None:
+            return
+        emoji_atlas.add(page, [symbol for symbol, x, y in placements if symbol not in page])
+
+        size = self.size
+        vertices = []
+        indices = []
+        for symbol, x, y in placements:
+            cell = page.cells.get(symbol)
+            if cell is None:
+                continue
+            u0, v0, u1, v1 = cell
+            i = len(vertices) // 4
+            vertices += [x, y, u0, v0, x + size, y, u1, v0,
+                         x + size, y + size, u1, v1, x, y + size, u0, v1]
+            indices += [i, i + 1, i + 2, i + 2, i + 3, i]
+        self.mesh.texture = page.texture
+        self.mesh.vertices = vertices
+        self.mesh.indices = indices
+
+
+class EmojiRow(Widget):
+    """A centered row of emoji"""
+    symbols = ListProperty([])
+    emoji_size = NumericProperty(dp(32))
+    spacing = NumericProperty(dp(6))
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.batch = None
+        self.redraw_trigger = Clock.create_trigger(self.redraw)
+        self.bind(pos=self.redraw_trigger, size=self.redraw_trigger, symbols=self.redraw_trigger,
+                  emoji_size=self.redraw_trigger, spacing=self.redraw_trigger)
+
+    def redraw(self, *args):
+        if self.batch is None or self.batch.size != self.emoji_size:
+            if self.batch is not None:
+                self.canvas.remove(self.batch)
+            self.batch = EmojiBatch(self.emoji_size)
+            self.canvas.add(self.batch)
+        size = self.emoji_size
+        width = len(self.symbols) * size + max(len(self.symbols) - 1, 0) * self.spacing
+        x = self.center_x - width / 2
+        y = self.center_y - size / 2
+        self.batch.draw([(symbol, x + i * (size + self.spacing), y) for i, symbol in enumerate(self.symbols)])
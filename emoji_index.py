@@ -0,0 +1,356 @@
+"""Emoji lookups by symbol, by name and by typed text.
+
+``EmojiIndex`` maps symbols to names and names (and aliases) back to
+symbols with plain dicts, and ranks emoji for a typed query: every word
+has to match a word of the name exactly, as a prefix (the last word,
+for typeahead: "smil" finds 😃 😄 😊) or as a likely misspelling.
+
+The index covers ``EMOJI``, the ones quiz reactions and feedback use,
+and with the ``emoji`` package installed the whole Unicode set with its
+aliases.  It is built once and saved to ``emoji.index``; ``get_index``
+loads it on first use, and the lookup functions below go through it.
+
+    python emoji_index.py smil
+"""
+import argparse
+import heapq
+import json
+import os
+import re
+import zlib
+from bisect import bisect_left
+from collections import OrderedDict
+
+from question_bank import BASE_DIR
+
+INDEX_PATH = os.path.join(BASE_DIR, 'emoji.index')
+VERSION = 1
+
+# Emoji with their human-readable names; ranked ahead of the rest
+EMOJI = {
+    "😀": "grinning face",
+    "😃": "smiling face with big eyes",
+    "😄": "smiling face with smiling eyes",
+    "😁": "beaming face",
+    "😆": "grinning squinting face",
+    "😅": "grinning face with sweat",
+    "😂": "face with tears of joy",
+    "🤣": "rolling on the floor laughing",
+    "😊": "smiling face with blushing cheeks",
+    "😍": "smiling face with heart-eyes",
+    "😘": "face blowing a kiss",
+    "😎": "smiling face with sunglasses",
+    "🤩": "star-struck",
+    "😋": "face savoring food",
+    "😜": "winking face with tongue",
+    "🤔": "thinking face",
+    "😴": "sleeping face",
+    "😷": "face with medical mask",
+    "🤖": "robot",
+    "👋": "waving hand",
+    "👍": "thumbs up",
+    "👎": "thumbs down",
+    "🙏": "folded hands",
+    "❤": "red heart",
+    "🔥": "fire",
+    "⭐": "star",
+    "🌙": "moon",
+    "☀": "sun",
+    "🌍": "earth globe",
+    "🚀": "rocket",
+    "⚽": "soccer ball",
+    "🎵": "musical note",
+    "🎉": "party popper",
+    "💡": "light bulb",
+    "📚": "books",
+    "💻": "laptop",
+    "📱": "mobile phone",
+    "🍎": "red apple",
+    "🍕": "pizza",
+    "🍔": "burger",
+    "⚡": "high voltage",
+}
+
+TOKEN = re.compile(r'[a-z0-9]+')
+# How well a query word matches a name word
+EXACT = 3
+PREFIX = 2
+FUZZY = 1
+# Shorter words are too easily mistaken for one another to match fuzzily
+MIN_FUZZY_LENGTH = 4
+VARIATION_SELECTOR = '\ufe0f'
+
+
+def tokenize(text):
+    return TOKEN.findall(text.lower())
+
+
+def normalize(name):
+    """'Smiling face with heart-eyes' -> 'smiling face with heart eyes'"""
+    return ' '.join(tokenize(name))
+
+
+def _deletions(word):
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def _emoji_package():
+    try:
+        import emoji
+    except ImportError:
+        return None
+    return emoji
+
+
+def load_entries():
+    """Return [(symbol, name, aliases)], ``EMOJI`` first"""
+    entries = [(symbol, name, []) for symbol, name in EMOJI.items()]
+    emoji = _emoji_package()
+    if emoji is None:
+        return entries
+
+    known = {symbol: aliases for symbol, name, aliases in entries}
+    # Fully qualified sequences first, so names find those
+    fully_qualified = emoji.STATUS['fully_qualified']
+    data = sorted(emoji.EMOJI_DATA.items(), key=lambda item: item[1].get('status') != fully_qualified)
+    for symbol, info in data:
+        names = [name.strip(':').replace('_', ' ') for name in [info['en']] + info.get('alias', [])]
+        if symbol in known:
+            known[symbol].extend(names)
+        else:
+            entries.append((symbol, names[0], names[1:]))
+    return entries
+
+
+def source_signature():
+    """Identify the emoji set well enough to tell when the saved index is stale"""
+    emoji = _emoji_package()
+    return [VERSION, emoji.__version__ if emoji is not None else None,
+            zlib.crc32(json.dumps(EMOJI).encode('utf-8'))]
+
+
+class EmojiIndex:
+    """Symbol and name lookups plus ranked search over a set of emoji.
+
+    Name words are kept sorted, so the words starting with a prefix are
+    one run of the list, found with two binary searches: a trie
+    flattened into a list.  Misspellings are found through single-letter
+    deletions, which a word shares with every word one typo, swap or
+    missing letter away.  Recent searches are cached, so typeahead
+    repeating itself costs a dict lookup.
+    """
+    def __init__(self, max_cached=256):
+        self.max_cached = max_cached
+        self.symbols = []
+        self.names = []
+        self.by_symbol = {}
+        self.by_name = {}   # normalized name or alias -> emoji number
+        self.terms = []     # sorted name words
+        self.postings = []  # emoji numbers per term, ascending
+        self.signature = None
+        self._normalized = None
+        self._deletions = None  # deletion -> term numbers
+        self._cache = OrderedDict()
+
+    def __len__(self):
+        return len(self.symbols)
+
+    @classmethod
+    def build(cls, entries, **kwargs):
+        index = cls(**kwargs)
+        words = {}
+        for symbol, name, aliases in entries:
+            number = len(index.symbols)
+            index.symbols.append(symbol)
+            index.names.append(name)
+            index.by_symbol.setdefault(symbol, number)
+            for text in [name] + aliases:
+                index.by_name.setdefault(normalize(text), number)
+                for word in tokenize(text):
+                    numbers = words.setdefault(word, [])
+                    if numbers[-1:] != [number]:
+                        numbers.append(number)
+        index.terms = sorted(words)
+        index.postings = [words[term] for term in index.terms]
+        return index
+
+    # Lookups --------------------------------------------------------------
+
+    def name(self, symbol):
+        """Name of ``symbol``, or None"""
+        number = self.by_symbol.get(symbol)
+        if number is None:
+            # Emoji typed with or without the emoji presentation selector
+            number = self.by_symbol.get(symbol.replace(VARIATION_SELECTOR, ''),
+                                        self.by_symbol.get(symbol + VARIATION_SELECTOR))
+        return self.names[number] if number is not None else None
+
+    def symbol(self, name):
+        """Emoji called ``name`` (or with it as an alias), or None"""
+        number = self.by_name.get(normalize(name))
+        return self.symbols[number] if number is not None else None
+
+    # Search ---------------------------------------------------------------
+
+    def _term(self, word):
+        i = bisect_left(self.terms, word)
+        return i if i < len(self.terms) and self.terms[i] == word else None
+
+    def _prefixed(self, prefix):
+        # Terms are [a-z0-9], all of which sort before '\x7f'
+        return range(bisect_left(self.terms, prefix), bisect_left(self.terms, prefix + '\x7f'))
+
+    def _misspelled(self, word):
+        if self._deletions is None:
+            self._deletions = {}
+            for term, text in enumerate(self.terms):
+                if len(text) >= MIN_FUZZY_LENGTH - 1:
+                    for key in _deletions(text) | {text}:
+                        self._deletions.setdefault(key, []).append(term)
+        terms = set()
+        for key in _deletions(word) | {word}:
+            terms.update(self._deletions.get(key, ()))
+        return terms
+
+    def _matches(self, word, prefix):
+        """emoji number -> how well ``word`` matches its name"""
+        quality = {}
+        if prefix:
+            for term in self._prefixed(word):
+                quality.update(dict.fromkeys(self.postings[term], PREFIX))
+        term = self._term(word)
+        if term is not None:
+            quality.update(dict.fromkeys(self.postings[term], EXACT))
+        # Only a word that matches nothing is taken for a misspelling
+        if not quality and len(word) >= MIN_FUZZY_LENGTH:
+            for term in self._misspelled(word):
+                quality.update(dict.fromkeys(self.postings[term], FUZZY))
+        return quality
+
+    def search(self, query, limit=10, prefix=True):
+        """Return up to ``limit`` (symbol, name), best match first.
+
+        With ``prefix`` the last word of the query may be unfinished.
+        Among equally good matches the emoji called exactly that comes
+        first, then names starting with the query, then ``EMOJI`` order.
+        """
+        key = (query, limit, prefix)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        words = tokenize(query)
+        scores = {}
+        for i, word in enumerate(words):
+            matches = self._matches(word, prefix and i == len(words) - 1)
+            if i == 0:
+                scores = matches
+            else:
+                scores = {number: score + matches[number]
+                          for number, score in scores.items() if number in matches}
+            if not scores:
+                break
+
+        if self._normalized is None:
+            self._normalized = [normalize(name) for name in self.names]
+        text = ' '.join(words)
+        normalized = self._normalized
+        best = heapq.nsmallest(limit, scores.items(), key=lambda item: (
+            -item[1], normalized[item[0]] != text, not normalized[item[0]].startswith(text), item[0]))
+        results = [(self.symbols[number], self.names[number]) for number, score in best]
+
+        self._cache[key] = results
+        if len(self._cache) > self.max_cached:
+            self._cache.popitem(last=False)
+        return results
+
+    # Persistence ----------------------------------------------------------
+
+    def save(self, path, signature=None):
+        data = {
+            'version': VERSION,
+            'signature': signature,
+            'symbols': self.symbols,
+            'names': self.names,
+            'by_name': self.by_name,
+            'terms': self.terms,
+            'postings': self.postings,
+        }
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} emoji index")
+        index = cls(**kwargs)
+        index.signature = data['signature']
+        index.symbols = data['symbols']
+        index.names = data['names']
+        index.by_name = data['by_name']
+        index.terms = data['terms']
+        index.postings = data['postings']
+        for number, symbol in enumerate(index.symbols):
+            index.by_symbol.setdefault(symbol, number)
+        return index
+
+
+def open_index(path=INDEX_PATH):
+    """Load the saved index, rebuilding it if the emoji set changed"""
+    signature = source_signature()
+    if os.path.exists(path):
+        try:
+            index = EmojiIndex.load(path)
+            if index.signature == signature:
+                return index
+        except (ValueError, KeyError):
+            pass
+    index = EmojiIndex.build(load_entries())
+    try:
+        index.save(path, signature)
+    except OSError:
+        # Still usable, it is just built again next time
+        pass
+    return index
+
+
+_index = None
+
+
+def get_index():
+    """The shared index, opened on first use"""
+    global _index
+    if _index is None:
+        _index = open_index()
+    return _index
+
+
+def name_of(symbol):
+    return get_index().name(symbol)
+
+
+def symbol_for(name):
+    return get_index().symbol(name)
+
+
+def search(query, limit=10, prefix=True):
+    return get_index().search(query, limit, prefix)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Find emoji by name")
+    parser.add_argument('query', nargs='?', help='name or beginning of one (default: list them all)')
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+
+    index = get_index()
+    if args.query is None:
+        for symbol, name in zip(index.symbols, index.names):
+            print(symbol, name)
+    else:
+        for symbol, name in index.search(args.query, args.limit):
+            print(symbol, name)
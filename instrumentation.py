@@ -0,0 +1,242 @@
+"""Hot-path instrumentation and a frame-time overlay.
+
+Methods decorated with ``@timed()`` record a span per call while the
+profiler is enabled; while it is disabled the wrapper costs one flag
+check.  Enabling the profiler also records frame times from the Clock
+and times the transitions of watched ScreenManagers; disabling it
+unhooks both again.
+
+Press F12 in the app to toggle the profiler and its on-screen overlay
+(the last frame times and the slowest spans), and F11 to write a trace
+file in the Chrome trace event format, which chrome://tracing and
+Perfetto can open.  Setting QUIZ_PROFILE=1 enables the profiler at
+startup.
+"""
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from kivy.clock import Clock
+from kivy.core.window import Window
+from kivy.graphics import Color, Rectangle
+from kivy.uix.label import Label
+
+KEY_TOGGLE = 293  # F12
+KEY_EXPORT = 292  # F11
+
+
+class Profiler:
+    """Collects timing spans and frame times while enabled"""
+    def __init__(self, max_spans=10000, max_frames=120):
+        self.enabled = False
+        self.origin = time.perf_counter()
+        self.spans = deque(maxlen=max_spans)  # (name, category, start, duration, thread id)
+        self.frame_times = deque(maxlen=max_frames)
+        self.managers = []
+        self.transition_start = {}
+        self.frame_event = None
+
+    def watch(self, manager):
+        """Time the transitions of a ScreenManager while enabled"""
+        self.managers.append(manager)
+        if self.enabled:
+            self._bind_manager(manager)
+
+    def enable(self):
+        if self.enabled:
+            return
+        self.enabled = True
+        for manager in self.managers:
+            self._bind_manager(manager)
+        self.frame_event = Clock.schedule_interval(self._on_frame, 0)
+
+    def disable(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        for manager in self.managers:
+            manager.unbind(current=self._on_screen_change)
+            manager.transition.unbind(on_complete=self._on_transition_complete)
+        self.frame_event.cancel()
+        self.frame_event = None
+
+    def toggle(self):
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable()
+
+    def _bind_manager(self, manager):
+        manager.bind(current=self._on_screen_change)
+        manager.transition.bind(on_complete=self._on_transition_complete)
+
+    def _on_screen_change(self, manager, current):
+        self.transition_start[manager.transition] = (time.perf_counter(), current)
+
+    def _on_transition_complete(self, transition):
+        start, screen = self.transition_start.pop(transition, (None, None))
+        if start is not None:
+            self.add_span(f'transition -> {screen}', 'transition', start, time.perf_counter() - start)
+
+    def _on_frame(self, dt):
+        self.frame_times.append(dt)
+
+    def add_span(self, name, category, start, duration):
+        self.spans.append((name, category, start, duration, threading.get_ident()))
+
+    @contextmanager
+    def span(self, name, category='quiz'):
+        """Time a block of code; does nothing while disabled"""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, category, start, time.perf_counter() - start)
+
+    def slowest(self, count=5):
+        """Return (name, calls, mean s, max s) for the slowest span names"""
+        totals = {}
+        for name, category, start, duration, thread in self.spans:
+            calls, total, worst = totals.get(name, (0, 0.0, 0.0))
+            totals[name] = (calls + 1, total + duration, max(worst, duration))
+        rows = [(name, calls, total / calls, worst) for name, (calls, total, worst) in totals.items()]
+        rows.sort(key=lambda row: row[3], reverse=True)
+        return rows[:count]
+
+    def export_trace(self, path):
+        """Write the recorded spans as a Chrome trace event file"""
+        pid = os.getpid()
+        events = [
+            {
+                'name': name, 'cat': category, 'ph': 'X', 'pid': pid, 'tid': thread,
+                'ts': (start - self.origin) * 1e6, 'dur': duration * 1e6,
+            }
+            for name, category, start, duration, thread in list(self.spans)
+        ]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        return path
+
+
+profiler = Profiler()
+
+
+def timed(category='quiz', profiler=profiler):
+    """Decorator recording a span for each call while ``profiler`` is enabled"""
+    def decorate(method):
+        label = method.__qualname__
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return method(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                profiler.add_span(label, category, start, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+class ProfilerOverlay(Label):
+    """Corner overlay with a frame-time graph and the slowest spans"""
+    BUDGET = 1 / 60.0
+
+    def __init__(self, profiler, **kwargs):
+        super().__init__(
+            size_hint=(None, None),
+            size=(360, 200),
+            font_size='12sp',
+            halign='left',
+            valign='bottom',
+            color=(1, 1, 1, 1),
+            **kwargs
+        )
+        self.profiler = profiler
+        self.text_size = (self.width - 10, self.height - 70)
+        self.update_event = None
+
+        with self.canvas.before:
+            Color(0, 0, 0, 0.7)
+            self.background = Rectangle()
+        self.bar_colors = []
+        self.bars = []
+        with self.canvas.after:
+            for i in range(profiler.frame_times.maxlen):
+                self.bar_colors.append(Color(0.4, 0.8, 0.4, 1))
+                self.bars.append(Rectangle())
+        Window.bind(size=self.place)
+
+    def place(self, *args):
+        self.pos = (Window.width - self.width, Window.height - self.height)
+        self.background.pos = self.pos
+        self.background.size = self.size
+
+    def show(self):
+        if self.parent is None:
+            self.place()
+            Window.add_widget(self)
+            self.update_event = Clock.schedule_interval(self.refresh, 0.25)
+
+    def hide(self):
+        if self.parent is not None:
+            Window.remove_widget(self)
+            self.update_event.cancel()
+
+    def refresh(self, dt):
+        frames = self.profiler.frame_times
+        width = self.width / len(self.bars)
+        top = self.top - 4
+        for i, (color, bar) in enumerate(zip(self.bar_colors, self.bars)):
+            frame = frames[i] if i < len(frames) else 0
+            # Bars hang from the top edge; 60 px is four 60 fps frame budgets
+            height = min(frame / self.BUDGET * 15, 60)
+            color.rgba = (0.4, 0.8, 0.4, 1) if frame <= self.BUDGET else (0.9, 0.3, 0.3, 1)
+            bar.pos = (self.x + i * width, top - height)
+            bar.size = (max(width - 1, 1), height)
+
+        lines = []
+        if frames:
+            lines.append(f'frame avg {sum(frames) / len(frames) * 1000:.1f} ms, '
+                         f'max {max(frames) * 1000:.1f} ms')
+        for name, calls, mean, worst in self.profiler.slowest():
+            lines.append(f'{name}: max {worst * 1000:.2f} ms, avg {mean * 1000:.2f} ms x{calls}')
+        self.text = '\n'.join(lines)
+
+
+def install(export_dir, profiler=profiler):
+    """Bind the F12 toggle and F11 export keys and honor QUIZ_PROFILE"""
+    # The overlay draws a bar per frame; it is only built once profiling
+    # is first turned on, so it costs nothing at startup
+    overlay = None
+
+    def toggle():
+        nonlocal overlay
+        profiler.toggle()
+        if profiler.enabled:
+            if overlay is None:
+                overlay = ProfilerOverlay(profiler)
+            overlay.show()
+        elif overlay is not None:
+            overlay.hide()
+
+    def on_keyboard(window, key, *args):
+        if key == KEY_TOGGLE:
+            toggle()
+            return True
+        if key == KEY_EXPORT:
+            path = os.path.join(export_dir, time.strftime('trace-%Y%m%d-%H%M%S.json'))
+            profiler.export_trace(path)
+            return True
+
+    Window.bind(on_keyboard=on_keyboard)
+    if os.environ.get('QUIZ_PROFILE') == '1':
+        toggle()
@@ -0,0 +1,602 @@
+"""Compiled question banks.
+
+Questions are authored as one JSON Lines file per language in the
+``questions`` directory and compiled into a single bank file: a small JSON index followed by
+typed arrays (ids, correct answers, languages, text offsets) and the
+UTF-8 text of every question.  The app memory-maps the bank, so it
+opens instantly and only decodes the questions that are actually shown.
+
+The text is compressed in chunks of ``CHUNK_SIZE`` questions, each
+decodable on its own, so reading a question only decompresses its
+chunk; recently read chunks are kept decompressed.  Banks are written
+with zlib by default, or with ``lzma`` (smaller, slower to read) or
+uncompressed.
+
+Run this module directly to (re)compile the bank:
+
+    python question_bank.py [--compression lzma]
+"""
+import argparse
+import array
+import json
+import logging
+import lzma
+import mmap
+import os
+import struct
+import sys
+import threading
+import zlib
+from collections import OrderedDict
+from collections.abc import Sequence
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIR = os.path.join(BASE_DIR, 'questions')
+BANK_PATH = os.path.join(BASE_DIR, 'questions.bank')
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'QBNK'
+VERSION = 3
+# magic, format version, length of the JSON index that follows
+HEADER = struct.Struct('<4sHI')
+# Sections are padded so the typed arrays can be cast in place
+ALIGN = 8
+
+# Text fields stored per question: question, options..., explanation
+QUESTION_FIELD = 0
+OPTIONS_START = 1
+
+COMPRESSIONS = ('zlib', 'lzma', None)
+COMPRESSION = 'zlib'
+# Questions per compressed chunk: small enough to decompress in tens of
+# microseconds, large enough to compress well
+CHUNK_SIZE = 64
+# Decompressed chunks kept per bank
+MAX_CHUNKS = 32
+ZLIB_LEVEL = 6
+# Raw streams, without per-chunk headers; lzma's dictionary only needs
+# to hold one chunk
+WBITS = -15
+LZMA_FILTERS = [{'id': lzma.FILTER_LZMA2, 'preset': 9, 'dict_size': 1 << 20}]
+
+
+class QuestionStore:
+    """Typed arrays plus one UTF-8 blob describing every question.
+
+    ``buffer`` is normally a memory-mapped bank file, so opening a store
+    copies nothing: the arrays are memoryviews cast over the mapping and
+    text is only decoded when a field is read.
+    """
+    def __init__(self, buffer, index):
+        view = memoryview(buffer)
+        swap = index['byteorder'] != sys.byteorder
+        for name, (offset, length, typecode) in index['arrays'].items():
+            data = view[offset:offset + length]
+            if swap:
+                data = array.array(typecode, data)
+                data.byteswap()
+            else:
+                data = data.cast(typecode)
+            setattr(self, name, data)
+        offset, length = index['blob']
+        self.blob = view[offset:offset + length]
+        self.language_names = {entry['code']: language for language, entry in index['languages'].items()}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def text(self, field):
+        return str(self.blob[self.offsets[field]:self.offsets[field + 1]], 'utf-8')
+
+    def field_count(self, index):
+        """Number of text fields of question ``index``"""
+        return self.fields[index + 1] - self.fields[index]
+
+    def field(self, index, number):
+        """Text field ``number`` of question ``index``; negative numbers count from its end"""
+        if number < 0:
+            return self.text(self.fields[index + 1] + number)
+        return self.text(self.fields[index] + number)
+
+    def warm(self, start, stop):
+        """Fault the text of questions ``start`` to ``stop`` into memory"""
+        if start < stop:
+            self._fault(self.offsets[self.fields[start]], self.offsets[self.fields[stop]])
+
+    def _fault(self, start, stop):
+        blob = self.blob
+        for i in range(start, stop, mmap.PAGESIZE):
+            blob[i]
+
+
+class ChunkedStore(QuestionStore):
+    """A QuestionStore whose text is compressed in chunks of questions.
+
+    Chunk ``k`` holds questions ``k * chunk_size`` up to the next chunk:
+    the first field of each, the offsets of their fields, then their
+    text.  ``chunks`` has where each chunk starts in the blob.  The
+    ``max_chunks`` chunks read last stay decompressed.
+    """
+    def __init__(self, buffer, index, max_chunks=MAX_CHUNKS):
+        super().__init__(buffer, index)
+        self.compression = index['compression']
+        self.chunk_size = index['chunk_size']
+        self.swap = index['byteorder'] != sys.byteorder
+        self.max_chunks = max_chunks
+        self._cache = OrderedDict()  # chunk number -> (fields, offsets, text)
+        self._lock = threading.Lock()
+
+    def _decompress(self, data):
+        if self.compression == 'zlib':
+            return zlib.decompress(data, WBITS)
+        return lzma.decompress(data, lzma.FORMAT_RAW, filters=LZMA_FILTERS)
+
+    def _array(self, data):
+        if self.swap:
+            data = array.array('I', data)
+            data.byteswap()
+            return data
+        return data.cast('I')
+
+    def chunk(self, number):
+        """Return (first field of each question, field offsets, text) of a chunk"""
+        with self._lock:
+            cached = self._cache.get(number)
+            if cached is not None:
+                self._cache.move_to_end(number)
+                return cached
+
+        data = memoryview(self._decompress(self.blob[self.chunks[number]:self.chunks[number + 1]]))
+        count = min(self.chunk_size, len(self) - number * self.chunk_size)
+        fields = self._array(data[:(count + 1) * 4])
+        offsets_end = (count + 1 + fields[count] + 1) * 4
+        cached = (fields, self._array(data[(count + 1) * 4:offsets_end]), data[offsets_end:])
+
+        with self._lock:
+            self._cache[number] = cached
+            if len(self._cache) > self.max_chunks:
+                self._cache.popitem(last=False)
+        return cached
+
+    def field_count(self, index):
+        fields = self.chunk(index // self.chunk_size)[0]
+        i = index % self.chunk_size
+        return fields[i + 1] - fields[i]
+
+    def field(self, index, number):
+        fields, offsets, text = self.chunk(index // self.chunk_size)
+        i = index % self.chunk_size
+        field = fields[i + 1] + number if number < 0 else fields[i] + number
+        return str(text[offsets[field]:offsets[field + 1]], 'utf-8')
+
+    def warm(self, start, stop):
+        # Only the compressed chunks; they are decompressed as they are read
+        if start < stop:
+            self._fault(self.chunks[start // self.chunk_size],
+                        self.chunks[(stop - 1) // self.chunk_size + 1])
+
+
+class Question:
+    """Lightweight view of one question in a QuestionStore"""
+    __slots__ = ('_store', '_index')
+
+    def __init__(self, store, index):
+        self._store = store
+        self._index = index
+
+    @property
+    def id(self):
+        return self._store.ids[self._index]
+
+    @property
+    def language(self):
+        return self._store.language_names[self._store.languages[self._index]]
+
+    @property
+    def correct_index(self):
+        return self._store.correct[self._index]
+
+    @property
+    def question(self):
+        return self._store.field(self._index, QUESTION_FIELD)
+
+    @property
+    def options(self):
+        store = self._store
+        stop = store.field_count(self._index) - 1
+        return [store.field(self._index, number) for number in range(OPTIONS_START, stop)]
+
+    @property
+    def explanation(self):
+        return self._store.field(self._index, -1)
+
+
+class SourceQuestion:
+    """A question read straight from a source record, not from the compiled bank"""
+    __slots__ = ('id', 'language', 'question', 'options', 'correct_index', 'explanation')
+
+    def __init__(self, language, record):
+        self.id = record['id']
+        self.language = language
+        self.question = record['question']
+        self.options = list(record['options'])
+        self.correct_index = record['correct_index']
+        self.explanation = record.get('explanation', '')
+
+
+class QuestionList(Sequence):
+    """The questions of one language, as a sequence of Question views.
+
+    Source changes made while the app runs (see ``bank_watcher.py``) are
+    laid over the compiled questions by ``apply``: changed questions are
+    replaced in place and new ones appended, so the index of every
+    question stays the same and samplers only have to grow.  Removed
+    questions keep their index too; they are listed in ``removed`` and
+    no longer found by id.
+    """
+    def __init__(self, store, start, stop):
+        self.store = store
+        self.start = start
+        self.stop = stop
+        self.added = []     # SourceQuestion appended after the compiled ones
+        self.replaced = {}  # index -> SourceQuestion
+        self.removed = set()
+        self._positions = None
+
+    def __len__(self):
+        return self.stop - self.start + len(self.added)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('question index out of range')
+        compiled = self.stop - self.start
+        if i >= compiled:
+            return self.added[i - compiled]
+        if i in self.replaced:
+            return self.replaced[i]
+        return Question(self.store, self.start + i)
+
+    @property
+    def ids(self):
+        """Question ids in bank order, as a typed view (a copy once questions were added)"""
+        ids = self.store.ids[self.start:self.stop]
+        if self.added:
+            ids = array.array('I', ids)
+            ids.extend(question.id for question in self.added)
+        return ids
+
+    def _position_map(self):
+        if self._positions is None:
+            ids = self.store.ids
+            start = self.start
+            self._positions = {ids[i]: i - start for i in range(start, self.stop)}
+        return self._positions
+
+    def find(self, question_id):
+        """Return the question with ``question_id``, or None"""
+        i = self._position_map().get(question_id)
+        return None if i is None or i in self.removed else self[i]
+
+    def apply(self, change):
+        """Lay a ``BankChange`` over the questions; returns how many were appended"""
+        positions = self._position_map()
+        compiled = self.stop - self.start
+        appended = 0
+        for question in change.added + change.modified:
+            i = positions.get(question.id)
+            if i is None:
+                positions[question.id] = len(self)
+                self.added.append(question)
+                appended += 1
+                continue
+            if i >= compiled:
+                self.added[i - compiled] = question
+            else:
+                self.replaced[i] = question
+            self.removed.discard(i)
+        for question_id in change.removed:
+            i = positions.get(question_id)
+            if i is not None:
+                self.removed.add(i)
+        return appended
+
+
+def source_files(source_dir=SOURCE_DIR):
+    """Return {language: path} for every source file in ``source_dir``"""
+    files = {}
+    for name in sorted(os.listdir(source_dir)):
+        language, ext = os.path.splitext(name)
+        if ext == '.jsonl':
+            files[language] = os.path.join(source_dir, name)
+    return files
+
+
+def iter_source(path):
+    """Yield the question records of one JSON Lines source file"""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def read_source(path):
+    """Read the question records of one JSON Lines source file"""
+    return list(iter_source(path))
+
+
+def compile_bank(source_dir=SOURCE_DIR, bank_path=BANK_PATH, compression=COMPRESSION, workers=1):
+    """Validate, deduplicate and compile every source file in ``source_dir``.
+
+    Invalid and duplicate questions are left out; see bank_pipeline.
+    ``workers`` goes to ``bank_pipeline.clean``.  The default of 1 never
+    forks: the app compiles on a background thread, where starting a
+    process pool is unsafe (and Android has none).
+    """
+    from bank_pipeline import clean_bank  # bank_pipeline imports this module
+    clean_bank(source_dir, bank_path, compression=compression, workers=workers)
+    return bank_path
+
+
+def _compress_chunks(fields, offsets, blob, compression, chunk_size):
+    """Return (chunk start offsets, compressed chunks)"""
+    data = bytearray()
+    chunks = array.array('Q', [0])
+    count = len(fields) - 1
+    for start in range(0, count, chunk_size):
+        stop = min(start + chunk_size, count)
+        first = fields[start]
+        base = offsets[first]
+        chunk = array.array('I', [field - first for field in fields[start:stop + 1]])
+        chunk.extend([offset - base for offset in offsets[first:fields[stop] + 1]])
+        chunk = chunk.tobytes() + blob[base:offsets[fields[stop]]]
+        if compression == 'zlib':
+            data += zlib.compress(chunk, ZLIB_LEVEL, WBITS)
+        else:
+            data += lzma.compress(chunk, lzma.FORMAT_RAW, filters=LZMA_FILTERS)
+        chunks.append(len(data))
+    return chunks, data
+
+
+def write_bank(banks, bank_path, compression=COMPRESSION, chunk_size=CHUNK_SIZE):
+    """Write ``(language, records)`` pairs to a compiled bank file.
+
+    Records are consumed one at a time, so ``records`` can be a generator
+    over a bank far larger than would fit in memory as dicts.  The text
+    is compressed with ``compression`` (see ``COMPRESSIONS``) in chunks
+    of ``chunk_size`` questions.
+    """
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"unknown compression {compression!r}")
+    ids = array.array('I')
+    correct = array.array('b')
+    languages = array.array('B')
+    fields = array.array('I', [0])
+    offsets = array.array('I', [0])
+    blob = bytearray()
+    index = {'byteorder': sys.byteorder, 'languages': {}, 'arrays': {}, 'compression': compression}
+
+    for code, (language, records) in enumerate(banks):
+        start = len(ids)
+        for record in records:
+            ids.append(record['id'])
+            correct.append(record['correct_index'])
+            languages.append(code)
+            for text in [record['question'], *record['options'], record.get('explanation', '')]:
+                blob += text.encode('utf-8')
+                offsets.append(len(blob))
+            fields.append(len(offsets) - 1)
+        index['languages'][language] = {'code': code, 'start': start, 'stop': len(ids)}
+
+    # Fields and their offsets go inside the chunks when the text is
+    # compressed
+    names = ['ids', 'correct', 'languages', 'fields', 'offsets']
+    sections = [ids, correct, languages, fields, offsets]
+    if compression is not None:
+        chunks, blob = _compress_chunks(fields, offsets, blob, compression, chunk_size)
+        index['chunk_size'] = chunk_size
+        names[3:] = ['chunks']
+        sections[3:] = [chunks]
+    sections.append(blob)
+
+    # Lay the sections out back to back; offsets are relative to the end
+    # of the index so the index does not have to know its own size
+    offset = 0
+    for name, data in zip(names, sections):
+        length = len(data) * data.itemsize
+        index['arrays'][name] = [offset, length, data.typecode]
+        offset += length + _padding(length)
+    index['blob'] = [offset, len(blob)]
+
+    index_data = json.dumps(index).encode('utf-8')
+    index_data += b' ' * _padding(HEADER.size + len(index_data))
+
+    tmp_path = bank_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(index_data)))
+        f.write(index_data)
+        for data in sections:
+            data = bytes(data)
+            f.write(data)
+            f.write(bytes(_padding(len(data))))
+    os.replace(tmp_path, bank_path)
+    return bank_path
+
+
+def _padding(length):
+    return -length % ALIGN
+
+
+def is_stale(source_dir=SOURCE_DIR, bank_path=BANK_PATH):
+    """True if the bank is missing or older than any of its sources"""
+    if not os.path.exists(bank_path):
+        return True
+    if not os.path.isdir(source_dir):
+        # Shipped without sources: the compiled bank is all there is
+        return False
+    bank_mtime = os.path.getmtime(bank_path)
+    return any(os.path.getmtime(path) > bank_mtime for path in source_files(source_dir).values())
+
+
+class QuestionBank:
+    """Memory-mapped view of a compiled bank.
+
+    Opening a bank maps the file and reads its index; no question is
+    decoded until one of its fields is read.  Compressed banks keep the
+    last ``max_chunks`` chunks they read decompressed.
+    """
+    def __init__(self, path=BANK_PATH, max_chunks=MAX_CHUNKS):
+        self.path = path
+        self._questions = {}
+
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, index_length = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} question bank")
+        data_start = HEADER.size + index_length
+        self._index = json.loads(self._mmap[HEADER.size:data_start])
+        data = memoryview(self._mmap)[data_start:]
+        if self._index['compression'] is None:
+            self.store = QuestionStore(data, self._index)
+        else:
+            self.store = ChunkedStore(data, self._index, max_chunks)
+
+    @property
+    def languages(self):
+        return list(self._index['languages'])
+
+    def count(self, language):
+        questions = self._questions.get(language)
+        if questions is not None:
+            return len(questions) - len(questions.removed)
+        entry = self._index['languages'][language]
+        return entry['stop'] - entry['start']
+
+    def is_loaded(self, language):
+        return language in self._questions
+
+    def load(self, language):
+        """Return the questions for ``language``"""
+        if language not in self._questions:
+            entry = self._index['languages'][language]
+            self._questions[language] = QuestionList(self.store, entry['start'], entry['stop'])
+        return self._questions[language]
+
+    def unload(self, language):
+        self._questions.pop(language, None)
+
+    def warm(self, language):
+        """Fault the text of ``language`` into memory ahead of its first use"""
+        entry = self._index['languages'][language]
+        self.store.warm(entry['start'], entry['stop'])
+
+    def __getitem__(self, language):
+        return self.load(language)
+
+    def __contains__(self, language):
+        return language in self._index['languages']
+
+
+def open_bank(source_dir=SOURCE_DIR, bank_path=BANK_PATH):
+    """Open the compiled bank, recompiling it first if the sources changed"""
+    if is_stale(source_dir, bank_path):
+        compile_bank(source_dir, bank_path)
+    try:
+        return QuestionBank(bank_path)
+    except ValueError:
+        if not os.path.isdir(source_dir):
+            raise
+        # Compiled by an older version of the app
+        compile_bank(source_dir, bank_path)
+        return QuestionBank(bank_path)
+
+
+class BankLoader:
+    """Opens a question bank on a background thread.
+
+    Languages become ready one at a time.  ``bind_ready`` callbacks run on
+    the worker thread as each language is ready, and ``load`` only blocks
+    until the requested language is, so the UI never waits on the rest.
+    """
+    def __init__(self, source_dir=SOURCE_DIR, bank_path=BANK_PATH):
+        self.source_dir = source_dir
+        self.bank_path = bank_path
+        self.bank = None
+        self.error = None
+        self._ready = {}
+        self._callbacks = []
+        self._done = False
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._thread = threading.Thread(target=self._run, name='bank-loader', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            bank = open_bank(self.source_dir, self.bank_path)
+            with self._lock:
+                self.bank = bank
+            for language in bank.languages:
+                questions = bank.load(language)
+                bank.warm(language)
+                with self._lock:
+                    self._ready[language] = questions
+                    callbacks = list(self._callbacks)
+                    self._changed.notify_all()
+                for callback in callbacks:
+                    callback(language)
+        except Exception as e:
+            logger.exception("Could not load question bank %s", self.bank_path)
+            with self._lock:
+                self.error = e
+        finally:
+            with self._lock:
+                self._done = True
+                self._changed.notify_all()
+
+    def bind_ready(self, callback):
+        """Call ``callback(language)`` for every language, once it is ready"""
+        with self._lock:
+            self._callbacks.append(callback)
+            ready = list(self._ready)
+        for language in ready:
+            callback(language)
+
+    def is_ready(self, language):
+        return language in self._ready
+
+    def load(self, language, timeout=None):
+        """Return the questions for ``language``, waiting until they are ready"""
+        with self._lock:
+            while language not in self._ready:
+                if self.error is not None:
+                    raise self.error
+                if self._done:
+                    raise KeyError(language)
+                if not self._changed.wait(timeout):
+                    raise TimeoutError(f"question bank for {language!r} is not ready")
+            return self._ready[language]
+
+    def __getitem__(self, language):
+        return self.load(language)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compile the question bank")
+    parser.add_argument('--compression', choices=['zlib', 'lzma', 'none'], default=COMPRESSION)
+    args = parser.parse_args()
+
+    path = compile_bank(compression=None if args.compression == 'none' else args.compression, workers=None)
+    bank = QuestionBank(path)
+    for language in bank.languages:
+        print(f"{language}: {bank.count(language)} questions")
+    print(f"{os.path.getsize(path)} bytes, {args.compression}")
@@ -0,0 +1,422 @@
+"""Template-based question generator.
+
+A ``Template`` declares a question with typed parameters, a computed
+answer and a few formulas for plausible wrong answers.  Instances are
+drawn lazily: ``QuestionGenerator.stream(language)`` yields fresh,
+never-repeated questions for as long as a session asks for them, so
+nothing is materialized up front.
+
+Two instances are the same question when their canonical forms match:
+the template key plus its parameters, with commutative parameters sorted
+(``3 ^ 5`` and ``5 ^ 3`` are one question).  The option order and the
+question id are derived from the canonical form, so an instance always
+comes out the same way.
+
+Answer and distractor formulas only use arithmetic operators, so they
+work on NumPy arrays as well as on ints.  ``QuestionGenerator.batch``
+uses that to compute thousands of instances at once for export:
+
+    python question_generator.py python --count 5000 > python_generated.jsonl
+"""
+import argparse
+import itertools
+import json
+import random
+import sys
+import zlib
+
+# Generated ids have the top bit set so they never collide with bank ids
+GENERATED_ID_BIT = 0x80000000
+# Option orders, picked by the hash of the canonical form
+ORDERS = list(itertools.permutations(range(4)))
+
+
+def _plain(value):
+    # NumPy scalars -> Python values, so formatting and hashing match
+    return value.item() if hasattr(value, 'item') else value
+
+
+class IntParam:
+    """Integer parameter drawn uniformly from ``low..high`` in ``step``s"""
+    def __init__(self, name, low, high, step=1):
+        self.name = name
+        self.low = low
+        self.high = high
+        self.step = step
+
+    def __len__(self):
+        return (self.high - self.low) // self.step + 1
+
+    def draw(self, rng):
+        return rng.randrange(self.low, self.high + 1, self.step)
+
+    def draw_many(self, rng, count):
+        return self.low + self.step * rng.integers(0, len(self), count)
+
+
+class ChoiceParam:
+    """Parameter drawn from a fixed list of values"""
+    def __init__(self, name, values):
+        self.name = name
+        self.values = list(values)
+
+    def __len__(self):
+        return len(self.values)
+
+    def draw(self, rng):
+        return rng.choice(self.values)
+
+    def draw_many(self, rng, count):
+        import numpy
+        return numpy.array(self.values)[rng.integers(0, len(self), count)]
+
+
+class GeneratedQuestion:
+    """A generated question with the same attributes as a bank Question"""
+    __slots__ = ('id', 'language', 'correct_index', 'question', 'options',
+                 'explanation', 'canonical')
+
+    def __init__(self, question_id, language, canonical, question, options, correct_index, explanation):
+        self.id = question_id
+        self.language = language
+        self.canonical = canonical
+        self.question = question
+        self.options = options
+        self.correct_index = correct_index
+        self.explanation = explanation
+
+    def to_record(self):
+        return {
+            'id': self.id,
+            'question': self.question,
+            'options': self.options,
+            'correct_index': self.correct_index,
+            'explanation': self.explanation,
+        }
+
+
+class Template:
+    """Declarative question template.
+
+    ``question`` and ``explanation`` are format strings over the parameter
+    names and ``answer``.  ``answer(p)`` computes the correct value and
+    ``distractors(p)`` returns candidate wrong values (formulas or
+    constants); candidates equal to the answer or to each other are
+    skipped.  ``where(p)`` optionally rejects parameter combinations.
+    """
+    def __init__(self, key, language, params, question, answer, distractors,
+                 explanation, option='{}', where=None, commutative=()):
+        self.key = key
+        self.language = language
+        self.params = params
+        self.question = question
+        self.answer = answer
+        self.distractors = distractors
+        self.explanation = explanation
+        self.option = option
+        self.where = where
+        self.commutative = tuple(commutative)
+
+    def size(self):
+        """Upper bound on the number of distinct instances"""
+        size = 1
+        for param in self.params:
+            size *= len(param)
+        return size
+
+    def draw(self, rng):
+        """Draw one canonical parameter dict, or None if ``where`` rejects it"""
+        values = {param.name: param.draw(rng) for param in self.params}
+        if self.commutative:
+            ordered = sorted(values[name] for name in self.commutative)
+            values.update(zip(self.commutative, ordered))
+        if self.where is not None and not self.where(values):
+            return None
+        return values
+
+    def draw_many(self, rng, count):
+        """Draw ``count`` canonical parameter columns as NumPy arrays"""
+        import numpy
+        columns = {param.name: param.draw_many(rng, count) for param in self.params}
+        if self.commutative:
+            ordered = numpy.sort(numpy.stack([columns[name] for name in self.commutative]), axis=0)
+            columns.update(zip(self.commutative, ordered))
+        if self.where is not None:
+            keep = numpy.asarray(self.where(columns), dtype=bool)
+            columns = {name: column[keep] for name, column in columns.items()}
+        return columns
+
+    def canonical(self, values):
+        return (self.key,) + tuple(_plain(values[param.name]) for param in self.params)
+
+    def instance(self, values, answer=None, candidates=None):
+        """Build the question for one canonical parameter dict.
+
+        ``answer`` and ``candidates`` can be passed in when they were
+        already computed for a whole batch.
+        """
+        values = {name: _plain(value) for name, value in values.items()}
+        canonical = self.canonical(values)
+        if answer is None:
+            answer = self.answer(values)
+            candidates = self.distractors(values)
+        answer = _plain(answer)
+
+        correct = self.option.format(answer)
+        options = [correct]
+        for candidate in candidates:
+            text = self.option.format(_plain(candidate))
+            if text not in options:
+                options.append(text)
+                if len(options) == 4:
+                    break
+        # Numeric answers can always be padded with nearby values
+        offset = 1
+        while len(options) < 4:
+            text = self.option.format(answer + offset)
+            if text not in options:
+                options.append(text)
+            offset = -offset if offset > 0 else 1 - offset
+
+        # Shuffle deterministically so an instance always looks the same
+        digest = zlib.crc32(repr(canonical).encode('utf-8'))
+        options = [options[i] for i in ORDERS[digest % len(ORDERS)]]
+        return GeneratedQuestion(
+            GENERATED_ID_BIT | (digest & 0x7FFFFFFF),
+            self.language,
+            canonical,
+            self.question.format(answer=answer, **values),
+            options,
+            options.index(correct),
+            self.explanation.format(answer=answer, **values),
+        )
+
+
+TEMPLATES = [
+    # Python
+    Template(
+        'python.modulo', 'python',
+        [IntParam('a', 10, 999), IntParam('b', 2, 9)],
+        "What is the result of {a} % {b}?",
+        lambda p: p['a'] % p['b'],
+        lambda p: [(p['a'] + 1) % p['b'], p['a'] // p['b'], p['b'] - p['a'] % p['b']],
+        "The modulus operator (%) returns the remainder of division. "
+        "{a} divided by {b} has a remainder of {answer}.",
+    ),
+    Template(
+        'python.floordiv', 'python',
+        [IntParam('a', 10, 999), IntParam('b', 2, 9)],
+        "What is the result of {a} // {b}?",
+        lambda p: p['a'] // p['b'],
+        lambda p: [p['a'] // p['b'] + 1, p['a'] % p['b'], p['a'] * p['b']],
+        "The // operator divides and rounds down to a whole number, so {a} // {b} is {answer}.",
+    ),
+    Template(
+        'python.range_len', 'python',
+        [IntParam('start', 0, 10), IntParam('stop', 11, 40), IntParam('step', 1, 5)],
+        "What is len(range({start}, {stop}, {step}))?",
+        lambda p: (p['stop'] - p['start'] + p['step'] - 1) // p['step'],
+        lambda p: [(p['stop'] - p['start']) // p['step'] + 1, p['stop'] - p['start'],
+                   (p['stop'] - p['start'] + p['step'] - 1) // p['step'] - 1],
+        "range({start}, {stop}, {step}) starts at {start} and stops before {stop}, "
+        "stepping by {step}, which gives {answer} numbers.",
+    ),
+    Template(
+        'python.list_comp_last', 'python',
+        [IntParam('n', 2, 20), IntParam('k', 2, 9)],
+        "What is [i * {k} for i in range({n})][-1]?",
+        lambda p: (p['n'] - 1) * p['k'],
+        lambda p: [p['n'] * p['k'], p['n'] - 1, p['k']],
+        "range({n}) ends at {n} - 1, so the last element is ({n} - 1) * {k} = {answer}.",
+    ),
+    # JavaScript
+    Template(
+        'js.pow', 'js',
+        [IntParam('base', 2, 5), IntParam('exp', 1, 4)],
+        "What is the result of Math.pow({base}, {exp})?",
+        lambda p: p['base'] ** p['exp'],
+        lambda p: [p['base'] * p['exp'], p['base'] ** (p['exp'] + 1), p['exp'] ** p['base']],
+        "Math.pow({base}, {exp}) calculates {base} to the power of {exp}, which is {answer}.",
+    ),
+    Template(
+        'js.string_times', 'js',
+        [IntParam('a', 2, 99), IntParam('b', 2, 9)],
+        'What is the result of "{a}" * {b}?',
+        lambda p: p['a'] * p['b'],
+        lambda p: [p['a'] * 10 + p['b'], p['a'] + p['b'], 'NaN'],
+        'The * operator converts the string "{a}" to a number, so the result is {a} * {b} = {answer}.',
+    ),
+    Template(
+        'js.floor_div', 'js',
+        [IntParam('a', 10, 999), IntParam('b', 2, 9)],
+        "What is the result of Math.floor({a} / {b})?",
+        lambda p: p['a'] // p['b'],
+        lambda p: [p['a'] // p['b'] + 1, p['a'] % p['b'], p['a'] - p['b']],
+        "{a} / {b} is a fraction in JavaScript; Math.floor rounds it down to {answer}.",
+    ),
+    # C++
+    Template(
+        'cpp.shift', 'cpp',
+        [IntParam('a', 1, 99), IntParam('s', 1, 4)],
+        "What is the value of {a} << {s}?",
+        lambda p: p['a'] << p['s'],
+        lambda p: [p['a'] >> p['s'], p['a'] << (p['s'] + 1), p['a'] * p['s']],
+        "The << operator shifts left; {a} << {s} is {a} multiplied by 2 to the power of {s}, which is {answer}.",
+    ),
+    Template(
+        'cpp.int_div', 'cpp',
+        [IntParam('a', 10, 999), IntParam('b', 2, 9)],
+        "What is the value of {a} / {b} when both are int?",
+        lambda p: p['a'] // p['b'],
+        lambda p: [p['a'] // p['b'] + 1, p['a'] % p['b'], p['a'] * p['b']],
+        "Integer division truncates toward zero, so {a} / {b} is {answer}.",
+    ),
+    Template(
+        'cpp.xor', 'cpp',
+        [IntParam('a', 1, 63), IntParam('b', 1, 63)],
+        "What is the value of {a} ^ {b}?",
+        lambda p: p['a'] ^ p['b'],
+        lambda p: [p['a'] | p['b'], p['a'] & p['b'], p['a'] + p['b']],
+        "^ is bitwise XOR, not a power: it keeps the bits set in exactly one of "
+        "{a} and {b}, which gives {answer}.",
+        where=lambda p: p['a'] != p['b'],
+        commutative=('a', 'b'),
+    ),
+    Template(
+        'cpp.sizeof_array', 'cpp',
+        [IntParam('n', 2, 64)],
+        "With a 4-byte int, what is sizeof(int[{n}])?",
+        lambda p: p['n'] * 4,
+        lambda p: [p['n'], p['n'] * 8, p['n'] * 4 + 4],
+        "sizeof gives the size in bytes: {n} ints of 4 bytes each take {answer} bytes.",
+    ),
+    # React
+    Template(
+        'react.updater', 'react',
+        [IntParam('start', 0, 9), IntParam('k', 1, 5), IntParam('n', 2, 5)],
+        "count is {start}. An event handler calls setCount(c => c + {k}) {n} times. "
+        "What is count after the next render?",
+        lambda p: p['start'] + p['k'] * p['n'],
+        lambda p: [p['start'] + p['k'], p['start'], p['start'] + p['n']],
+        "Updater functions are queued and each receives the previous result, "
+        "so count becomes {start} + {k} * {n} = {answer}.",
+    ),
+    Template(
+        'react.stale_state', 'react',
+        [IntParam('start', 0, 9), IntParam('k', 1, 5), IntParam('n', 2, 5)],
+        "count is {start}. An event handler calls setCount(count + {k}) {n} times. "
+        "What is count after the next render?",
+        lambda p: p['start'] + p['k'],
+        lambda p: [p['start'] + p['k'] * p['n'], p['start'], p['start'] + p['n']],
+        "Every call reads the same count from this render, so each one sets "
+        "it to {start} + {k} = {answer}.",
+    ),
+    Template(
+        'react.map_items', 'react',
+        [IntParam('n', 1, 12), ChoiceParam('tag', ['li', 'option', 'tr'])],
+        "How many <{tag}> elements does [...Array({n}).keys()].map(i => <{tag} key={{i}} />) render?",
+        lambda p: p['n'],
+        lambda p: [p['n'] - 1, p['n'] + 1, 0],
+        "Array({n}).keys() yields the indexes 0 to {n} - 1, so map renders {answer} elements.",
+    ),
+]
+
+
+class QuestionGenerator:
+    """Draws unique template instances per language"""
+    def __init__(self, templates=TEMPLATES, max_attempts=50):
+        self.templates = {}
+        self.by_key = {}
+        for template in templates:
+            self.templates.setdefault(template.language, []).append(template)
+            self.by_key[template.key] = template
+        self.max_attempts = max_attempts
+
+    @property
+    def languages(self):
+        return list(self.templates)
+
+    def rebuild(self, canonical):
+        """Recreate a question from its ``canonical`` form, or None if its template is gone"""
+        template = self.by_key.get(canonical[0])
+        if template is None or len(canonical) != len(template.params) + 1:
+            return None
+        return template.instance(dict(zip([param.name for param in template.params], canonical[1:])))
+
+    def stream(self, language, rng=None):
+        """Yield fresh instances for ``language`` until its templates run out"""
+        rng = rng or random.Random()
+        templates = list(self.templates.get(language, []))
+        counts = {template.key: 0 for template in templates}
+        seen = set()
+        while templates:
+            template = rng.choice(templates)
+            for _ in range(self.max_attempts):
+                values = template.draw(rng)
+                if values is not None:
+                    canonical = template.canonical(values)
+                    if canonical not in seen:
+                        break
+            else:
+                # Nearly every draw repeats: treat the template as used up
+                templates.remove(template)
+                continue
+            seen.add(canonical)
+            counts[template.key] += 1
+            if counts[template.key] >= template.size():
+                templates.remove(template)
+            yield template.instance(values)
+
+    def batch(self, language, count, seed=None):
+        """Return up to ``count`` unique instances, computed with NumPy if available"""
+        try:
+            import numpy
+        except ImportError:
+            stream = self.stream(language, random.Random(seed))
+            return [question for question, _ in zip(stream, range(count))]
+
+        rng = numpy.random.default_rng(seed)
+        templates = list(self.templates.get(language, []))
+        questions = []
+        seen = set()
+        while templates and len(questions) < count:
+            share = -(-(count - len(questions)) // len(templates))
+            for template in list(templates):
+                made = self._batch_template(template, rng, share, seen, questions)
+                if made == 0:
+                    templates.remove(template)
+        return questions[:count]
+
+    def _batch_template(self, template, rng, count, seen, questions):
+        # Answers and distractors are computed for whole columns at once;
+        # only the text formatting runs per instance
+        import numpy
+        columns = template.draw_many(rng, count * 2)
+        answers = numpy.broadcast_to(template.answer(columns), len(next(iter(columns.values()))))
+        candidates = [numpy.broadcast_to(numpy.asarray(c, dtype=object), answers.shape)
+                      for c in template.distractors(columns)]
+        names = list(columns)
+        made = 0
+        for row in range(len(answers)):
+            values = {name: columns[name][row] for name in names}
+            canonical = template.canonical(values)
+            if canonical in seen:
+                continue
+            seen.add(canonical)
+            questions.append(template.instance(values, answers[row], [c[row] for c in candidates]))
+            made += 1
+            if made == count:
+                break
+        return made
+
+
+if __name__ == '__main__':
+    generator = QuestionGenerator()
+    parser = argparse.ArgumentParser(description="Export generated questions as JSON Lines")
+    parser.add_argument('language', choices=generator.languages)
+    parser.add_argument('--count', type=int, default=1000)
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    for question in generator.batch(args.language, args.count, args.seed):
+        sys.stdout.write(json.dumps(question.to_record()) + '\n')
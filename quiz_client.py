@@ -0,0 +1,288 @@
+"""Thin client for the quiz server.
+
+With ``QUIZ_SERVER=host:port`` set, the app plays its sessions on the
+server (``quiz_server.py``) instead of its own banks.  Answers are
+stored under ``QUIZ_LEARNER``, or the device's host name.  If the server
+cannot be reached, or no longer knows the session (it expired, or the
+server restarted), the app falls back to its own banks, also in the
+middle of a session.
+
+``RemoteSession`` has the same interface as ``QuizSession``, so the quiz
+screen doesn't care where a session runs; it only makes the calls that
+reach the server off the UI thread.
+
+    python quiz_client.py                  # a session against a stand-in server
+    python quiz_client.py localhost:8765   # or against a running one
+"""
+import argparse
+import json
+import logging
+import os
+import socket
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+TIMEOUT = 2.0
+# After failing to reach the server, don't try again for this long
+RETRY_INTERVAL = 30.0
+
+
+class ServerError(Exception):
+    """The server refused a request"""
+
+
+class QuizClient:
+    """Connection to a quiz server, opened on first use and after failures.
+
+    Calls may come from any thread; they are sent one at a time.
+    """
+    def __init__(self, host, port, learner=None, timeout=TIMEOUT, retry_interval=RETRY_INTERVAL):
+        self.host = host
+        self.port = port
+        self.learner = learner or os.environ.get('QUIZ_LEARNER') or socket.gethostname()
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self._socket = None
+        self._file = None
+        self._lock = threading.Lock()
+        self._down_until = 0.0
+
+    @classmethod
+    def from_address(cls, address, **kwargs):
+        """Create a client for a 'host:port' address"""
+        host, _, port = address.rpartition(':')
+        return cls(host or 'localhost', int(port), **kwargs)
+
+    def call(self, op, **fields):
+        """Send one request and return the server's response.
+
+        Raises ``OSError`` when the server can't be reached (at once, for
+        ``retry_interval`` seconds after a connection attempt failed) and
+        ``ServerError`` when it refused the request.
+        """
+        with self._lock:
+            if time.monotonic() < self._down_until:
+                raise ConnectionError("the server was unreachable moments ago")
+            connecting = self._file is None
+            try:
+                if connecting:
+                    self._socket = socket.create_connection((self.host, self.port), self.timeout)
+                    self._file = self._socket.makefile('rwb')
+                self._file.write(json.dumps(dict(fields, op=op)).encode('utf-8') + b'\n')
+                self._file.flush()
+                line = self._file.readline()
+                if not line:
+                    raise ConnectionError("the server closed the connection")
+            except OSError:
+                # Reconnect with the next request; if the server is away,
+                # fail fast until it had time to come back
+                self._close()
+                if connecting:
+                    self._down_until = time.monotonic() + self.retry_interval
+                raise
+        response = json.loads(line)
+        if not response.pop('ok', False):
+            raise ServerError(response.get('error', 'request failed'))
+        return response
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+                self._socket.close()
+            except OSError:
+                pass
+            self._file = None
+            self._socket = None
+
+
+class RemoteQuestion:
+    """A question as the server sent it.
+
+    ``correct_index`` and ``explanation`` stay None until the server
+    tells them, in its response to the answer.
+    """
+    __slots__ = ('id', 'language', 'question', 'options', 'correct_index', 'explanation')
+
+    def __init__(self, payload):
+        for name in ('id', 'language', 'question', 'options'):
+            setattr(self, name, payload[name])
+        self.correct_index = None
+        self.explanation = None
+
+
+class RemoteSession:
+    """A quiz session run by the server.
+
+    If the server goes away or refuses a request, the session carries on
+    with a local ``QuizSession`` made by ``fallback()``, keeping its score;
+    without a fallback the error is raised.
+    """
+    current_index = None
+
+    def __init__(self, client, language, mode, max_questions=10, fallback=None, clock=time.monotonic):
+        self.client = client
+        self.language = language
+        self.max_questions = max_questions
+        self.fallback = fallback
+        self.clock = clock
+        self.local = None
+        self._current_question = None
+        self._revealed = None
+        self.shown_at = None
+        self._answered = 0
+        self._score = 0
+        self._finished = False
+        response = client.call('start', learner=client.learner, language=language,
+                               mode=mode, max_questions=max_questions)
+        self.token = response['session']
+        self.upcoming = self._prepare(response['question'])
+
+    @staticmethod
+    def _prepare(payload):
+        question = RemoteQuestion(payload)
+        return None, question, question.question, question.options
+
+    def _go_local(self, error):
+        if self.fallback is None:
+            raise error
+        logger.warning("Quiz server unavailable (%s); continuing offline", error)
+        local = self.local = self.fallback()
+        local.max_questions = self.max_questions
+        local.answered = self._answered
+        local.score = self._score
+        question = self._current_question
+        if question is not None and question.correct_index is None:
+            # The server never told its answer; score it with the local
+            # bank's copy.  Generated questions aren't there, and can't be
+            # scored any more.
+            question = local.questions.find(question.id) or question
+        local.current_question = question
+        local.current_index = None
+        local.shown_at = self.shown_at
+        return local
+
+    @property
+    def sampler(self):
+        return self.local.sampler if self.local is not None else None
+
+    @property
+    def current_question(self):
+        return self.local.current_question if self.local is not None else self._current_question
+
+    @property
+    def revealed(self):
+        return self.local.revealed if self.local is not None else self._revealed
+
+    @property
+    def answered(self):
+        return self.local.answered if self.local is not None else self._answered
+
+    @property
+    def score(self):
+        return self.local.score if self.local is not None else self._score
+
+    @property
+    def finished(self):
+        if self.local is not None:
+            return self.local.finished
+        return self._finished
+
+    def restart(self):
+        if self.local is not None:
+            return self.local.restart()
+        try:
+            response = self.client.call('restart', session=self.token)
+        except (OSError, ServerError) as e:
+            return self._go_local(e).restart()
+        self._answered = 0
+        self._score = 0
+        self._finished = False
+        self.upcoming = self._prepare(response['question'])
+
+    def prefetch(self):
+        # The next question already came back with the last answer
+        if self.local is not None:
+            return self.local.prefetch()
+        return self.upcoming
+
+    def load_question(self):
+        if self.local is not None:
+            return self.local.load_question()
+        prepared = self.upcoming
+        self.upcoming = None
+        self._current_question = prepared[1]
+        self._revealed = None
+        self.shown_at = self.clock()
+        return prepared
+
+    def answer(self, chosen, latency=None):
+        if self.local is not None:
+            return self.local.answer(chosen, latency)
+        if latency is None:
+            latency = self.clock() - self.shown_at
+        try:
+            response = self.client.call('answer', session=self.token, chosen=chosen, latency=latency)
+        except (OSError, ServerError) as e:
+            return self._go_local(e).answer(chosen, latency)
+        self._answered = response['answered']
+        self._score = response['score']
+        self._finished = response['finished']
+        question = self._current_question
+        question.correct_index = response['correct_index']
+        question.explanation = response['explanation']
+        self._revealed = (question.correct_index, question.explanation)
+        if response['next'] is not None:
+            self.upcoming = self._prepare(response['next'])
+        return response['correct']
+
+    def end(self):
+        """Tell the server the session is over; it would expire anyway"""
+        if self.local is None:
+            try:
+                self.client.call('end', session=self.token)
+            except (OSError, ServerError):
+                pass
+
+
+def play(client, language=None):
+    """Answer one session at random and print how it went"""
+    import random
+
+    languages = client.call('hello')['languages']
+    language = language or sorted(languages)[0]
+    session = RemoteSession(client, language, 'shuffle')
+    while not session.finished:
+        index, question, text, options = session.load_question()
+        correct = session.answer(random.randrange(len(options)))
+        print(f"{'right' if correct else 'wrong'}  {text}")
+    print(f"Score: {session.score}/{session.answered}")
+    session.end()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Play a quiz session on a quiz server")
+    parser.add_argument('address', nargs='?', help='host:port (default: start a stand-in server)')
+    parser.add_argument('--language')
+    args = parser.parse_args()
+
+    if args.address:
+        play(QuizClient.from_address(args.address), args.language)
+    else:
+        import tempfile
+        from answer_store import SQLiteStore
+        from question_bank import open_bank
+        from quiz_server import BackgroundServer, QuizServer
+
+        with tempfile.TemporaryDirectory() as directory:
+            store = SQLiteStore(os.path.join(directory, 'answers.db'))
+            with BackgroundServer(QuizServer(open_bank(), store)) as (host, port):
+                client = QuizClient(host, port)
+                play(client, args.language)
+            print(f"Stored {sum(1 for _ in store.answers(client.learner))} answers")
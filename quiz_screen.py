@@ -0,0 +1,613 @@
+"""Quiz screen and its popups.
+
+This module is only imported when the quiz screen is first opened, so
+none of it is paid for before the language picker is on screen.
+"""
+import threading
+from functools import partial
+
+from kivy.clock import Clock, mainthread
+from kivy.core.window import Window
+from kivy.graphics import Color, Rectangle
+from kivy.logger import Logger
+from kivy.metrics import dp
+from kivy.properties import StringProperty, NumericProperty, BooleanProperty
+from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.gridlayout import GridLayout
+from kivy.uix.label import Label
+from kivy.uix.modalview import ModalView
+from kivy.uix.screenmanager import Screen
+from kivy.uix.widget import Widget
+
+from emoji_atlas import EmojiBatch, EmojiRow
+from instrumentation import timed
+from quiz_client import RemoteSession, ServerError
+from quiz_session import QuizSession
+from sampler import make_sampler
+from session_snapshot import capture, restore
+from widgets import CachedLabel, CachedTextureMixin, RoundedButton, text_cache
+
+# Emoji with the result, and on the right and the wrongly chosen option
+RIGHT_REACTION = '🎉'
+WRONG_REACTION = '🤔'
+RIGHT_OPTION = '👍'
+WRONG_OPTION = '👎'
+
+class OptionButton(CachedTextureMixin, RoundedButton):
+    """Custom button for answer options"""
+    is_correct = BooleanProperty(False)
+    index = NumericProperty(0)
+    
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.size_hint = (1, None)
+        self.height = 70
+        self.width = 400
+        self.markup = True
+        self.button_color = [0.9, 0.9, 0.9, 1]
+        self.color = (0.2, 0.2, 0.2, 1)
+        
+    def on_press(self):
+        # Don't animate option buttons on press
+        pass
+
+class ProgressStrip(Widget):
+    """Row of progress segments drawn as canvas instructions.
+
+    Segments are kept between sessions: ``reset`` only recolors them (and
+    adds instructions when a longer session needs more), and
+    ``set_segment`` changes a single segment's color in place.
+    """
+    UNANSWERED = (0.8, 0.8, 0.8, 1)  # Light gray
+    spacing = NumericProperty(2)
+    
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.count = 0
+        self.segment_colors = []
+        self.segment_rects = []
+        self.bind(pos=self.update_rects, size=self.update_rects, spacing=self.update_rects)
+    
+    def reset(self, count):
+        while len(self.segment_rects) < count:
+            color = Color(rgba=self.UNANSWERED)
+            rect = Rectangle()
+            self.canvas.add(color)
+            self.canvas.add(rect)
+            self.segment_colors.append(color)
+            self.segment_rects.append(rect)
+        
+        for color in self.segment_colors:
+            color.rgba = self.UNANSWERED
+        
+        if count != self.count:
+            self.count = count
+            self.update_rects()
+    
+    def set_segment(self, index, rgba):
+        if 0 <= index < self.count:
+            self.segment_colors[index].rgba = rgba
+    
+    def update_rects(self, *args):
+        if not self.count:
+            return
+        width = (self.width - self.spacing * (self.count - 1)) / self.count
+        for i, rect in enumerate(self.segment_rects):
+            if i < self.count:
+                rect.pos = (self.x + i * (width + self.spacing), self.y)
+                rect.size = (width, self.height)
+            else:
+                # Spare segments from a longer session stay hidden
+                rect.size = (0, 0)
+
+class ResultView(ModalView):
+    """Popup telling whether an answer was right, with its explanation"""
+    def __init__(self, **kwargs):
+        super().__init__(size_hint=(0.8, 0.6), background='', auto_dismiss=False, **kwargs)
+        result_layout = BoxLayout(orientation='vertical', padding=20, spacing=20)
+        
+        self.reaction = EmojiRow(emoji_size=dp(48), size_hint=(1, 0.15))
+        result_layout.add_widget(self.reaction)
+        
+        self.result_label = CachedLabel(
+            font_size='24sp', 
+            bold=True,
+            size_hint=(1, 0.15)
+        )
+        result_layout.add_widget(self.result_label)
+        
+        self.explanation_label = CachedLabel(
+            font_size='18sp',
+            text_size=(Window.width * 0.7, None),
+            halign='center',
+            size_hint=(1, 0.4)
+        )
+        self.explanation_label.bind(size=self.explanation_label.setter('text_size'))
+        result_layout.add_widget(self.explanation_label)
+        
+        # Next question button inside popup
+        self.next_button = RoundedButton(
+            text='Next Question',
+            size_hint=(0.6, 0.2)
+        )
+        
+        button_container = BoxLayout(size_hint=(1, 0.3))
+        button_container.add_widget(Label())  # Spacer
+        button_container.add_widget(self.next_button)
+        button_container.add_widget(Label())  # Spacer
+        
+        result_layout.add_widget(button_container)
+        self.add_widget(result_layout)
+
+class FinalScoreView(ModalView):
+    """Popup with the score at the end of a session"""
+    def __init__(self, **kwargs):
+        super().__init__(size_hint=(0.8, 0.6), background='', **kwargs)
+        layout = BoxLayout(orientation='vertical', padding=20, spacing=20)
+        
+        self.score_label = Label(
+            font_size='24sp',
+            bold=True,
+            color=(0.2, 0.2, 0.2, 1)
+        )
+        layout.add_widget(self.score_label)
+        
+        self.message_label = Label(font_size='20sp')
+        layout.add_widget(self.message_label)
+        
+        button_layout = BoxLayout(size_hint=(1, 0.3), spacing=10)
+        
+        self.retry_btn = RoundedButton(text='Try Again')
+        button_layout.add_widget(self.retry_btn)
+        
+        self.menu_btn = RoundedButton(text='Back to Menu')
+        button_layout.add_widget(self.menu_btn)
+        
+        layout.add_widget(button_layout)
+        self.add_widget(layout)
+
+class QuizScreen(Screen):
+    """Screen for displaying and answering quiz questions"""
+    question_text = StringProperty('')
+    score = NumericProperty(0)
+    total_questions = NumericProperty(0)
+    
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.session = None
+        self.visit = 0  # counts screen entries and exits, to drop late server replies
+        self.chosen = -1  # option picked for the current question, once answered
+        self.staging = []
+        self.option_buttons = []
+        self.max_questions = 10  # Number of questions per session
+        self.generated_share = 0.5  # Chance that a question comes from the generator
+        
+        # Main layout
+        main_layout = BoxLayout(orientation='vertical', padding=20, spacing=20)
+        
+        # Header with score and back button
+        header = BoxLayout(size_hint=(1, 0.1), spacing=10)
+        
+        self.back_btn = RoundedButton(
+            text='← Back to Menu',
+            size_hint=(0.3, 1)
+        )
+        self.back_btn.bind(on_release=self.go_back)
+        header.add_widget(self.back_btn)
+        
+        self.score_label = Label(
+            text='Score: 0/0',
+            size_hint=(0.4, 1),
+            color=(0.2, 0.2, 0.2, 1),
+            font_size='18sp'
+        )
+        header.add_widget(self.score_label)
+        
+        self.language_label = Label(
+            text='Python',
+            size_hint=(0.3, 1),
+            color=(0.2, 0.2, 0.2, 1),
+            font_size='18sp',
+            bold=True
+        )
+        header.add_widget(self.language_label)
+        
+        main_layout.add_widget(header)
+        
+        # Progress bar
+        self.progress_strip = ProgressStrip(size_hint=(1, 0.05), spacing=2)
+        main_layout.add_widget(self.progress_strip)
+        
+        # Question area
+        question_container = BoxLayout(orientation='vertical', size_hint=(1, 0.3))
+        question_container.add_widget(Label(
+            text='Question:',
+            size_hint=(1, 0.2),
+            color=(0.3, 0.3, 0.3, 1),
+            font_size='16sp'
+        ))
+        
+        self.question_label = CachedLabel(
+            text='Question will appear here',
+            font_size='22sp',
+            size_hint=(1, 0.8),
+            color=(0.2, 0.2, 0.2, 1),
+            text_size=(Window.width - 40, None),
+            halign='center',
+            valign='middle',
+            markup=True
+        )
+        self.question_label.bind(size=self.question_label.setter('text_size'))
+        question_container.add_widget(self.question_label)
+        
+        main_layout.add_widget(question_container)
+        
+        # Options area
+        options_layout = GridLayout(cols=1, spacing=15, size_hint=(1, 0.55), padding=10)
+        self.option_buttons = []
+        
+        for i in range(4):
+            btn = OptionButton()
+            btn.index = i
+            btn.bind(on_release=self.check_answer)
+            options_layout.add_widget(btn)
+            self.option_buttons.append(btn)
+            
+        # Reactions on the options, all drawn as one batch
+        self.reactions = EmojiBatch(dp(28))
+        self.reacted = []  # (button, emoji)
+        options_layout.canvas.after.add(self.reactions)
+        self.reaction_trigger = Clock.create_trigger(self.draw_reactions)
+        for btn in self.option_buttons:
+            btn.bind(pos=self.reaction_trigger, size=self.reaction_trigger)
+        main_layout.add_widget(options_layout)
+        
+        self.add_widget(main_layout)
+        
+        # Result and final score popups come from the shared widget pool
+        self.result_popup = None
+        self.final_view = None
+        self.prerender_trigger = Clock.create_trigger(self.prerender_result, 0.1)
+        self.stage_trigger = Clock.create_trigger(self.stage_next)
+    
+    def build_result_popup(self):
+        popup = ResultView()
+        popup.next_button.bind(on_release=self.next_question)
+        return popup
+    
+    def build_final_view(self):
+        final_view = FinalScoreView()
+        final_view.retry_btn.bind(on_release=self.retry_from_final)
+        final_view.menu_btn.bind(on_release=self.menu_from_final)
+        return final_view
+    
+    def on_enter(self):
+        pool = self.manager.widget_pool
+        if 'result' not in pool:
+            pool.register('result', self.build_result_popup)
+            pool.register('final_score', self.build_final_view)
+        
+        self.visit += 1
+        self.score = 0
+        self.total_questions = 0
+        # Each visit to the quiz screen is a new session with its own
+        # sampler, unless it picks up a round the app was killed during
+        language = self.manager.current_language
+        resume, self.manager.resume = self.manager.resume, None
+        if resume is not None and resume.language == language:
+            self.resume_session(resume)
+            return
+        if self.manager.quiz_client is not None:
+            self.session = None
+            self.show_waiting('Connecting to the quiz server...')
+            self.in_background(partial(self.remote_session, language), self.start_session)
+        else:
+            self.start_session(self.local_session(language))
+    
+    def start_session(self, session):
+        self.session = session
+        self.staging = []
+        self.update_progress_bars()
+        self.load_question()
+    
+    def show_waiting(self, text):
+        self.staging = []
+        self.question_label.text = text
+        for btn in self.option_buttons:
+            btn.text = ''
+            btn.disabled = True
+        if self.reacted:
+            self.reacted = []
+            self.reactions.draw([])
+    
+    def in_background(self, call, done):
+        # Round trips to the quiz server run off the UI thread; ``done``
+        # gets the result on it, unless the screen was left meanwhile
+        visit = self.visit
+        def run():
+            try:
+                result = call()
+            except Exception as e:
+                self.background_done(visit, done, None, e)
+            else:
+                self.background_done(visit, done, result, None)
+        threading.Thread(target=run, name='quiz-client', daemon=True).start()
+    
+    @mainthread
+    def background_done(self, visit, done, result, error):
+        if error is not None:
+            raise error
+        if visit == self.visit:
+            done(result)
+    
+    def resume_session(self, snapshot):
+        language = snapshot.language
+        self.session = self.local_session(language)
+        restore(snapshot, self.session, self.manager.questions[language], self.manager.generator)
+        self.staging = []
+        self.progress_strip.reset(self.session.max_questions)
+        for i, correct in enumerate(self.session.results):
+            self.progress_strip.set_segment(i, self.progress_color(correct))
+        self.score = self.session.score
+        self.total_questions = self.session.answered
+        self.score_label.text = f'Score: {self.score}/{self.total_questions}'
+        self.load_question()
+    
+    def save_snapshot(self):
+        """Save the round so far, to resume it if the app is killed"""
+        # Rounds on the quiz server are kept by the server
+        if self.session is None or isinstance(self.session, RemoteSession):
+            return
+        if self.session.finished:
+            self.manager.snapshots.clear()
+        else:
+            self.manager.snapshots.save(capture(self.session, self.manager.sampler_mode, self.chosen))
+        
+    def local_session(self, language):
+        questions = self.manager.questions[language]
+        if self.manager.sampler_mode == 'adaptive':
+            sampler = self.ability_model().sampler(language, questions)
+        else:
+            sampler = make_sampler(self.manager.sampler_mode, len(questions))
+        return QuizSession(language, questions, sampler, self.manager.generator,
+                           self.manager.answer_log, self.max_questions, self.generated_share)
+    
+    def remote_session(self, language):
+        # Play on the quiz server, or on the local banks while it is away
+        try:
+            return RemoteSession(self.manager.quiz_client, language, self.manager.sampler_mode,
+                                 self.max_questions, lambda: self.local_session(language))
+        except (OSError, ServerError) as e:
+            Logger.warning(f'QuizClient: server unavailable, playing offline ({e})')
+            return self.local_session(language)
+        
+    def ability_model(self):
+        # The adaptive engine needs NumPy, so it is only loaded once used
+        if self.manager.ability is None:
+            from adaptive import AbilityModel
+            self.manager.ability = AbilityModel(self.manager.ability_path)
+        return self.manager.ability
+        
+    def bank_changed(self, change):
+        # The question on screen stays as it was shown; new questions join
+        # the sampler, removed ones leave it, and a prefetched one that
+        # changed is picked again
+        session = self.session
+        if isinstance(session, RemoteSession):
+            session = session.local
+        if session is None or session.language != change.language:
+            return
+        session.questions_changed()
+        changed = set(change.removed)
+        changed.update(question.id for question in change.added + change.modified)
+        upcoming = session.upcoming
+        if upcoming is not None and getattr(upcoming[1], 'canonical', None) is None and upcoming[1].id in changed:
+            session.upcoming = None
+            self.staging = []
+            if self.chosen >= 0:
+                self.prefetch_question()
+        
+    def update_progress_bars(self):
+        self.progress_strip.reset(self.max_questions)
+    
+    def progress_color(self, correct):
+        if correct:
+            return (0.4, 0.8, 0.4, 1)  # Green for correct
+        return (0.8, 0.4, 0.4, 1)  # Red for incorrect
+    
+    def update_progress(self, correct):
+        self.progress_strip.set_segment(self.session.answered - 1, self.progress_color(correct))
+        
+    def prefetch_question(self):
+        # Pick the next question while the result popup is read, and lay
+        # its text out over the next frames so Next only swaps it in
+        upcoming = self.session.prefetch()
+        if upcoming is None:
+            return
+        index, question, text, options = upcoming
+        self.staging = [(self.question_label, f'[b]{text}[/b]')]
+        self.staging += list(zip(self.option_buttons, options))
+        self.stage_trigger()
+    
+    def stage_next(self, dt):
+        # One label per frame, so the popup's animation keeps its frame rate
+        if self.staging:
+            label, text = self.staging.pop(0)
+            text_cache.prerender(label, text)
+        if self.staging:
+            self.stage_trigger()
+    
+    @timed()
+    def load_question(self):
+        self.language_label.text = self.manager.current_language.upper()
+        
+        self.staging = []
+        self.chosen = -1
+        index, question, text, options = self.session.load_question()
+        
+        self.question_label.text = f'[b]{text}[/b]'
+        
+        # Set options
+        for i, option in enumerate(options):
+            self.option_buttons[i].text = option
+            self.option_buttons[i].is_correct = False
+            self.option_buttons[i].button_color = [0.9, 0.9, 0.9, 1]
+            self.option_buttons[i].disabled = False
+        if self.reacted:
+            self.reacted = []
+            self.reactions.draw([])
+        self.prerender_trigger()
+    
+    def prerender_result(self, dt):
+        # Lay out the explanation while the question is on screen, so the
+        # result popup opens without rendering text.  Questions from the
+        # quiz server only bring their explanation with the answer.
+        question = self.session.current_question
+        if self.result_popup is not None and question is not None and question.explanation is not None:
+            text_cache.prerender(self.result_popup.explanation_label, self.explanation_text(question.explanation))
+    
+    def explanation_text(self, explanation):
+        return explanation if explanation else "Keep learning!"
+    
+    @timed()
+    def check_answer(self, instance):
+        # Disable all buttons to prevent multiple answers
+        for btn in self.option_buttons:
+            btn.disabled = True
+        
+        session = self.session
+        if isinstance(session, RemoteSession):
+            def answer():
+                return session.answer(instance.index), session.revealed
+            self.in_background(answer, partial(self.show_answer, instance))
+        else:
+            self.show_answer(instance, (session.answer(instance.index), session.revealed))
+    
+    def show_answer(self, instance, result):
+        # The correct answer is only known once the session scored this one
+        is_correct, (correct_index, explanation) = result
+        self.chosen = instance.index
+        self.reacted = []
+        # Highlight the correct answer
+        for i, btn in enumerate(self.option_buttons):
+            btn.is_correct = (i == correct_index)
+            if btn.is_correct:
+                btn.button_color = [0.4, 0.8, 0.4, 1]  # Green for correct
+                self.reacted.append((btn, RIGHT_OPTION))
+        if is_correct:
+            instance.button_color = [0.4, 0.8, 0.4, 1]  # Green
+        else:
+            instance.button_color = [0.8, 0.4, 0.4, 1]  # Red
+            self.reacted.append((instance, WRONG_OPTION))
+        self.draw_reactions()
+        self.show_result(is_correct, explanation)
+            
+        self.score = self.session.score
+        self.total_questions = self.session.answered
+        self.score_label.text = f'Score: {self.score}/{self.total_questions}'
+        self.update_progress(is_correct)
+        self.prefetch_question()
+        self.save_snapshot()
+    
+    def draw_reactions(self, *args):
+        if self.reacted:
+            size = self.reactions.size
+            self.reactions.draw([(emoji, btn.right - size - dp(12), btn.center_y - size / 2)
+                                 for btn, emoji in self.reacted])
+    
+    @timed()
+    def show_result(self, is_correct, explanation):
+        self.result_popup = self.manager.widget_pool.acquire('result')
+        
+        if is_correct:
+            self.result_popup.reaction.symbols = [RIGHT_REACTION]
+            self.result_popup.result_label.text = 'Correct!'
+            self.result_popup.result_label.color = (0.2, 0.6, 0.2, 1)
+        else:
+            self.result_popup.reaction.symbols = [WRONG_REACTION]
+            self.result_popup.result_label.text = 'Incorrect!'
+            self.result_popup.result_label.color = (0.8, 0.2, 0.2, 1)
+            
+        self.result_popup.explanation_label.text = self.explanation_text(explanation)
+        self.result_popup.open()
+    
+    @timed()
+    def next_question(self, instance):
+        self.result_popup.dismiss()
+        
+        if self.session.finished:
+            self.show_final_score()
+            return
+            
+        # Re-enable buttons for next question
+        for btn in self.option_buttons:
+            btn.disabled = False
+            
+        self.load_question()
+    
+    def show_final_score(self):
+        self.result_popup.dismiss()
+        self.manager.answer_log.flush()
+        
+        self.final_view = self.manager.widget_pool.acquire('final_score')
+        self.final_view.score_label.text = f'Final Score: {self.score}/{self.total_questions}'
+        
+        if self.score / self.total_questions >= 0.8:
+            message = "Excellent! You've mastered this language!"
+            color = (0.2, 0.6, 0.2, 1)
+        elif self.score / self.total_questions >= 0.6:
+            message = "Good job! Keep practicing!"
+            color = (0.3, 0.5, 0.8, 1)
+        else:
+            message = "Keep learning! You'll improve with practice."
+            color = (0.8, 0.4, 0.2, 1)
+        
+        if self.manager.sampler_mode == 'adaptive' and self.session.sampler is not None:
+            from adaptive import rating
+            self.manager.ability.save()
+            message += f'\nSkill rating: {rating(self.session.sampler.ability)}'
+            
+        self.final_view.message_label.text = message
+        self.final_view.message_label.color = color
+        self.final_view.open()
+    
+    def retry_from_final(self, instance):
+        self.final_view.dismiss()
+        self.restart_quiz()
+    
+    def menu_from_final(self, instance):
+        self.final_view.dismiss()
+        self.go_back(None)
+    
+    def restart_quiz(self):
+        self.session.max_questions = self.max_questions
+        if isinstance(self.session, RemoteSession):
+            self.show_waiting('Starting over...')
+            self.in_background(self.session.restart, self.restarted)
+        else:
+            self.session.restart()
+            self.restarted()
+    
+    def restarted(self, result=None):
+        self.score = 0
+        self.total_questions = 0
+        self.update_progress_bars()
+        self.load_question()
+        
+        # Re-enable buttons
+        for btn in self.option_buttons:
+            btn.disabled = False
+    
+    def go_back(self, instance):
+        self.manager.current = 'language'
+    
+    def on_leave(self):
+        # Good moment to write the session's answers out; the round is
+        # over, so there is nothing to resume either
+        self.manager.snapshots.clear()
+        self.visit += 1
+        if isinstance(self.session, RemoteSession):
+            threading.Thread(target=self.session.end, name='quiz-client', daemon=True).start()
+        self.manager.answer_log.flush()
+        if self.manager.ability is not None:
+            self.manager.ability.save()
@@ -0,0 +1,333 @@
+"""Local quiz server for a classroom.
+
+One server hosts the question banks and runs every learner's quiz
+session, so each device only needs a thin client (``quiz_client.py``).
+Clients speak JSON Lines over TCP: every request is one JSON object on a
+line and gets one line back.
+
+    {"op": "hello"}
+        -> {"ok": true, "languages": {"python": 10, ...}}
+    {"op": "start", "learner": "sam", "language": "python", "mode": "shuffle", "max_questions": 10}
+        -> {"ok": true, "session": "3f9c...", "question": {...}}
+    {"op": "answer", "session": "3f9c...", "chosen": 2, "latency": 4.2}
+        -> {"ok": true, "correct": true, "correct_index": 1, "explanation": "...",
+            "score": 3, "answered": 4, "finished": false, "next": {...}}
+    {"op": "restart", "session": "3f9c..."}
+        -> {"ok": true, "question": {...}}
+    {"op": "end", "session": "3f9c..."}
+        -> {"ok": true}
+
+Failed requests get ``{"ok": false, "error": "..."}``.  A question is sent
+as its id, language, text and options only; its correct option and
+explanation come back with the answer to it.  The next question comes
+back with every answer, so a client needs one round trip per question.  Answers are queued and written to the answer store (see
+``answer_store.py``) in batches, on a single writer thread.
+
+    python quiz_server.py --port 8765 --store sqlite
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from answer_store import STORES, open_store
+from question_bank import BASE_DIR, open_bank
+from question_generator import QuestionGenerator
+from quiz_session import QuizSession
+from sampler import SAMPLERS, make_sampler
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8765
+STORE_PATHS = {
+    'sqlite': os.path.join(BASE_DIR, 'answers.db'),
+    'file': os.path.join(BASE_DIR, 'answers'),
+}
+MAX_QUESTIONS = 100
+# Sessions nobody answered in this long are dropped
+SESSION_TIMEOUT = 3600
+
+
+class RequestError(Exception):
+    """A request the server cannot serve; the message goes back to the client"""
+
+
+def question_payload(prepared):
+    index, question, text, options = prepared
+    return {
+        'id': question.id,
+        'language': question.language,
+        'question': text,
+        'options': options,
+    }
+
+
+def _field(request, name, kinds, default=None):
+    value = request.get(name, default)
+    # bool is an int, but never a valid value here
+    if not isinstance(value, kinds) or isinstance(value, bool):
+        raise RequestError(f"missing or invalid {name!r}")
+    return value
+
+
+class PendingAnswers:
+    """Takes an ``AnswerLog``'s place in a session, queueing answers for the store"""
+    def __init__(self, server, learner):
+        self.server = server
+        self.learner = learner
+
+    def record(self, language, question_id, chosen, correct, latency):
+        self.server.queue_answer((self.learner, time.time(), language, question_id,
+                                  chosen, int(correct), latency))
+
+
+class QuizServer:
+    """Serves quiz sessions over the bank to any number of clients"""
+    def __init__(self, bank, store, generator=None, flush_interval=1.0, batch_size=256):
+        self.bank = bank
+        self.store = store
+        self.generator = generator if generator is not None else QuestionGenerator()
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.sessions = {}  # token -> [QuizSession, monotonic time last used]
+        self.pending = []
+        self.answers = 0
+        self._connections = {}  # handler task -> stream writer
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix='answer-store')
+        self._wake = None
+        self._server = None
+        self._flusher = None
+
+    async def start(self, host='127.0.0.1', port=DEFAULT_PORT):
+        """Start listening; returns the (host, port) actually bound"""
+        self._wake = asyncio.Event()
+        self._server = await asyncio.start_server(self.handle, host, port)
+        self._flusher = asyncio.create_task(self._flush_loop())
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def close(self):
+        """Stop serving and write out every queued answer"""
+        self._server.close()
+        await self._server.wait_closed()
+        for writer in self._connections.values():
+            writer.close()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        self._flusher.cancel()
+        try:
+            await self._flusher
+        except asyncio.CancelledError:
+            pass
+        await self.flush()
+        await asyncio.get_running_loop().run_in_executor(self._writer, self.store.close)
+        self._writer.shutdown()
+
+    # Protocol -------------------------------------------------------------
+
+    async def handle(self, reader, writer):
+        self._connections[asyncio.current_task()] = writer
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    response = self.dispatch(json.loads(line))
+                    response['ok'] = True
+                except (RequestError, ValueError) as e:
+                    response = {'ok': False, 'error': str(e)}
+                except Exception:
+                    # A request the handlers didn't expect; the connection
+                    # and its sessions carry on
+                    logger.exception("Could not serve a request")
+                    response = {'ok': False, 'error': "internal error"}
+                writer.write(json.dumps(response).encode('utf-8') + b'\n')
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            # Dropped connections and lines longer than the stream limit
+            pass
+        finally:
+            del self._connections[asyncio.current_task()]
+            writer.close()
+
+    def dispatch(self, request):
+        if not isinstance(request, dict):
+            raise RequestError("a request must be a JSON object")
+        handler = getattr(self, f"op_{request.get('op')}", None)
+        if handler is None:
+            raise RequestError(f"unknown op {request.get('op')!r}")
+        return handler(request)
+
+    def session(self, request):
+        entry = self.sessions.get(_field(request, 'session', str))
+        if entry is None:
+            raise RequestError("no such session; it may have expired")
+        entry[1] = time.monotonic()
+        return entry[0]
+
+    def op_hello(self, request):
+        return {'languages': {language: self.bank.count(language) for language in self.bank.languages}}
+
+    def op_start(self, request):
+        learner = _field(request, 'learner', str)
+        language = _field(request, 'language', str)
+        mode = _field(request, 'mode', str, 'shuffle')
+        max_questions = _field(request, 'max_questions', int, 10)
+        if language not in self.bank.languages:
+            raise RequestError(f"unknown language {language!r}")
+        if mode not in SAMPLERS:
+            raise RequestError(f"unknown mode {mode!r}")
+        if not 0 < max_questions <= MAX_QUESTIONS:
+            raise RequestError(f"max_questions must be between 1 and {MAX_QUESTIONS}")
+
+        questions = self.bank[language]
+        session = QuizSession(language, questions, make_sampler(mode, len(questions)),
+                              self.generator, PendingAnswers(self, learner), max_questions)
+        token = secrets.token_hex(16)
+        self.sessions[token] = [session, time.monotonic()]
+        return {'session': token, 'question': question_payload(session.load_question())}
+
+    def op_answer(self, request):
+        session = self.session(request)
+        if session.finished:
+            raise RequestError("the session is finished; restart it first")
+        chosen = _field(request, 'chosen', int)
+        if not 0 <= chosen < len(session.current_question.options):
+            raise RequestError(f"chosen option {chosen} is out of range")
+        latency = request.get('latency')
+        if latency is not None:
+            latency = max(float(_field(request, 'latency', (int, float))), 0.0)
+
+        question = session.current_question
+        correct = session.answer(chosen, latency)
+        next_question = None
+        if not session.finished:
+            next_question = question_payload(session.load_question())
+        return {'correct': correct, 'correct_index': question.correct_index,
+                'explanation': question.explanation, 'score': session.score,
+                'answered': session.answered, 'finished': session.finished, 'next': next_question}
+
+    def op_restart(self, request):
+        session = self.session(request)
+        session.restart()
+        return {'question': question_payload(session.load_question())}
+
+    def op_end(self, request):
+        self.sessions.pop(_field(request, 'session', str), None)
+        return {}
+
+    # Storage --------------------------------------------------------------
+
+    def queue_answer(self, row):
+        self.pending.append(row)
+        self.answers += 1
+        if len(self.pending) >= self.batch_size:
+            self._wake.set()
+
+    async def flush(self):
+        """Write the queued answers to the store"""
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, []
+        try:
+            await asyncio.get_running_loop().run_in_executor(self._writer, self.store.write, batch)
+        except Exception:
+            # Keep the answers and try again with the next batch
+            logger.exception("Could not write %d answers", len(batch))
+            self.pending[:0] = batch
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+            self.expire_sessions()
+
+    def expire_sessions(self):
+        cutoff = time.monotonic() - SESSION_TIMEOUT
+        for token in [token for token, (session, used) in self.sessions.items() if used < cutoff]:
+            del self.sessions[token]
+
+
+class BackgroundServer:
+    """Runs a ``QuizServer`` on an event loop of its own, in a thread.
+
+    A stand-in server for trying the client on one machine:
+
+        with BackgroundServer(QuizServer(bank, store)) as (host, port):
+            client = QuizClient(host, port)
+    """
+    def __init__(self, server, host='127.0.0.1', port=0):
+        self.server = server
+        self.host = host
+        self.port = port
+        self.address = None
+        self._loop = None
+        self._stop = None
+        self._started = threading.Event()
+        self._error = None
+        self._thread = threading.Thread(target=asyncio.run, args=(self._serve(),),
+                                        name='quiz-server', daemon=True)
+
+    async def _serve(self):
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        try:
+            self.address = await self.server.start(self.host, self.port)
+        except Exception as e:
+            self._error = e
+            self._started.set()
+            return
+        self._started.set()
+        await self._stop.wait()
+        await self.server.close()
+
+    def start(self):
+        self._thread.start()
+        self._started.wait()
+        if self._error is not None:
+            raise self._error
+        return self.address
+
+    def stop(self):
+        if self._loop is not None and self._thread.is_alive():
+            self._loop.call_soon_threadsafe(self._stop.set)
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+async def serve(host, port, store):
+    server = QuizServer(open_bank(), store)
+    address = await server.start(host, port)
+    logger.info("Serving quizzes on %s:%d", *address)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve quiz sessions to thin clients")
+    parser.add_argument('--host', default='0.0.0.0', help='address to listen on')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--store', choices=sorted(STORES), default='sqlite')
+    parser.add_argument('--path', help='where the store keeps answers (default: next to the bank)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    try:
+        asyncio.run(serve(args.host, args.port, open_store(args.store, args.path or STORE_PATHS[args.store])))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,124 @@
+"""Quiz flow without any widgets.
+
+``QuizSession`` is the state machine behind the quiz screen: it picks
+questions, scores answers, feeds them to the sampler and the answer log,
+and knows when a session is over.  The screen only shows what it says;
+the load simulator in ``benchmarks/simulate_users.py`` runs thousands of
+sessions with no display at all.
+
+    session = QuizSession('python', bank['python'], make_sampler('shuffle', n))
+    while not session.finished:
+        question = session.load_question()
+        session.answer(chosen)
+"""
+import time
+
+
+class QuizSession:
+    """One learner's run through ``max_questions`` questions of a language.
+
+    ``load_question`` shows the next question, ``answer`` scores it and
+    ``prefetch`` picks the question after it ahead of time.  Once the
+    current question is answered, ``revealed`` holds its correct index
+    and explanation.  ``restart``
+    starts a new run with the same sampler, so questions keep rotating.
+    ``clock`` times answers for the log; simulations pass a virtual one.
+    """
+    def __init__(self, language, questions, sampler, generator=None, answer_log=None,
+                 max_questions=10, generated_share=0.5, clock=time.monotonic):
+        self.language = language
+        self.questions = questions
+        self.sampler = sampler
+        self.answer_log = answer_log
+        self.max_questions = max_questions
+        self.generated_share = generated_share if generator is not None else 0.0
+        self.clock = clock
+        self.generated = generator.stream(language, sampler.rng) if generator is not None else None
+        self.current_question = None
+        self.current_index = None
+        self.upcoming = None  # (sampler index or None, question, text, options)
+        self.shown_at = None
+        self.revealed = None  # (correct index, explanation) once answered
+        self.questions_changed()
+        self.restart()
+
+    def restart(self):
+        self.answered = 0
+        self.score = 0
+        self.results = []  # whether each answer so far was right
+
+    @property
+    def finished(self):
+        return self.answered >= self.max_questions
+
+    def questions_changed(self):
+        """Bring the sampler up to date with questions added to or removed from the bank"""
+        self.sampler.grow(len(self.questions))
+        self.sampler.exclude(self.questions.removed)
+
+    def pick_question(self):
+        """Choose the next question and read out the strings it shows.
+
+        Returns (sampler index or None, question, question text, options).
+        """
+        # Mix fresh generated questions in with the ones the sampler picks
+        question = None
+        index = None
+        if self.generated_share and self.sampler.rng.random() < self.generated_share:
+            question = next(self.generated, None)
+        removed = self.questions.removed
+        if question is None and len(removed) >= len(self.questions):
+            # Every question was removed from the sources while the app
+            # runs; only generated ones are left
+            question = next(self.generated, None) if self.generated is not None else None
+            if question is None:
+                raise ValueError(f"no {self.language} questions left to ask")
+        if question is None:
+            # Removed questions keep their index, and samplers skip them;
+            # draw again should one come back all the same
+            index = self.sampler.next()
+            while index in removed:
+                index = self.sampler.next()
+            question = self.questions[index]
+        return index, question, question.question, list(question.options)
+
+    def prefetch(self):
+        """Pick the next question now, unless the session is over.
+
+        Returns what ``pick_question`` returned, or None.
+        """
+        if self.upcoming is None and not self.finished:
+            self.upcoming = self.pick_question()
+        return self.upcoming
+
+    def load_question(self):
+        """Make the prefetched (or a freshly picked) question current.
+
+        Returns the same tuple as ``pick_question``.
+        """
+        prepared = self.upcoming or self.pick_question()
+        self.upcoming = None
+        self.current_index, self.current_question = prepared[:2]
+        self.shown_at = self.clock()
+        self.revealed = None
+        return prepared
+
+    def answer(self, chosen, latency=None):
+        """Score option ``chosen`` of the current question; returns whether it was right.
+
+        ``latency`` is how long the learner took, if it was measured
+        elsewhere (e.g. on a client); otherwise ``clock`` times it.
+        """
+        question = self.current_question
+        correct = chosen == question.correct_index
+        if self.current_index is not None:
+            self.sampler.record(self.current_index, correct)
+        if self.answer_log is not None:
+            if latency is None:
+                latency = self.clock() - self.shown_at
+            self.answer_log.record(question.language, question.id, chosen, correct, latency)
+        self.answered += 1
+        self.score += correct
+        self.results.append(correct)
+        self.revealed = (question.correct_index, question.explanation)
+        return correct
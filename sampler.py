@@ -0,0 +1,356 @@
+"""Question samplers.
+
+A sampler hands out question indexes for one language bank and can be
+told how each answer went.  Four modes are available:
+
+* ``shuffle``  -- a random permutation of the bank, no repeats until every
+  question has been asked once.
+* ``weighted`` -- draws proportional to a per-question weight kept in a
+  Fenwick tree; missed questions get heavier, correct ones lighter.
+* ``spaced``   -- shuffled order, but missed questions come back after
+  increasing intervals until they have been answered correctly a few
+  times in a row.
+* ``adaptive`` -- the most informative question at the learner's current
+  ability under an item response model (see ``adaptive.py``).
+
+Every sampler can be checkpointed with ``get_state()`` and restored with
+``sampler_from_state()``; states only contain JSON-friendly values.
+Questions removed from the bank while it is in use are passed to
+``exclude()`` and never drawn again.
+"""
+import heapq
+import random
+
+
+def _rng_state(rng):
+    version, internal, gauss = rng.getstate()
+    return [version, list(internal), gauss]
+
+
+def _make_rng(state=None, seed=None):
+    rng = random.Random(seed)
+    if state is not None:
+        version, internal, gauss = state
+        rng.setstate((version, tuple(internal), gauss))
+    return rng
+
+
+class Sampler:
+    """Base class for samplers over ``size`` questions"""
+    mode = ''
+
+    def __init__(self, size, seed=None):
+        if size <= 0:
+            raise ValueError("cannot sample from an empty bank")
+        self.size = size
+        self.rng = _make_rng(seed=seed)
+        self.removed = set()
+
+    def next(self):
+        """Return the index of the next question to ask"""
+        raise NotImplementedError
+
+    def record(self, index, correct):
+        """Feed back the result of answering question ``index``"""
+
+    def grow(self, size):
+        """Take in questions appended to the bank, up to ``size`` in all"""
+        self.size = max(self.size, size)
+
+    def exclude(self, removed):
+        """Stop drawing the indexes in ``removed``, questions taken out of the bank.
+
+        Each call replaces the previous set, so indexes left out of
+        ``removed`` are drawn again.
+        """
+        self.removed = set(removed)
+
+    def get_state(self):
+        return {'mode': self.mode, 'size': self.size, 'rng': _rng_state(self.rng)}
+
+    def set_state(self, state):
+        self.size = state['size']
+        self.rng = _make_rng(state['rng'])
+
+
+class ShuffleSampler(Sampler):
+    """Walks a random permutation of the bank without repeats.
+
+    The permutation is drawn lazily with a sparse Fisher-Yates shuffle, so
+    each draw is O(1) and memory only grows with the number of questions
+    asked, not with the size of the bank.  Questions appended by ``grow``
+    join the part of the permutation not drawn yet.
+    """
+    mode = 'shuffle'
+
+    def __init__(self, size, seed=None):
+        super().__init__(size, seed)
+        self.position = 0
+        self.swaps = {}
+        self.last = None
+
+    def next(self):
+        if len(self.removed) >= self.size:
+            raise ValueError("every question was removed from the bank")
+        picked = self._draw()
+        # Removed questions are passed over where the permutation reaches them
+        while picked in self.removed:
+            picked = self._draw()
+        return picked
+
+    def _draw(self):
+        if self.position >= self.size:
+            # Every question has been asked; start a new permutation
+            self.position = 0
+            self.swaps = {}
+        i = self.position
+        if self.size > 1 and i == 0 and self.last is not None and self.last < self.size:
+            # Don't open a new round with the question that closed the last
+            # one; a fresh permutation has every question in its own place
+            j = self.rng.randrange(self.size - 1)
+            if j >= self.last:
+                j += 1
+        else:
+            j = self.rng.randrange(i, self.size)
+        picked = self.swaps.get(j, j)
+        self.swaps[j] = self.swaps.get(i, i)
+        self.swaps.pop(i, None)
+        self.position += 1
+        self.last = picked
+        return picked
+
+    def get_state(self):
+        state = super().get_state()
+        state.update(position=self.position, last=self.last,
+                     swaps=[[k, v] for k, v in self.swaps.items()])
+        return state
+
+    def set_state(self, state):
+        super().set_state(state)
+        self.position = state['position']
+        self.last = state['last']
+        self.swaps = {k: v for k, v in state['swaps']}
+
+
+class WeightedSampler(Sampler):
+    """Draws questions proportionally to their weight.
+
+    Weights live in a Fenwick tree, so both a draw and a weight update are
+    O(log n).  Missed questions have their weight multiplied by
+    ``miss_factor`` and correctly answered ones divided by ``hit_factor``,
+    within ``[min_weight, max_weight]``.  Excluded questions weigh
+    nothing, so they are never drawn.
+    """
+    mode = 'weighted'
+    miss_factor = 2.0
+    hit_factor = 2.0
+    min_weight = 0.125
+    max_weight = 16.0
+
+    def __init__(self, size, seed=None, weights=None):
+        super().__init__(size, seed)
+        self._build(weights or {})
+        self.last = None
+
+    def _build(self, weights):
+        # Only weights that differ from 1.0 are kept explicitly, which keeps
+        # checkpoints small for large banks
+        self.weights = dict(weights)
+        tree = [0.0] + [1.0] * self.size
+        for i, weight in self.weights.items():
+            tree[i + 1] = weight
+        for i in range(1, self.size + 1):
+            parent = i + (i & -i)
+            if parent <= self.size:
+                tree[parent] += tree[i]
+        self.tree = tree
+
+    def weight(self, index):
+        return self.weights.get(index, 1.0)
+
+    def _prefix(self, i):
+        # Sum of the first i weights
+        total = 0.0
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def total(self):
+        return self._prefix(self.size)
+
+    def grow(self, size):
+        # Append one node per new question, each covering the same range
+        # it would in a tree built at the new size: O(log n) per question
+        for i in range(self.size + 1, size + 1):
+            self.tree.append(1.0 + self._prefix(i - 1) - self._prefix(i - (i & -i)))
+        super().grow(size)
+
+    def exclude(self, removed):
+        removed = set(removed)
+        for index in self.removed - removed:
+            self.set_weight(index, 1.0)
+        for index in removed - self.removed:
+            self.set_weight(index, 0.0)
+        super().exclude(removed)
+
+    def set_weight(self, index, weight):
+        delta = weight - self.weight(index)
+        if weight == 1.0:
+            self.weights.pop(index, None)
+        else:
+            self.weights[index] = weight
+        i = index + 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def _find(self, target):
+        # Descend the tree to the first index whose prefix sum exceeds target
+        position = 0
+        step = 1 << self.size.bit_length()
+        while step:
+            probe = position + step
+            if probe <= self.size and self.tree[probe] <= target:
+                position = probe
+                target -= self.tree[probe]
+            step >>= 1
+        return min(position, self.size - 1)
+
+    def next(self):
+        if self.total() <= 0.0:
+            raise ValueError("every question was removed from the bank")
+        index = self._find(self.rng.random() * self.total())
+        if index == self.last and self.size > 1:
+            # Avoid asking the same question twice in a row
+            index = self._find(self.rng.random() * self.total())
+        self.last = index
+        return index
+
+    def record(self, index, correct):
+        if index in self.removed:
+            return
+        if correct:
+            weight = max(self.weight(index) / self.hit_factor, self.min_weight)
+        else:
+            weight = min(self.weight(index) * self.miss_factor, self.max_weight)
+        self.set_weight(index, weight)
+
+    def get_state(self):
+        state = super().get_state()
+        # Exclusions belong to the bank, not to what was learned
+        state.update(last=self.last, weights=[[k, v] for k, v in self.weights.items()
+                                              if k not in self.removed])
+        return state
+
+    def set_state(self, state):
+        super().set_state(state)
+        self.last = state['last']
+        self._build({k: v for k, v in state['weights']})
+        for index in self.removed:
+            if index < self.size:
+                self.set_weight(index, 0.0)
+
+
+class SpacedRepetitionSampler(Sampler):
+    """Shuffled order with missed questions re-queued at growing intervals.
+
+    A missed question is due again ``intervals[0]`` draws later.  Each
+    correct answer to a due question moves it to the next interval, and
+    after the last interval it leaves the review queue.  A new miss puts
+    it back at the first interval.
+    """
+    mode = 'spaced'
+    intervals = (2, 5, 12, 30)
+
+    def __init__(self, size, seed=None):
+        super().__init__(size, seed)
+        self.order = ShuffleSampler(size)
+        self.order.rng = self.rng
+        self.step = 0
+        self.due = []       # heap of (due step, question index)
+        self.boxes = {}     # question index -> position in intervals
+
+    def grow(self, size):
+        self.order.grow(size)
+        super().grow(size)
+
+    def exclude(self, removed):
+        super().exclude(removed)
+        self.order.exclude(self.removed)
+        for index in self.removed:
+            self.boxes.pop(index, None)
+
+    def next(self):
+        self.step += 1
+        while self.due and self.due[0][0] <= self.step:
+            index = heapq.heappop(self.due)[1]
+            # Reviews of removed questions are dropped when they fall due
+            if index not in self.removed:
+                return index
+        return self.order.next()
+
+    def record(self, index, correct):
+        if index in self.removed:
+            return
+        if not correct:
+            box = 0
+        elif index in self.boxes:
+            box = self.boxes[index] + 1
+        else:
+            return
+        if box >= len(self.intervals):
+            del self.boxes[index]
+            return
+        self.boxes[index] = box
+        heapq.heappush(self.due, (self.step + self.intervals[box], index))
+
+    def get_state(self):
+        state = super().get_state()
+        order = self.order.get_state()
+        del order['rng']
+        state.update(step=self.step, order=order,
+                     due=[list(item) for item in self.due],
+                     boxes=[[k, v] for k, v in self.boxes.items()])
+        return state
+
+    def set_state(self, state):
+        super().set_state(state)
+        self.order = ShuffleSampler(self.size)
+        self.order.set_state(dict(state['order'], rng=state['rng']))
+        self.order.rng = self.rng
+        self.order.exclude(self.removed)
+        self.step = state['step']
+        self.due = [tuple(item) for item in state['due']]
+        heapq.heapify(self.due)
+        self.boxes = {k: v for k, v in state['boxes']}
+
+
+def _adaptive_sampler(size, seed=None):
+    # Imported on first use so NumPy never slows down startup
+    from adaptive import AdaptiveSampler
+    return AdaptiveSampler(size, seed=seed)
+
+
+SAMPLERS = {
+    ShuffleSampler.mode: ShuffleSampler,
+    WeightedSampler.mode: WeightedSampler,
+    SpacedRepetitionSampler.mode: SpacedRepetitionSampler,
+    'adaptive': _adaptive_sampler,
+}
+
+
+def make_sampler(mode, size, seed=None):
+    """Create a sampler for ``size`` questions in the given mode"""
+    try:
+        cls = SAMPLERS[mode]
+    except KeyError:
+        raise ValueError(f"unknown sampler mode {mode!r}") from None
+    return cls(size, seed=seed)
+
+
+def sampler_from_state(state):
+    """Recreate a sampler from a ``get_state()`` checkpoint"""
+    sampler = make_sampler(state['mode'], state['size'])
+    sampler.set_state(state)
+    return sampler
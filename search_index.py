@@ -0,0 +1,368 @@
+"""Full-text search over question banks.
+
+``SearchIndex`` is an inverted index over the question text, options and
+explanation of every question, ranked with BM25 (question words count
+three times, option words twice).  Each term's postings are also kept in
+impact order, best match first, so a ranked query only has to look at
+the top ``max_candidates`` postings of each term, however large the
+bank.  The last word of a query is matched as a prefix, which makes
+"poin" find "pointer" and "pointers".
+
+Questions can be added or removed one at a time, or as the ``BankChange``
+of a source edit (``apply``).  ``open_index`` saves the index next to the
+compiled bank and reloads it on the next start unless the bank changed.
+
+    python search_index.py pointer --language cpp
+"""
+import argparse
+import array
+import heapq
+import json
+import math
+import os
+import re
+import struct
+import sys
+from bisect import bisect_left
+
+from question_bank import BANK_PATH
+
+INDEX_PATH = os.path.splitext(BANK_PATH)[0] + '.index'
+
+MAGIC = b'QIDX'
+VERSION = 1
+# magic, format version, length of the JSON metadata that follows
+HEADER = struct.Struct('<4sHI')
+
+TOKEN = re.compile(r'[a-z0-9_]+')
+QUESTION_WEIGHT = 3
+OPTION_WEIGHT = 2
+EXPLANATION_WEIGHT = 1
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text):
+    return TOKEN.findall(text.lower())
+
+
+def bank_signature(path):
+    """Identify a bank file well enough to tell when it was rewritten.
+
+    The byte order is included because postings are stored natively.
+    """
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns, sys.byteorder]
+
+
+class SearchIndex:
+    """Inverted index mapping terms to the questions that contain them"""
+    def __init__(self, max_candidates=256, max_expansions=32):
+        self.max_candidates = max_candidates
+        self.max_expansions = max_expansions
+        self.languages = []
+        self.doc_languages = array.array('B')
+        self.doc_ids = array.array('I')
+        self.doc_lengths = array.array('H')
+        self.total_length = 0
+        self.removed = set()
+        # term -> (doc numbers, weighted term frequencies) for terms built or
+        # changed in memory; terms loaded from disk are looked up in _stored
+        self.postings = {}
+        self._stored = None
+        self._vocabulary = None  # sorted terms, rebuilt after new terms are added
+        self._impacts = {}       # (term, language code) -> (docs, scores), best first
+        self._doc_numbers = None
+
+    def __len__(self):
+        return len(self.doc_ids) - len(self.removed)
+
+    # Building -------------------------------------------------------------
+
+    @classmethod
+    def build(cls, bank, **kwargs):
+        index = cls(**kwargs)
+        for language in bank.languages:
+            for question in bank[language]:
+                index.add_question(question)
+        return index
+
+    def add_question(self, question):
+        return self.add(question.language, question.id, question.question,
+                        question.options, question.explanation)
+
+    def add(self, language, question_id, question, options, explanation):
+        """Index one question and return its document number"""
+        if language not in self.languages:
+            self.languages.append(language)
+        doc = len(self.doc_ids)
+
+        frequencies = {}
+        for text, weight in [(question, QUESTION_WEIGHT), (explanation, EXPLANATION_WEIGHT)]:
+            for term in tokenize(text):
+                frequencies[term] = frequencies.get(term, 0) + weight
+        for option in options:
+            for term in tokenize(option):
+                frequencies[term] = frequencies.get(term, 0) + OPTION_WEIGHT
+
+        for term, frequency in frequencies.items():
+            docs, tfs = self._writable(term)
+            docs.append(doc)
+            tfs.append(min(frequency, 0xFFFF))
+
+        length = min(sum(frequencies.values()), 0xFFFF)
+        self.doc_languages.append(self.languages.index(language))
+        self.doc_ids.append(question_id)
+        self.doc_lengths.append(length)
+        self.total_length += length
+        if self._doc_numbers is not None:
+            self._doc_numbers[(language, question_id)] = doc
+        self._impacts.clear()
+        return doc
+
+    def remove(self, language, question_id):
+        """Drop a question from the results; returns False if it was not indexed"""
+        doc = self._lookup().pop((language, question_id), None)
+        if doc is None:
+            return False
+        self.removed.add(doc)
+        self.total_length -= self.doc_lengths[doc]
+        self._impacts.clear()
+        return True
+
+    def apply(self, change):
+        """Re-index the questions a ``BankChange`` added, modified or removed"""
+        for question_id in change.removed:
+            self.remove(change.language, question_id)
+        for question in change.added + change.modified:
+            self.remove(change.language, question.id)
+            self.add_question(question)
+
+    def _get(self, term):
+        """Return (docs, tfs) for ``term``, or None if it is not indexed"""
+        postings = self.postings.get(term)
+        if postings is None and self._stored is not None:
+            terms, starts, docs, tfs = self._stored
+            i = bisect_left(terms, term)
+            if i < len(terms) and terms[i] == term:
+                postings = (docs[starts[i]:starts[i + 1]], tfs[starts[i]:starts[i + 1]])
+        return postings
+
+    def _writable(self, term):
+        # Postings loaded from disk are read-only views until first modified
+        postings = self._get(term)
+        if postings is None:
+            postings = (array.array('I'), array.array('H'))
+            self._vocabulary = None
+        elif not isinstance(postings[0], array.array):
+            postings = (array.array('I', postings[0]), array.array('H', postings[1]))
+        self.postings[term] = postings
+        return postings
+
+    def _lookup(self):
+        if self._doc_numbers is None:
+            self._doc_numbers = {
+                (self.languages[code], question_id): doc
+                for doc, (code, question_id) in enumerate(zip(self.doc_languages, self.doc_ids))
+                if doc not in self.removed
+            }
+        return self._doc_numbers
+
+    # Querying -------------------------------------------------------------
+
+    def expand(self, prefix):
+        """Return the indexed terms starting with ``prefix``, most common first"""
+        vocabulary = self.vocabulary()
+        terms = []
+        i = bisect_left(vocabulary, prefix)
+        while i < len(vocabulary) and vocabulary[i].startswith(prefix):
+            terms.append(vocabulary[i])
+            i += 1
+        if len(terms) > self.max_expansions:
+            terms = heapq.nlargest(self.max_expansions, terms, key=lambda t: len(self._get(t)[0]))
+        return terms
+
+    def vocabulary(self):
+        """All indexed terms, sorted"""
+        if self._vocabulary is None:
+            stored = self._stored[0] if self._stored is not None else []
+            self._vocabulary = sorted(set(stored).union(self.postings))
+        return self._vocabulary
+
+    def _query_terms(self, query, prefix):
+        words = tokenize(query)
+        if not words:
+            return []
+        groups = [[word] if self._get(word) is not None else [] for word in words[:-1]]
+        last = words[-1]
+        if prefix:
+            groups.append(self.expand(last))
+        else:
+            groups.append([last] if self._get(last) is not None else [])
+        return groups
+
+    def _impact(self, term, code):
+        """Postings of ``term`` in language ``code`` (or all) with BM25 scores, best first"""
+        key = (term, code)
+        if key not in self._impacts:
+            docs, tfs = self._get(term)
+            count = len(self)
+            idf = math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5))
+            average = self.total_length / count if count else 1.0
+            lengths = self.doc_lengths
+            languages = self.doc_languages
+            removed = self.removed
+            scored = [
+                (idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * lengths[doc] / average)), doc)
+                for doc, tf in zip(docs, tfs)
+                if doc not in removed and (code is None or languages[doc] == code)
+            ]
+            top = heapq.nlargest(self.max_candidates, scored)
+            self._impacts[key] = ([doc for score, doc in top], [score for score, doc in top])
+        return self._impacts[key]
+
+    def _language_code(self, language):
+        # -1 matches nothing, for languages that have no questions
+        if language is None:
+            return None
+        return self.languages.index(language) if language in self.languages else -1
+
+    def search(self, query, language=None, limit=10, prefix=True):
+        """Return up to ``limit`` (score, language, question id), best first"""
+        code = self._language_code(language)
+        if code == -1:
+            return []
+
+        scores = {}
+        for group in self._query_terms(query, prefix):
+            for term in group:
+                docs, term_scores = self._impact(term, code)
+                for doc, score in zip(docs, term_scores):
+                    scores[doc] = scores.get(doc, 0.0) + score
+
+        return [
+            (score, self.languages[self.doc_languages[doc]], self.doc_ids[doc])
+            for doc, score in heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        ]
+
+    def matching(self, query, language=None, prefix=True):
+        """Return every (language, question id) containing all query words"""
+        groups = self._query_terms(query, prefix)
+        if not groups or not all(groups):
+            return []
+
+        code = self._language_code(language)
+        if code == -1:
+            return []
+
+        sets = []
+        for group in groups:
+            docs = set()
+            for term in group:
+                docs.update(self._get(term)[0])
+            sets.append(docs)
+        sets.sort(key=len)
+        docs = sets[0].intersection(*sets[1:]) - self.removed
+        return [
+            (self.languages[self.doc_languages[doc]], self.doc_ids[doc])
+            for doc in sorted(docs)
+            if code is None or self.doc_languages[doc] == code
+        ]
+
+    # Persistence ----------------------------------------------------------
+
+    def save(self, path, signature=None):
+        terms = self.vocabulary()
+        postings = [self._get(term) for term in terms]
+        starts = array.array('I', [0])
+        for docs, tfs in postings:
+            starts.append(starts[-1] + len(docs))
+        meta = {
+            'signature': signature,
+            'languages': self.languages,
+            'total_length': self.total_length,
+            'removed': sorted(self.removed),
+            'docs': len(self.doc_ids),
+            'terms': terms,
+        }
+        meta_data = json.dumps(meta).encode('utf-8')
+
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(meta_data)))
+            f.write(meta_data)
+            for data in [self.doc_languages, self.doc_ids, self.doc_lengths, starts]:
+                f.write(data.tobytes())
+            for docs, tfs in postings:
+                f.write(bytes(docs))
+            for docs, tfs in postings:
+                f.write(bytes(tfs))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, version, meta_length = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} search index")
+        offset = HEADER.size + meta_length
+        meta = json.loads(data[HEADER.size:offset])
+
+        index = cls(**kwargs)
+        index.signature = meta['signature']
+        index.languages = meta['languages']
+        index.total_length = meta['total_length']
+        index.removed = set(meta['removed'])
+
+        count = meta['docs']
+        terms = meta['terms']
+        arrays = [('doc_languages', 'B', count), ('doc_ids', 'I', count),
+                  ('doc_lengths', 'H', count), ('starts', 'I', len(terms) + 1)]
+        for name, typecode, length in arrays:
+            values = array.array(typecode)
+            values.frombytes(data[offset:offset + length * values.itemsize])
+            setattr(index, name, values)
+            offset += length * values.itemsize
+
+        # Postings stay read-only views into the file data until modified;
+        # a term's slice is only cut when the term is looked up
+        view = memoryview(data)
+        total = index.starts[-1]
+        docs = view[offset:offset + total * 4].cast('I')
+        tfs = view[offset + total * 4:offset + total * 6].cast('H')
+        index._stored = (terms, index.starts, docs, tfs)
+        index._vocabulary = terms
+        del index.starts
+        return index
+
+
+def open_index(bank, path=INDEX_PATH):
+    """Load the saved index for ``bank``, rebuilding it if the bank changed"""
+    signature = bank_signature(bank.path)
+    if os.path.exists(path):
+        try:
+            index = SearchIndex.load(path)
+            if index.signature == signature:
+                return index
+        except (ValueError, struct.error):
+            pass
+    index = SearchIndex.build(bank)
+    index.save(path, signature)
+    return index
+
+
+if __name__ == '__main__':
+    from question_bank import open_bank
+
+    parser = argparse.ArgumentParser(description="Search the question bank")
+    parser.add_argument('query')
+    parser.add_argument('--language')
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+
+    bank = open_bank()
+    index = open_index(bank)
+    for score, language, question_id in index.search(args.query, args.language, args.limit):
+        question = bank[language].find(question_id)
+        print(f"{score:6.2f}  {language}/{question_id}  {question.question}")
@@ -0,0 +1,235 @@
+"""Snapshots of a quiz in progress, to resume it after the app is killed.
+
+Mobile systems end paused apps without warning.  ``capture`` packs what
+the quiz screen needs to carry on -- language and order, progress and
+score, which answers were right, and the question on screen -- into one
+binary record of a few dozen bytes.  Bank questions are referred to by
+their index and id, generated ones by their canonical form, from which
+the generator rebuilds them.  ``restore`` turns a record back into a
+ready ``QuizSession``.
+
+The sampler's own state (e.g. a shuffled order over the whole bank) is
+not kept: a resumed round carries on with a fresh sampler, and adaptive
+estimates live in the ability file anyway.
+
+``SnapshotWriter`` writes records on a thread of its own, atomically
+(a temporary file, then a rename), so the UI thread only pays for
+packing the record.
+"""
+import json
+import os
+import struct
+import threading
+import time
+
+MAGIC = b'QSNP'
+VERSION = 1
+# magic, format version, saved at, max questions, answered, score,
+# flags, chosen option, question kind, sampler index, question id,
+# then the lengths of the language, mode and canonical form that follow
+# the answer bits
+HEADER = struct.Struct('<4sHdHHHBbBiIBBH')
+# Snapshots older than this are not resumed
+MAX_AGE = 24 * 3600
+
+NO_QUESTION = 0
+BANK_QUESTION = 1
+GENERATED_QUESTION = 2
+
+# The current question was answered (its result was on screen)
+ANSWERED = 1
+
+
+class Snapshot:
+    """A quiz round as it was saved"""
+    __slots__ = ('saved_at', 'language', 'mode', 'max_questions', 'answered', 'score',
+                 'results', 'kind', 'index', 'question_id', 'canonical', 'chosen')
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields[name])
+
+    @property
+    def showing_result(self):
+        """Whether the current question had been answered already"""
+        return self.chosen >= 0
+
+
+def capture(session, mode, chosen=-1):
+    """Pack ``session``'s round into a record.
+
+    ``chosen`` is the option picked for the current question if its
+    result is showing.
+    """
+    question = session.current_question
+    canonical = b''
+    index = -1
+    question_id = 0
+    if question is None:
+        kind = NO_QUESTION
+    elif getattr(question, 'canonical', None) is not None:
+        kind = GENERATED_QUESTION
+        canonical = json.dumps(question.canonical, separators=(',', ':')).encode('utf-8')
+        question_id = question.id
+    else:
+        kind = BANK_QUESTION
+        index = -1 if session.current_index is None else session.current_index
+        question_id = question.id
+
+    bits = 0
+    for i, correct in enumerate(session.results):
+        bits |= correct << i
+    language = session.language.encode('utf-8')
+    mode = mode.encode('utf-8')
+    return b''.join([
+        HEADER.pack(MAGIC, VERSION, time.time(), session.max_questions, session.answered,
+                    session.score, ANSWERED if chosen >= 0 else 0, chosen, kind, index,
+                    question_id, len(language), len(mode), len(canonical)),
+        bits.to_bytes((len(session.results) + 7) // 8, 'little'),
+        language, mode, canonical,
+    ])
+
+
+def parse(record):
+    """Unpack a record made by ``capture``; raises ValueError if it isn't one"""
+    try:
+        (magic, version, saved_at, max_questions, answered, score, flags, chosen, kind, index,
+         question_id, language_length, mode_length, canonical_length) = HEADER.unpack_from(record)
+    except struct.error:
+        raise ValueError("truncated session snapshot") from None
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"not a version {VERSION} session snapshot")
+    offset = HEADER.size
+    bits_length = (answered + 7) // 8
+    if len(record) != offset + bits_length + language_length + mode_length + canonical_length:
+        raise ValueError("truncated session snapshot")
+
+    bits = int.from_bytes(record[offset:offset + bits_length], 'little')
+    offset += bits_length
+    fields = []
+    for length in [language_length, mode_length, canonical_length]:
+        fields.append(record[offset:offset + length].decode('utf-8'))
+        offset += length
+    language, mode, canonical = fields
+    return Snapshot(
+        saved_at=saved_at, language=language, mode=mode, max_questions=max_questions,
+        answered=answered, score=score, results=[bool(bits >> i & 1) for i in range(answered)],
+        kind=kind, index=index, question_id=question_id,
+        canonical=tuple(json.loads(canonical)) if canonical else None,
+        chosen=chosen if flags & ANSWERED else -1,
+    )
+
+
+def load(path, max_age=MAX_AGE):
+    """Read the snapshot at ``path``; None if there is none, or it is unusable or too old"""
+    try:
+        with open(path, 'rb') as f:
+            snapshot = parse(f.read())
+    except (OSError, ValueError):
+        return None
+    if not 0 <= time.time() - snapshot.saved_at <= max_age:
+        return None
+    return snapshot
+
+
+def find_question(snapshot, questions, generator=None):
+    """Return (sampler index or None, question) for the snapshot's question, or None"""
+    if snapshot.kind == BANK_QUESTION:
+        if 0 <= snapshot.index < len(questions) and snapshot.index not in questions.removed:
+            question = questions[snapshot.index]
+            if question.id == snapshot.question_id:
+                return snapshot.index, question
+        # The bank changed since: look the question up by id, outside the sampler
+        question = questions.find(snapshot.question_id)
+        return (None, question) if question is not None else None
+    if snapshot.kind == GENERATED_QUESTION and generator is not None:
+        question = generator.rebuild(snapshot.canonical)
+        return (None, question) if question is not None else None
+    return None
+
+
+def restore(snapshot, session, questions, generator=None):
+    """Put ``session`` (a fresh ``QuizSession``) back where the snapshot left it.
+
+    Returns whether the round goes on with the snapshot's question.  It
+    goes on with a new one if that question was answered already or
+    can't be found any more.
+    """
+    session.max_questions = snapshot.max_questions
+    session.answered = snapshot.answered
+    session.score = snapshot.score
+    session.results = list(snapshot.results)
+    if snapshot.showing_result:
+        return False
+    found = find_question(snapshot, questions, generator)
+    if found is None:
+        return False
+    index, question = found
+    session.upcoming = (index, question, question.question, list(question.options))
+    return True
+
+
+class SnapshotWriter:
+    """Writes snapshots to ``path`` on a background thread.
+
+    Only the newest record waiting is written; ``clear`` deletes the
+    snapshot once a round is over.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._pending = None  # record to write, b'' to delete, None for nothing
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._idle = True
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='session-snapshot', daemon=True)
+        self._thread.start()
+
+    def save(self, record):
+        with self._lock:
+            self._pending = record
+            self._idle = False
+            self._wake.notify_all()
+
+    def clear(self):
+        self.save(b'')
+
+    def wait(self, timeout=None):
+        """Block until everything saved so far is on disk"""
+        with self._lock:
+            self._wake.wait_for(lambda: self._idle, timeout)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._wake.notify_all()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                self._wake.wait_for(lambda: self._pending is not None or self._closed)
+                record, self._pending = self._pending, None
+                if record is None:
+                    return
+            self._write(record)
+            with self._lock:
+                if self._pending is None:
+                    self._idle = True
+                    self._wake.notify_all()
+
+    def _write(self, record):
+        try:
+            if not record:
+                if os.path.exists(self.path):
+                    os.remove(self.path)
+                return
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(record)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except OSError:
+            # Losing a snapshot only costs the resume
+            pass
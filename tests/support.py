@@ -0,0 +1,59 @@
+"""Helpers shared by the tests.
+
+Importing this module puts the repository root on ``sys.path``, so test
+modules import it before any module of the app.
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+# Kivy must not parse the test runner's arguments
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+os.environ.setdefault('KIVY_NO_CONSOLELOG', '1')
+
+
+def records(count, start=1):
+    """Source records with ids from ``start``, each answered by its first option"""
+    for i in range(start - 1, start - 1 + count):
+        yield {
+            'id': i + 1,
+            'question': f'What is {i} + 1?',
+            'options': [str(i + 1), str(i), str(i + 2), str(i - 1)],
+            'correct_index': 0,
+            'explanation': f'{i} + 1 is {i + 1}.',
+        }
+
+
+def temp_dir(test):
+    """A temporary directory removed when ``test`` finishes"""
+    directory = tempfile.TemporaryDirectory()
+    test.addCleanup(directory.cleanup)
+    return directory.name
+
+
+def make_bank(test, banks=None, **kwargs):
+    """Compile ``(language, records)`` pairs (20 python questions by default); returns the path"""
+    from question_bank import write_bank
+
+    path = os.path.join(temp_dir(test), 'questions.bank')
+    write_bank(banks if banks is not None else [('python', records(20))], path, **kwargs)
+    return path
+
+
+def kivy_window():
+    """Kivy's window, drawn off screen without a display; skips the test if there is none"""
+    if sys.platform.startswith('linux') and not (os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY')):
+        os.environ.setdefault('SDL_VIDEODRIVER', 'offscreen')
+    try:
+        from kivy.base import EventLoop
+        EventLoop.ensure_window()
+    except SystemExit:  # Kivy exits when no window provider works
+        EventLoop = None
+    if EventLoop is None or EventLoop.window is None:
+        raise unittest.SkipTest('Kivy could not open a window')
+    return EventLoop.window
@@ -0,0 +1,106 @@
+"""Item response model, adaptive sampler and calibration.
+
+    python -m unittest discover tests
+"""
+import os
+import unittest
+
+from support import make_bank, temp_dir
+
+try:
+    import numpy
+except ImportError:
+    raise unittest.SkipTest('the adaptive mode needs NumPy')
+
+from adaptive import (GUESS, AbilityModel, AdaptiveSampler, calibrate, information, load_calibration,
+                      probability, save_calibration)
+from answer_log import AnswerLog
+from question_bank import QuestionBank
+
+
+class ModelTest(unittest.TestCase):
+    def test_probability(self):
+        self.assertAlmostEqual(probability(0.0, 0.0), GUESS + (1 - GUESS) / 2)
+        self.assertAlmostEqual(probability(10.0, -10.0), 1.0, places=6)
+        self.assertAlmostEqual(probability(-10.0, 10.0), GUESS, places=6)
+
+    def test_information_matches_its_definition(self):
+        difficulty = numpy.linspace(-4, 4, 81)
+        p = probability(0.5, difficulty)
+        slope = (p - GUESS) * (1 - p) / (1 - GUESS)
+        numpy.testing.assert_allclose(information(0.5, difficulty), slope ** 2 / (p * (1 - p)))
+
+
+class AdaptiveSamplerTest(unittest.TestCase):
+    def test_asks_the_most_informative_question(self):
+        difficulty = numpy.array([-3.0, 3.0, 0.4, -1.0, 1.5], dtype=numpy.float32)
+        sampler = AdaptiveSampler(5, seed=1, difficulty=difficulty)
+        sampler.cooldown = 2
+        best = int(information(0.0, difficulty).argmax())
+        drawn = [sampler.next() for _ in range(3)]
+        self.assertEqual(drawn[0], best)
+        self.assertEqual(len(set(drawn)), 3)
+        sampler.exclude({best})
+        self.assertNotIn(best, [sampler.next() for _ in range(10)])
+
+    def test_answers_move_ability_and_difficulty(self):
+        sampler = AdaptiveSampler(3)
+        sampler.record(0, True)
+        self.assertGreater(sampler.ability, 0)
+        self.assertLess(sampler.difficulty[0], 0)
+        sampler.record(1, False)
+        self.assertGreater(sampler.difficulty[1], 0)
+        self.assertEqual(sorted(sampler.changed), [0, 1])
+
+    def test_answers_to_removed_questions_are_ignored(self):
+        sampler = AdaptiveSampler(3)
+        sampler.exclude({2})
+        sampler.record(2, True)
+        self.assertEqual((sampler.ability, sampler.answered, sampler.changed), (0.0, 0, {}))
+
+
+class AbilityModelTest(unittest.TestCase):
+    def test_estimates_are_kept_between_sessions(self):
+        directory = temp_dir(self)
+        questions = QuestionBank(make_bank(self))['python']
+        path = os.path.join(directory, 'ability.json')
+        calibration_path = os.path.join(directory, 'calibration.npz')
+        save_calibration({'python': (numpy.array([3, 4]), numpy.array([1.5, -0.5]))}, calibration_path)
+
+        model = AbilityModel(path, calibration_path)
+        sampler = model.sampler('python', questions)
+        self.assertEqual(list(sampler.difficulty[:5]), [0, 0, 1.5, -0.5, 0])
+        for _ in range(5):
+            sampler.record(0, True)
+        model.save()
+
+        model = AbilityModel(path, calibration_path)
+        self.assertAlmostEqual(model.ability('python'), sampler.ability)
+        restored = model.sampler('python', questions)
+        self.assertAlmostEqual(float(restored.difficulty[0]), float(sampler.difficulty[0]), places=4)
+        self.assertEqual(float(restored.difficulty[2]), 1.5)
+        self.assertEqual(restored.answered, 5)
+
+
+class CalibrateTest(unittest.TestCase):
+    def test_missed_questions_come_out_harder(self):
+        directory = temp_dir(self)
+        paths = []
+        for learner in range(4):
+            path = os.path.join(directory, str(learner), 'answers.log')
+            log = AnswerLog(path)
+            for _ in range(5):
+                log.record('python', 1, 0, True, 1.0)
+                log.record('python', 2, 1, learner == 0, 1.0)
+            log.close()
+            paths.append(path)
+
+        calibration = calibrate(paths)
+        save_calibration(calibration, os.path.join(directory, 'calibration.npz'))
+        ids, difficulty = load_calibration(os.path.join(directory, 'calibration.npz'))['python']
+        self.assertEqual(list(ids), [1, 2])
+        self.assertLess(difficulty[0], difficulty[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+"""Columnar analytics over answer logs.
+
+    python -m unittest discover tests
+"""
+import os
+import unittest
+from unittest import mock
+
+from support import temp_dir
+
+try:
+    import numpy
+except ImportError:
+    raise unittest.SkipTest('analytics needs NumPy')
+
+import analytics
+from analytics import DAY, Analytics
+from answer_log import RECORD, AnswerLog
+
+
+class AnalyticsTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = temp_dir(self)
+        self.log_path = os.path.join(self.directory, 'answers.log')
+        self.store = os.path.join(self.directory, 'class.analytics')
+        self.time = 10 * DAY
+
+    def append(self, *answers):
+        """Append (language, question id, chosen, correct, latency) answers, a minute apart"""
+        with open(self.log_path, 'ab') as f:
+            for language, question_id, chosen, correct, latency in answers:
+                self.time += 60
+                f.write(RECORD.pack(self.time, language.encode('ascii'), question_id, chosen, correct, latency))
+
+    def test_sync_reads_only_new_records(self):
+        self.append(('python', 1, 0, True, 1.5), ('python', 1, 2, False, 4.0), ('cpp', 7, 0, True, 30.0))
+        store = Analytics(self.store)
+        self.assertEqual(store.sync(self.log_path), 3)
+        self.assertEqual(store.sync(self.log_path), 0)
+        self.append(('python', 1, 0, True, 0.5))
+        self.assertEqual(store.sync(self.log_path), 1)
+
+        stats = store.question_stats('python')
+        self.assertEqual((list(stats['question_id']), list(stats['answered'])), ([1], [3]))
+        self.assertAlmostEqual(stats['accuracy'][0], 2 / 3)
+        self.assertAlmostEqual(stats['mean_latency'][0], 2.0)
+        self.assertEqual(list(store.option_distribution('python', 1)), [2 / 3, 0, 1 / 3, 0])
+        self.assertEqual(list(store.option_distribution('rust', 1)), [0, 0, 0, 0])
+        self.assertEqual(store.summary(), {'python': (3, 2 / 3), 'cpp': (1, 1.0)})
+        edges, counts = store.latency_histogram()
+        self.assertEqual(list(counts), [1, 1, 0, 1, 0, 0, 0, 1, 0, 0, 0])
+
+    def test_saved_store_carries_on(self):
+        self.append(('python', 1, 0, True, 1.5), ('python', 2, 1, False, 2.5))
+        store = Analytics(self.store)
+        store.sync(self.log_path)
+        store.save()
+        self.append(('python', 2, 1, True, 2.5))
+
+        store = Analytics(self.store)
+        self.assertEqual(store.sync(self.log_path), 1)
+        self.assertEqual(store.summary(), {'python': (3, 2 / 3)})
+
+    def test_sync_after_compaction(self):
+        log = AnswerLog(self.log_path, flush_interval=0.01, compact_after=10 ** 9)
+        for i in range(30):
+            log.record('python', i, 0, True, 1.0)
+        log.close()
+        store = Analytics(self.store)
+        self.assertEqual(store.sync(self.log_path), 30)
+
+        log = AnswerLog(self.log_path, flush_interval=0.01, compact_after=20, keep_recent=5)
+        log.record('python', 99, 1, False, 1.0)
+        log.close()
+        self.assertEqual(os.path.getsize(self.log_path), 5 * RECORD.size)
+        self.assertEqual(store.sync(self.log_path), 1)
+        self.assertEqual(store.summary()['python'][0], 31)
+
+    def test_scan_skips_chunks_outside_the_time_range(self):
+        with mock.patch.object(analytics, 'CHUNK_ROWS', 4):
+            self.append(*[('python', i, 0, i % 2 == 0, 1.0) for i in range(10)])
+            store = Analytics(self.store)
+            store.sync(self.log_path)
+            store.save()
+            store = Analytics(self.store)
+        self.assertEqual([chunk['rows'] for chunk in store.manifest['chunks']], [4, 4])
+        start = 10 * DAY
+        ids = [list(values['question_id']) for values in store.scan(['question_id'], since=start + 5 * 60 + 1)]
+        self.assertEqual(ids, [[5, 6, 7], [8, 9]])
+        with mock.patch.object(numpy, 'load', side_effect=AssertionError('read a chunk')):
+            ids = [list(values['question_id']) for values in store.scan(['question_id'], since=start + 9 * 60)]
+        self.assertEqual(ids, [[8, 9]])
+
+
+if __name__ == '__main__':
+    unittest.main()
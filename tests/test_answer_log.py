@@ -0,0 +1,85 @@
+"""AnswerLog batching and compaction.
+
+    python -m unittest discover tests
+"""
+import os
+import time
+import unittest
+
+from support import temp_dir
+from answer_log import RECORD, AnswerLog, load_stats, read_log
+
+
+def answered(stats, records):
+    return sum(entry['answered'] for entry in stats.values()) + len(records)
+
+
+class AnswerLogTest(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(temp_dir(self), 'data', 'answers.log')
+
+    def test_answers_are_written_in_batches(self):
+        log = AnswerLog(self.path, flush_interval=60)
+        self.addCleanup(log.close)
+        log.record('python', 7, 2, False, 3.25)
+        log.record('cpp', 8, 0, True, 1.5)
+        self.assertEqual(os.path.getsize(self.path), 0)
+        log.flush(wait=True)
+        records = list(read_log(self.path))
+        self.assertEqual([record[1:] for record in records], [('python', 7, 2, False, 3.25), ('cpp', 8, 0, True, 1.5)])
+
+    def test_close_writes_what_is_buffered(self):
+        log = AnswerLog(self.path, flush_interval=60)
+        for i in range(300):
+            log.record('python', i, 1, True, 1.0)
+        log.close()
+        self.assertEqual(len(list(read_log(self.path))), 300)
+
+    def test_partial_record_is_ignored(self):
+        log = AnswerLog(self.path)
+        log.record('python', 1, 0, True, 1.0)
+        log.close()
+        with open(self.path, 'ab') as f:
+            f.write(b'\0' * (RECORD.size // 2))
+        self.assertEqual(len(list(read_log(self.path))), 1)
+
+
+class CompactionTest(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(temp_dir(self), 'answers.log')
+        log = AnswerLog(self.path, compact_after=10 ** 9)
+        for i in range(30):
+            log.record('python', i % 7 + 1, i % 4, i % 4 == 0, 1.5)
+        log.close()
+
+    def compact(self):
+        log = AnswerLog(self.path, flush_interval=0.01, compact_after=20, keep_recent=5)
+        deadline = time.monotonic() + 5
+        while os.path.getsize(self.path) > 5 * RECORD.size and time.monotonic() < deadline:
+            time.sleep(0.01)
+        log.close()
+
+    def test_compaction_keeps_every_answer(self):
+        self.compact()
+        stats, records = load_stats(self.path[:-4] + '.stats.json'), list(read_log(self.path))
+        self.assertEqual(len(records), 5)
+        self.assertEqual(answered(stats, records), 30)
+        self.assertEqual(stats['python/1']['chosen'], [1, 1, 1, 1])
+
+    def test_crash_before_the_log_is_rewritten(self):
+        with open(self.path, 'rb') as f:
+            before = f.read()
+        self.compact()
+        # As if the app died after the stats were written but before the log was
+        with open(self.path, 'wb') as f:
+            f.write(before)
+
+        stats_path = self.path[:-4] + '.stats.json'
+        self.assertEqual(answered(load_stats(stats_path), list(read_log(self.path))), 30)
+        AnswerLog(self.path).close()
+        self.assertEqual(os.path.getsize(self.path), 5 * RECORD.size)
+        self.assertEqual(answered(load_stats(stats_path), list(read_log(self.path))), 30)
+
+
+if __name__ == '__main__':
+    unittest.main()
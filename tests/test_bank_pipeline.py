@@ -0,0 +1,59 @@
+"""Validation and deduplication when the bank is compiled."""
+import json
+import os
+import unittest
+
+from support import records, temp_dir
+from bank_pipeline import MAX_ID, clean, clean_bank, validate
+from question_bank import QuestionBank
+from question_generator import GENERATED_ID_BIT
+
+
+class ValidateTest(unittest.TestCase):
+    def test_valid_record(self):
+        self.assertEqual(validate(next(records(1))), [])
+
+    def test_id_range(self):
+        record = next(records(1))
+        for question_id in (0, MAX_ID):
+            self.assertEqual(validate(dict(record, id=question_id)), [])
+        for question_id in (-1, GENERATED_ID_BIT, 2 ** 32, True):
+            with self.subTest(id=question_id):
+                self.assertEqual(len(validate(dict(record, id=question_id))), 1)
+
+    def test_malformed_fields_are_problems(self):
+        record = next(records(1))
+        for field, value in [('question', 5), ('options', 'abcd'), ('options', ['a', None, 'c', 'd']),
+                             ('correct_index', False), ('explanation', 7)]:
+            with self.subTest(field=field, value=value):
+                self.assertTrue(validate(dict(record, **{field: value})))
+        self.assertEqual(validate([1, 2]), ['is not a JSON object'])
+
+
+class CleanTest(unittest.TestCase):
+    def test_duplicates(self):
+        first, second = records(2)
+        same = dict(first, id=3)
+        reused = dict(second, id=1)
+        cleaned, report = clean([('python', [first, second, same, reused])], workers=1)
+        self.assertEqual([record['id'] for record in cleaned[0][1]], [1, 2])
+        self.assertEqual(report.duplicates, [{'language': 'python', 'id': 3, 'duplicate_of': 1}])
+        self.assertEqual(report.invalid, [{'language': 'python', 'id': 1, 'problems': ['duplicate id']}])
+
+    def test_out_of_range_ids_are_left_out_of_the_bank(self):
+        source_dir = os.path.join(temp_dir(self), 'questions')
+        os.mkdir(source_dir)
+        sources = list(records(3))
+        sources[1]['id'] = 2 ** 32
+        sources[2]['id'] = GENERATED_ID_BIT | 3
+        with open(os.path.join(source_dir, 'python.jsonl'), 'w', encoding='utf-8') as f:
+            f.writelines(json.dumps(record) + '\n' for record in sources)
+        bank_path = os.path.join(temp_dir(self), 'questions.bank')
+
+        report = clean_bank(source_dir, bank_path, workers=1)
+        self.assertEqual(sorted(entry['id'] for entry in report.invalid), [GENERATED_ID_BIT | 3, 2 ** 32])
+        self.assertEqual(list(QuestionBank(bank_path)['python'].ids), [1])
+
+
+if __name__ == '__main__':
+    unittest.main()
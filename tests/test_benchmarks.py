@@ -0,0 +1,73 @@
+"""The benchmark suite's measurements and baseline comparison.
+
+    python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+
+from support import ROOT_DIR, make_bank, records, temp_dir
+from question_bank import QuestionBank
+
+# The benchmarks import each other as scripts next to each other
+sys.path.insert(0, os.path.join(ROOT_DIR, 'benchmarks'))
+import bench_quiz  # noqa: E402
+import simulate_users  # noqa: E402
+
+metric = bench_quiz.metric
+
+
+class CompareTest(unittest.TestCase):
+    def test_regressions_past_tolerance_and_noise(self):
+        baseline = {
+            'load': metric(10.0, 'ms'),
+            'tiny': metric(0.2, 'ms'),
+            'throughput': metric(100.0, 'ops', better='higher'),
+            'leaked': metric(0, 'count'),
+            'gone': metric(1.0, 'ms'),
+        }
+        results = {
+            'load': metric(16.0, 'ms'),
+            'tiny': metric(0.9, 'ms'),  # 4.5x, but under the 1 ms noise floor
+            'throughput': metric(60.0, 'ops', better='higher'),
+            'leaked': metric(1, 'count'),
+        }
+        regressions = bench_quiz.compare(results, baseline, tolerance=1.5)
+        self.assertEqual([message.split(':')[0] for message in regressions], ['load', 'throughput', 'leaked'])
+        results.update(load=metric(14.0, 'ms'), throughput=metric(70.0, 'ops', better='higher'),
+                       leaked=metric(0, 'count'))
+        self.assertEqual(bench_quiz.compare(results, baseline, tolerance=1.5), [])
+
+    def test_percentile(self):
+        self.assertEqual(bench_quiz.percentile([5, 1, 4, 2, 3], 0.5), 3)
+        self.assertEqual(bench_quiz.percentile([5, 1, 4, 2, 3], 0.99), 5)
+
+
+class BankBenchmarkTest(unittest.TestCase):
+    def test_metrics_for_a_small_bank(self):
+        results = bench_quiz.bench_bank(300, temp_dir(self))
+        self.assertEqual(sorted(results), ['bank.300.compile', 'bank.300.fetch.p50', 'bank.300.file',
+                                           'bank.300.load', 'bank.300.load_heap'])
+        self.assertTrue(all(result['value'] > 0 for result in results.values()))
+
+
+class SimulateUsersTest(unittest.TestCase):
+    def test_every_user_plays_every_session(self):
+        class Log:
+            records = []
+
+            def record(self, *args):
+                self.records.append(args)
+
+        bank = QuestionBank(make_bank(self, [('python', records(30)), ('cpp', records(30))]))
+        results = simulate_users.simulate(bank, users=12, sessions=2, accuracy=1.0, think_time=5.0,
+                                          max_questions=10, answer_log=Log())
+        self.assertEqual(results['answers'], 12 * 2 * 10)
+        self.assertEqual(len(Log.records), 240)
+        self.assertTrue(all(record[3] for record in Log.records))
+        self.assertEqual({record[0] for record in Log.records}, {'python', 'cpp'})
+        self.assertGreater(results['virtual_s'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+"""Emoji texture atlas, drawn in an off-screen window.
+
+Kivy's bundled Roboto stands in for a color emoji font: the atlas only
+needs glyphs to rasterize.
+
+    python -m unittest discover tests
+"""
+import os
+import unittest
+from unittest import mock
+
+from support import kivy_window, temp_dir
+
+
+def setUpModule():
+    global emoji_atlas, FONT
+    kivy_window()
+    import kivy
+    import emoji_atlas
+    FONT = os.path.join(os.path.dirname(kivy.__file__), 'data', 'fonts', 'Roboto-Regular.ttf')
+
+
+class EmojiAtlasTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = temp_dir(self)
+        self.atlas = emoji_atlas.EmojiAtlas(self.directory, FONT)
+        self.addCleanup(self.atlas.save_trigger.cancel)
+
+    def fill(self, page):
+        from kivy.clock import Clock
+        for _ in range(len(emoji_atlas.EMOJI)):
+            Clock.tick()
+            if all(symbol in page for symbol in emoji_atlas.EMOJI):
+                return
+        self.fail('the page was not filled')
+
+    def test_buckets(self):
+        self.assertEqual([self.atlas.bucket(size) for size in (10, 32, 33, 500)], [32, 32, 48, 128])
+
+    def test_new_page_fills_over_several_frames(self):
+        from kivy.clock import Clock
+        page = self.atlas.page(40)
+        self.atlas.add(page, ['A'])
+        self.assertEqual(page.symbols, ['A'])
+        Clock.tick()
+        self.assertLessEqual(len(page.symbols), 1 + emoji_atlas.PREFILL_PER_FRAME)
+        self.fill(page)
+        self.assertEqual(page.cells['A'], (0, 0, 1 / emoji_atlas.GRID, 1 / emoji_atlas.GRID))
+
+    def test_saved_page_is_loaded_before_drawing(self):
+        page = self.atlas.page(48)
+        self.fill(page)
+        self.atlas.save()
+
+        atlas = emoji_atlas.EmojiAtlas(self.directory, FONT)
+        with mock.patch.object(emoji_atlas.AtlasPage, 'rasterize', side_effect=AssertionError('rasterized')):
+            loaded = atlas.page(48)
+        self.assertEqual(loaded.symbols, page.symbols)
+        self.assertEqual(loaded.pixels, page.pixels)
+
+        with open(FONT, 'rb') as f:
+            font = os.path.join(self.directory, 'other.ttf')
+            with open(font, 'wb') as copy:
+                copy.write(f.read())
+        self.assertIsNone(emoji_atlas.AtlasPage.load(atlas.page_path(48), 48, font))
+
+    def test_batch_is_one_mesh(self):
+        with mock.patch.object(emoji_atlas, 'emoji_atlas', self.atlas):
+            batch = emoji_atlas.EmojiBatch(32)
+            batch.draw([('A', 0, 0), ('B', 40, 0), ('A', 80, 0)])
+        page = self.atlas.pages[32]
+        self.assertIs(batch.mesh.texture, page.texture)
+        self.assertEqual((len(batch.mesh.vertices), len(batch.mesh.indices)), (3 * 16, 3 * 6))
+        self.assertEqual(batch.mesh.vertices[2:4], list(page.cells['A'][:2]))
+
+    def test_without_a_font_nothing_is_drawn(self):
+        atlas = emoji_atlas.EmojiAtlas(self.directory)
+        with mock.patch.object(emoji_atlas, 'find_font', return_value=None):
+            self.assertIsNone(atlas.page(32))
+            self.assertIsNone(atlas.page(64))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+"""Emoji lookups and search.
+
+    python -m unittest discover tests
+"""
+import os
+import unittest
+
+from support import temp_dir
+from emoji_index import EMOJI, EmojiIndex, open_index, source_signature
+
+
+class EmojiIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = EmojiIndex.build([(symbol, name, []) for symbol, name in EMOJI.items()]
+                                      + [('🐍', 'snake', ['python'])])
+
+    def test_lookups(self):
+        self.assertEqual(self.index.name('🚀'), 'rocket')
+        self.assertEqual(self.index.symbol('Smiling face with heart-eyes'), '😍')
+        self.assertEqual(self.index.symbol('python'), '🐍')
+        self.assertIsNone(self.index.symbol('unicorn'))
+        # With or without the emoji presentation selector
+        self.assertEqual(self.index.name('❤️'), 'red heart')
+        self.assertEqual(self.index.name('🍕️'), 'pizza')
+
+    def symbols(self, query, **kwargs):
+        return [symbol for symbol, name in self.index.search(query, **kwargs)]
+
+    def test_prefix_search(self):
+        self.assertEqual(self.symbols('smil'), ['😃', '😄', '😊', '😍', '😎'])
+        self.assertEqual(self.symbols('smil', prefix=False), [])
+        self.assertEqual(self.symbols('face with t'), ['😂', '😜'])
+
+    def test_exact_names_come_first(self):
+        self.assertEqual(self.symbols('grinning face')[0], '😀')
+        # then names starting with the query
+        self.assertEqual(self.symbols('face', limit=3), ['😂', '😘', '😋'])
+
+    def test_misspellings(self):
+        self.assertEqual(self.symbols('rokcet'), ['🚀'])
+        self.assertEqual(self.symbols('pizzza'), ['🍕'])
+        self.assertEqual(self.symbols('sum'), [])  # too short to guess at
+
+    def test_saved_index(self):
+        path = os.path.join(temp_dir(self), 'emoji.index')
+        self.index.save(path, ['signature'])
+        loaded = EmojiIndex.load(path)
+        self.assertEqual(loaded.signature, ['signature'])
+        self.assertEqual(loaded.name('🐍'), 'snake')
+        self.assertEqual(loaded.search('smil'), self.index.search('smil'))
+
+    def test_open_index_rebuilds_a_stale_file(self):
+        path = os.path.join(temp_dir(self), 'emoji.index')
+        self.index.save(path, ['stale'])
+        index = open_index(path)
+        self.assertIsNone(index.symbol('python'))
+        self.assertEqual(index.symbol('rocket'), '🚀')
+        self.assertEqual(EmojiIndex.load(path).signature, source_signature())
+
+
+if __name__ == '__main__':
+    unittest.main()
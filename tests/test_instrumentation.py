@@ -0,0 +1,80 @@
+"""Timing spans and trace export.
+
+    python -m unittest discover tests
+"""
+import json
+import os
+import unittest
+
+from support import kivy_window, temp_dir
+
+
+def setUpModule():
+    global instrumentation
+    kivy_window()
+    import instrumentation
+
+
+class ProfilerTest(unittest.TestCase):
+    def setUp(self):
+        self.profiler = instrumentation.Profiler()
+        self.addCleanup(self.profiler.disable)
+
+        class Quiz:
+            @instrumentation.timed(profiler=self.profiler)
+            def load_question(self, number):
+                return number * 2
+
+        self.quiz = Quiz()
+
+    def test_spans_only_while_enabled(self):
+        self.assertEqual(self.quiz.load_question(1), 2)
+        self.assertEqual(len(self.profiler.spans), 0)
+        self.profiler.enable()
+        self.assertEqual(self.quiz.load_question(2), 4)
+        with self.profiler.span('draw', 'ui'):
+            pass
+        self.profiler.disable()
+        self.quiz.load_question(3)
+        self.assertEqual([span[:2] for span in self.profiler.spans],
+                         [('ProfilerTest.setUp.<locals>.Quiz.load_question', 'quiz'), ('draw', 'ui')])
+
+    def test_slowest(self):
+        for name, duration in [('a', 0.001), ('b', 0.010), ('a', 0.003)]:
+            self.profiler.add_span(name, 'quiz', 0.0, duration)
+        self.assertEqual(self.profiler.slowest(), [('b', 1, 0.010, 0.010), ('a', 2, 0.002, 0.003)])
+
+    def test_export_trace(self):
+        self.profiler.add_span('load_question', 'quiz', self.profiler.origin + 0.5, 0.002)
+        path = self.profiler.export_trace(os.path.join(temp_dir(self), 'trace.json'))
+        with open(path) as f:
+            trace = json.load(f)
+        event, = trace['traceEvents']
+        self.assertEqual((event['name'], event['ph'], event['pid']), ('load_question', 'X', os.getpid()))
+        self.assertAlmostEqual(event['ts'], 500000)
+        self.assertAlmostEqual(event['dur'], 2000)
+
+
+class InstallTest(unittest.TestCase):
+    def test_overlay_is_built_on_first_toggle(self):
+        from kivy.core.window import Window
+        profiler = instrumentation.Profiler()
+        self.addCleanup(profiler.disable)
+
+        def overlays():
+            return [child for child in Window.children if isinstance(child, instrumentation.ProfilerOverlay)]
+
+        instrumentation.install(temp_dir(self), profiler)
+        self.assertEqual(overlays(), [])
+        Window.dispatch('on_keyboard', instrumentation.KEY_TOGGLE, 0, None, [])
+        self.assertTrue(profiler.enabled)
+        overlay, = overlays()
+        Window.dispatch('on_keyboard', instrumentation.KEY_TOGGLE, 0, None, [])
+        self.assertEqual(overlays(), [])
+        Window.dispatch('on_keyboard', instrumentation.KEY_TOGGLE, 0, None, [])
+        self.assertEqual(overlays(), [overlay])
+        Window.dispatch('on_keyboard', instrumentation.KEY_TOGGLE, 0, None, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
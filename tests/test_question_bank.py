@@ -0,0 +1,132 @@
+"""Compiled question banks.
+
+    python -m unittest discover tests
+"""
+import json
+import os
+import time
+import unittest
+
+from support import make_bank, records, temp_dir
+from question_bank import COMPRESSIONS, BankLoader, Question, QuestionBank, open_bank
+
+
+class QuestionBankTest(unittest.TestCase):
+    def test_round_trip(self):
+        bank = QuestionBank(make_bank(self, [('python', records(3)), ('cpp', records(2, start=10))]))
+        self.assertEqual(bank.languages, ['python', 'cpp'])
+        self.assertEqual((bank.count('python'), bank.count('cpp')), (3, 2))
+        question = bank['cpp'][1]
+        self.assertEqual((question.id, question.language, question.correct_index), (11, 'cpp', 0))
+        self.assertEqual(question.question, 'What is 10 + 1?')
+        self.assertEqual(question.options, ['11', '10', '12', '9'])
+        self.assertEqual(question.explanation, '10 + 1 is 11.')
+
+    def test_every_compression_round_trips_across_chunks(self):
+        expected = list(records(150))
+        for compression in COMPRESSIONS:
+            with self.subTest(compression=compression):
+                bank = QuestionBank(make_bank(self, [('python', expected)], compression=compression, chunk_size=64))
+                questions = bank['python']
+                for i in (0, 63, 64, 127, 128, 149):
+                    self.assertEqual(questions[i].question, expected[i]['question'])
+                    self.assertEqual(questions[i].options, expected[i]['options'])
+                    self.assertEqual(questions[i].explanation, expected[i]['explanation'])
+
+    def test_decompressed_chunks_are_bounded(self):
+        bank = QuestionBank(make_bank(self, [('python', records(150))], compression='zlib', chunk_size=16),
+                            max_chunks=3)
+        questions = bank['python']
+        for question in questions:
+            question.question
+        self.assertEqual(list(bank.store._cache), [7, 8, 9])
+        questions[20].question
+        self.assertEqual(list(bank.store._cache), [8, 9, 1])
+
+    def test_languages_are_loaded_on_first_use(self):
+        bank = QuestionBank(make_bank(self, [('python', records(3)), ('cpp', records(2))]))
+        self.assertFalse(bank.is_loaded('python'))
+        self.assertEqual(bank.count('python'), 3)
+        questions = bank['python']
+        self.assertTrue(bank.is_loaded('python'))
+        self.assertFalse(bank.is_loaded('cpp'))
+        self.assertIs(bank['python'], questions)
+
+    def test_not_a_bank(self):
+        path = os.path.join(temp_dir(self), 'questions.bank')
+        with open(path, 'wb') as f:
+            f.write(b'not a bank at all')
+        with self.assertRaises(ValueError):
+            QuestionBank(path)
+
+    def test_open_bank_recompiles_changed_sources(self):
+        source_dir = os.path.join(temp_dir(self), 'questions')
+        os.mkdir(source_dir)
+        source = os.path.join(source_dir, 'python.jsonl')
+        bank_path = os.path.join(temp_dir(self), 'questions.bank')
+
+        def write(count):
+            with open(source, 'w', encoding='utf-8') as f:
+                f.writelines(json.dumps(record) + '\n' for record in records(count))
+
+        write(2)
+        self.assertEqual(open_bank(source_dir, bank_path).count('python'), 2)
+        write(5)
+        later = time.time() + 10
+        os.utime(source, (later, later))
+        self.assertEqual(open_bank(source_dir, bank_path).count('python'), 5)
+
+
+class QuestionListTest(unittest.TestCase):
+    def setUp(self):
+        record = dict(next(records(1, start=30)), question='Qu’est-ce que 🐍 ?', options=['ä', 'ß', '字', ''])
+        self.questions = QuestionBank(make_bank(self, [('cpp', records(2)), ('python', [record, *records(4)])]))['python']
+
+    def test_sequence(self):
+        self.assertEqual(len(self.questions), 5)
+        self.assertIsInstance(self.questions[0], Question)
+        self.assertEqual(self.questions[-1].id, 4)
+        self.assertEqual([question.id for question in self.questions[1:3]], [1, 2])
+        with self.assertRaises(IndexError):
+            self.questions[5]
+
+    def test_text_is_decoded_per_field(self):
+        question = self.questions[0]
+        self.assertEqual(question.question, 'Qu’est-ce que 🐍 ?')
+        self.assertEqual(question.options, ['ä', 'ß', '字', ''])
+        self.assertEqual(question.explanation, '29 + 1 is 30.')
+
+    def test_ids_and_find(self):
+        self.assertEqual(list(self.questions.ids), [30, 1, 2, 3, 4])
+        self.assertEqual(self.questions.find(3).question, 'What is 2 + 1?')
+        self.assertIsNone(self.questions.find(99))
+
+
+class BankLoaderTest(unittest.TestCase):
+    def test_languages_become_ready_in_the_background(self):
+        bank_path = make_bank(self, [('python', records(3)), ('cpp', records(2))])
+        loader = BankLoader(os.path.join(temp_dir(self), 'no sources'), bank_path)
+        ready = []
+        loader.bind_ready(ready.append)
+        loader.start()
+        self.assertEqual(len(loader.load('cpp', timeout=5)), 2)
+        self.assertEqual(len(loader['python']), 3)
+        loader._thread.join(5)
+        self.assertEqual(ready, ['python', 'cpp'])
+        late = []
+        loader.bind_ready(late.append)
+        self.assertEqual(late, ['python', 'cpp'])
+        with self.assertRaises(KeyError):
+            loader.load('rust', timeout=5)
+
+    def test_load_raises_what_stopped_the_loader(self):
+        directory = temp_dir(self)
+        loader = BankLoader(os.path.join(directory, 'no sources'), os.path.join(directory, 'questions.bank'))
+        with self.assertLogs('question_bank', 'ERROR'):
+            loader.start()
+            with self.assertRaises(OSError):
+                loader.load('python', timeout=5)
+
+
+if __name__ == '__main__':
+    unittest.main()
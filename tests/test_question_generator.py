@@ -0,0 +1,61 @@
+"""Template-based question generation.
+
+    python -m unittest discover tests
+"""
+import random
+import unittest
+
+import support  # noqa: F401 (puts the app on sys.path)
+from bank_pipeline import validate
+from question_generator import GENERATED_ID_BIT, IntParam, QuestionGenerator, Template
+
+ADD = Template(
+    'test.add', 'python',
+    [IntParam('a', 1, 3), IntParam('b', 1, 3)],
+    "What is {a} + {b}?",
+    answer=lambda p: p['a'] + p['b'],
+    distractors=lambda p: [p['a'] - p['b'], p['a'] * p['b'], p['a'] + p['b']],
+    explanation="{a} + {b} is {answer}.",
+    commutative=('a', 'b'),
+)
+
+
+class QuestionGeneratorTest(unittest.TestCase):
+    def setUp(self):
+        self.generator = QuestionGenerator(templates=[ADD])
+
+    def test_stream_never_repeats_and_runs_out(self):
+        questions = list(self.generator.stream('python', random.Random(1)))
+        # 1+2 and 2+1 are the same question
+        self.assertEqual(sorted(question.canonical for question in questions),
+                         [('test.add', a, b) for a in range(1, 4) for b in range(a, 4)])
+        self.assertEqual(list(self.generator.stream('cpp')), [])
+
+    def test_instances_are_answered_correctly(self):
+        for question in self.generator.stream('python', random.Random(2)):
+            a, b = question.canonical[1:]
+            self.assertEqual(question.options[question.correct_index], str(a + b))
+            self.assertEqual(len(set(question.options)), 4)
+            self.assertEqual(question.explanation, f'{a} + {b} is {a + b}.')
+            self.assertTrue(question.id & GENERATED_ID_BIT)
+
+    def test_an_instance_always_comes_out_the_same(self):
+        question = next(self.generator.stream('python', random.Random(3)))
+        rebuilt = self.generator.rebuild(question.canonical)
+        self.assertEqual(rebuilt.to_record(), question.to_record())
+        self.assertIsNone(self.generator.rebuild(('test.gone', 1, 2)))
+
+    def test_batch_of_the_shipped_templates(self):
+        generator = QuestionGenerator()
+        for language in generator.languages:
+            with self.subTest(language=language):
+                questions = generator.batch(language, 300, seed=4)
+                self.assertEqual(len(questions), 300)
+                self.assertEqual(len({question.canonical for question in questions}), 300)
+                for question in questions:
+                    self.assertEqual(validate(dict(question.to_record(), id=1)), [])
+                    self.assertEqual(question.to_record(), generator.rebuild(question.canonical).to_record())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+"""RemoteSession against a stand-in quiz server.
+
+    python -m unittest discover tests
+"""
+import os
+import time
+import unittest
+from unittest import mock
+
+from support import make_bank, temp_dir
+import quiz_server
+from answer_store import SQLiteStore
+from question_bank import QuestionBank
+from question_generator import QuestionGenerator
+from quiz_client import QuizClient, RemoteSession, ServerError
+from quiz_server import BackgroundServer, QuizServer
+from quiz_session import QuizSession
+from sampler import make_sampler
+
+
+class RemoteSessionTest(unittest.TestCase):
+    def setUp(self):
+        self.bank = QuestionBank(make_bank(self))
+        # No generated questions: the fallback can only score bank ones
+        self.server = QuizServer(self.bank, SQLiteStore(os.path.join(temp_dir(self), 'answers.db')),
+                                 QuestionGenerator(templates=()), flush_interval=0.05)
+        background = BackgroundServer(self.server)
+        host, port = background.start()
+        self.addCleanup(background.stop)
+        self.client = QuizClient(host, port)
+        self.addCleanup(self.client.close)
+
+    def fallback(self):
+        questions = self.bank['python']
+        return QuizSession('python', questions, make_sampler('shuffle', len(questions)))
+
+    def test_answer_after_session_expired(self):
+        session = RemoteSession(self.client, 'python', 'shuffle', fallback=self.fallback)
+        question = session.load_question()[1]
+        self.assertIsNone(question.correct_index)
+
+        with mock.patch.object(quiz_server, 'SESSION_TIMEOUT', 0):
+            deadline = time.monotonic() + 5
+            while self.server.sessions and time.monotonic() < deadline:
+                time.sleep(0.01)
+        self.assertFalse(self.server.sessions)
+
+        self.assertTrue(session.answer(0))
+        self.assertIsNotNone(session.local)
+        self.assertEqual(session.revealed, (0, self.bank['python'].find(question.id).explanation))
+        self.assertEqual((session.answered, session.score), (1, 1))
+        session.load_question()
+        self.assertFalse(session.answer(1))
+        self.assertEqual((session.answered, session.score), (2, 1))
+
+    def test_expired_session_without_fallback_raises(self):
+        session = RemoteSession(self.client, 'python', 'shuffle')
+        session.load_question()
+        self.server.sessions.clear()
+        with self.assertRaises(ServerError):
+            session.answer(0)
+
+    def test_unexpected_error_keeps_the_connection(self):
+        session = RemoteSession(self.client, 'python', 'shuffle')
+        session.load_question()
+        with mock.patch.object(self.server, 'op_hello', side_effect=KeyError('languages')), \
+                self.assertLogs('quiz_server', 'ERROR'):
+            with self.assertRaises(ServerError):
+                self.client.call('hello')
+        session.answer(0)
+        self.assertIsNone(session.local)
+        self.assertEqual(session.answered, 1)
+
+
+class QuizClientTest(unittest.TestCase):
+    def test_unreachable_server_is_not_retried_at_once(self):
+        client = QuizClient('127.0.0.1', 1, timeout=0.5, retry_interval=60)
+        self.addCleanup(client.close)
+        with self.assertRaises(OSError):
+            client.call('hello')
+        with mock.patch('socket.create_connection') as connect, self.assertRaises(ConnectionError):
+            client.call('hello')
+        connect.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
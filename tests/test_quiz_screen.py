@@ -0,0 +1,42 @@
+"""Quiz screen widgets, drawn in an off-screen window.
+
+    python -m unittest discover tests
+"""
+import unittest
+
+from support import kivy_window
+
+
+def setUpModule():
+    kivy_window()
+
+
+class ProgressStripTest(unittest.TestCase):
+    def setUp(self):
+        from quiz_screen import ProgressStrip
+        self.strip = ProgressStrip(pos=(0, 0), size=(98, 10))
+
+    def test_segments_are_laid_out(self):
+        self.strip.reset(10)
+        self.assertEqual([rect.pos[0] for rect in self.strip.segment_rects[:3]], [0, 10, 20])
+        self.assertEqual(self.strip.segment_rects[9].size, (8, 10))
+
+    def test_reset_reuses_segments(self):
+        self.strip.reset(10)
+        rects = list(self.strip.segment_rects)
+        self.strip.set_segment(3, (0, 1, 0, 1))
+        self.strip.set_segment(10, (1, 0, 0, 1))  # past the end: ignored
+        self.assertEqual(self.strip.segment_colors[3].rgba, [0, 1, 0, 1])
+
+        self.strip.reset(5)
+        self.assertEqual(self.strip.segment_rects, rects)
+        self.assertEqual(self.strip.segment_colors[3].rgba, list(self.strip.UNANSWERED))
+        self.assertEqual(self.strip.segment_rects[7].size, (0, 0))
+
+        self.strip.reset(12)
+        self.assertEqual(self.strip.segment_rects[:10], rects)
+        self.assertEqual(len(self.strip.segment_rects), 12)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+"""QuizSession over a bank whose sources change while it runs.
+
+    python -m unittest discover tests
+"""
+import unittest
+
+from support import make_bank, records
+from bank_watcher import BankChange
+from question_bank import QuestionBank, SourceQuestion
+from question_generator import GENERATED_ID_BIT, QuestionGenerator
+from quiz_session import QuizSession
+from sampler import SAMPLERS, WeightedSampler, make_sampler
+
+
+class Recorder:
+    """Stands in for an AnswerLog"""
+    def __init__(self):
+        self.records = []
+
+    def record(self, *args):
+        self.records.append(args)
+
+
+class QuizSessionTest(unittest.TestCase):
+    def setUp(self):
+        self.questions = QuestionBank(make_bank(self))['python']
+
+    def test_a_session_scores_and_logs_its_answers(self):
+        now = [100.0]
+        log = Recorder()
+        session = QuizSession('python', self.questions, make_sampler('shuffle', len(self.questions), seed=5),
+                              answer_log=log, max_questions=3, clock=lambda: now[0])
+        for chosen in (0, 1, 0):
+            question = session.load_question()[1]
+            now[0] += 2.5
+            self.assertEqual(session.answer(chosen), chosen == 0)
+            self.assertEqual(session.revealed, (0, question.explanation))
+        self.assertTrue(session.finished)
+        self.assertEqual((session.answered, session.score, session.results), (3, 2, [True, False, True]))
+        self.assertEqual([record[2:] for record in log.records], [(0, True, 2.5), (1, False, 2.5), (0, True, 2.5)])
+
+        session.restart()
+        self.assertFalse(session.finished)
+        self.assertEqual((session.answered, session.score, session.results), (0, 0, []))
+
+    def test_generated_questions_are_mixed_in(self):
+        session = QuizSession('python', self.questions, make_sampler('shuffle', len(self.questions), seed=6),
+                              QuestionGenerator(), max_questions=200, generated_share=0.5)
+        ids = []
+        for _ in range(200):
+            question = session.load_question()[1]
+            ids.append(question.id)
+            self.assertTrue(session.answer(question.correct_index))
+        generated = sum(1 for question_id in ids if question_id & GENERATED_ID_BIT)
+        self.assertTrue(60 < generated < 140)
+        self.assertEqual(len(set(question_id for question_id in ids if question_id & GENERATED_ID_BIT)), generated)
+
+
+class RemovedQuestionsTest(unittest.TestCase):
+    def setUp(self):
+        self.questions = QuestionBank(make_bank(self))['python']
+
+    def play(self, session, count):
+        asked = []
+        for _ in range(count):
+            question = session.load_question()[1]
+            asked.append(question.id)
+            session.answer(1)  # always wrong: the weighted sampler would favour these
+        return asked
+
+    def test_weighted_sampler_with_few_questions_left(self):
+        session = QuizSession('python', self.questions, WeightedSampler(len(self.questions), seed=1),
+                              max_questions=500)
+        self.play(session, 50)
+        self.questions.apply(BankChange('python', removed=list(range(1, 18))))
+        session.questions_changed()
+        self.assertEqual(set(self.play(session, 300)), {18, 19, 20})
+
+    def test_every_mode_skips_removed_questions(self):
+        self.questions.apply(BankChange('python', removed=list(range(3, 21))))
+        for mode in SAMPLERS:
+            with self.subTest(mode=mode):
+                session = QuizSession('python', self.questions, make_sampler(mode, len(self.questions), seed=2),
+                                      max_questions=100)
+                self.assertEqual(set(self.play(session, 100)), {1, 2})
+
+    def test_restored_question_is_asked_again(self):
+        session = QuizSession('python', self.questions, WeightedSampler(len(self.questions), seed=3),
+                              max_questions=500)
+        self.questions.apply(BankChange('python', removed=list(range(2, 21))))
+        session.questions_changed()
+        self.assertEqual(set(self.play(session, 20)), {1})
+        record = list(records(2))[1]
+        self.questions.apply(BankChange('python', modified=[SourceQuestion('python', record)]))
+        session.questions_changed()
+        self.assertEqual(set(self.play(session, 100)), {1, 2})
+
+    def test_every_question_removed(self):
+        session = QuizSession('python', self.questions, WeightedSampler(len(self.questions)))
+        self.questions.apply(BankChange('python', removed=list(range(1, 21))))
+        session.questions_changed()
+        with self.assertRaises(ValueError):
+            session.load_question()
+
+
+class PrefetchTest(unittest.TestCase):
+    def setUp(self):
+        questions = QuestionBank(make_bank(self))['python']
+        self.session = QuizSession('python', questions, make_sampler('shuffle', len(questions), seed=4),
+                                   max_questions=2)
+
+    def test_prefetched_question_is_shown_next(self):
+        upcoming = self.session.prefetch()
+        self.assertIs(self.session.prefetch(), upcoming)
+        self.assertIs(self.session.load_question(), upcoming)
+        self.assertIs(self.session.current_question, upcoming[1])
+        self.assertEqual(upcoming[2:], (upcoming[1].question, upcoming[1].options))
+        self.assertIsNone(self.session.upcoming)
+
+    def test_nothing_is_prefetched_after_the_last_question(self):
+        for _ in range(2):
+            self.session.load_question()
+            self.session.answer(0)
+        self.assertIsNone(self.session.prefetch())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+"""Question samplers.
+
+    python -m unittest discover tests
+"""
+import json
+import unittest
+
+import support  # noqa: F401 (puts the app on sys.path)
+from sampler import (SAMPLERS, ShuffleSampler, SpacedRepetitionSampler, WeightedSampler,
+                     make_sampler, sampler_from_state)
+
+
+class ShuffleSamplerTest(unittest.TestCase):
+    def test_every_question_once_per_round(self):
+        sampler = ShuffleSampler(50, seed=1)
+        for _ in range(3):
+            self.assertEqual(sorted(sampler.next() for _ in range(50)), list(range(50)))
+
+    def test_no_repeat_across_rounds(self):
+        sampler = ShuffleSampler(2, seed=2)
+        drawn = [sampler.next() for _ in range(40)]
+        self.assertTrue(all(a != b for a, b in zip(drawn, drawn[1:])))
+
+    def test_grown_questions_join_the_round(self):
+        sampler = ShuffleSampler(10, seed=3)
+        first = [sampler.next() for _ in range(5)]
+        sampler.grow(15)
+        self.assertEqual(sorted(first + [sampler.next() for _ in range(10)]), list(range(15)))
+
+
+class WeightedSamplerTest(unittest.TestCase):
+    def assertTreeMatches(self, sampler):
+        weights = [sampler.weight(i) for i in range(sampler.size)]
+        for i in range(sampler.size + 1):
+            self.assertAlmostEqual(sampler._prefix(i), sum(weights[:i]))
+
+    def test_tree_follows_weights(self):
+        sampler = WeightedSampler(13, weights={3: 4.0, 7: 0.5})
+        self.assertTreeMatches(sampler)
+        sampler.set_weight(12, 8.0)
+        sampler.set_weight(3, 1.0)
+        self.assertTreeMatches(sampler)
+        sampler.grow(40)
+        sampler.set_weight(35, 2.0)
+        self.assertTreeMatches(sampler)
+
+    def test_answers_change_weights_within_bounds(self):
+        sampler = WeightedSampler(4)
+        for _ in range(10):
+            sampler.record(0, False)
+            sampler.record(1, True)
+        self.assertEqual((sampler.weight(0), sampler.weight(1)), (sampler.max_weight, sampler.min_weight))
+
+    def test_draws_follow_weights(self):
+        sampler = WeightedSampler(4, seed=4, weights={0: 16.0})
+        drawn = [sampler.next() for _ in range(2000)]
+        # 16 of 19, less the draws that avoid repeating the last question
+        self.assertGreater(drawn.count(0) / len(drawn), 0.6)
+        self.assertEqual(set(drawn), {0, 1, 2, 3})
+
+
+class SpacedRepetitionSamplerTest(unittest.TestCase):
+    def test_missed_question_comes_back(self):
+        sampler = SpacedRepetitionSampler(100, seed=5)
+        missed = sampler.next()
+        sampler.record(missed, False)
+        drawn = [sampler.next() for _ in range(sampler.intervals[0])]
+        self.assertEqual(drawn[-1], missed)
+        sampler.record(missed, True)
+        drawn = [sampler.next() for _ in range(sampler.intervals[1])]
+        self.assertEqual(drawn[-1], missed)
+
+
+class StateTest(unittest.TestCase):
+    def test_restored_sampler_draws_the_same(self):
+        for mode in SAMPLERS:
+            with self.subTest(mode=mode):
+                sampler = make_sampler(mode, 30, seed=6)
+                for i in range(20):
+                    index = sampler.next()
+                    sampler.record(index, i % 3 == 0)
+                sampler.exclude({4, 5})
+                state = json.loads(json.dumps(sampler.get_state()))
+                restored = sampler_from_state(state)
+                restored.exclude({4, 5})
+                self.assertEqual(restored.mode, mode)
+                self.assertEqual([restored.next() for _ in range(40)], [sampler.next() for _ in range(40)])
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            make_sampler('alphabetical', 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+"""Full-text search over question banks.
+
+    python -m unittest discover tests
+"""
+import os
+import unittest
+
+from support import make_bank, records, temp_dir
+from bank_watcher import BankChange
+from question_bank import QuestionBank, SourceQuestion
+from search_index import SearchIndex, open_index
+
+
+def question(question_id, text, options=('a', 'b', 'c', 'd'), explanation=''):
+    return {'id': question_id, 'question': text, 'options': list(options), 'correct_index': 0,
+            'explanation': explanation}
+
+
+SOURCES = [
+    ('cpp', [question(1, 'What does a pointer hold?', explanation='An address.'),
+             question(2, 'Which header declares std::vector?', ['<vector>', '<list>', '<map>', '<set>']),
+             question(3, 'What is a dangling reference?', explanation='A pointer or reference to freed memory.')]),
+    ('python', [question(1, 'What does len() return?'),
+                question(2, 'Which keyword defines a function?', ['def', 'fun', 'lambda', 'pointer'])]),
+]
+
+
+class SearchIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.bank = QuestionBank(make_bank(self, SOURCES))
+        self.index = SearchIndex.build(self.bank)
+
+    def ids(self, query, **kwargs):
+        return [(language, question_id) for score, language, question_id in self.index.search(query, **kwargs)]
+
+    def test_ranking_favours_question_words(self):
+        self.assertEqual(self.ids('pointer'), [('cpp', 1), ('python', 2), ('cpp', 3)])
+        self.assertEqual(self.ids('pointer', language='cpp', limit=1), [('cpp', 1)])
+        self.assertEqual(self.ids('pointer', language='rust'), [])
+
+    def test_last_word_is_a_prefix(self):
+        self.assertEqual(self.ids('vec'), [('cpp', 2)])
+        self.assertEqual(self.ids('vec', prefix=False), [])
+        self.assertEqual(self.index.matching('dangling refer'), [('cpp', 3)])
+        self.assertEqual(self.index.matching('dangling vector'), [])
+
+    def test_remove_and_apply(self):
+        self.assertTrue(self.index.remove('cpp', 1))
+        self.assertFalse(self.index.remove('cpp', 1))
+        self.assertEqual(self.ids('pointer'), [('python', 2), ('cpp', 3)])
+        record = question(4, 'What is a smart pointer?')
+        self.index.apply(BankChange('python', added=[SourceQuestion('python', record)], removed=[2]))
+        self.assertEqual(self.ids('pointer'), [('python', 4), ('cpp', 3)])
+        self.assertEqual(len(self.index), 4)
+
+    def test_saved_index_answers_the_same(self):
+        path = os.path.join(temp_dir(self), 'questions.index')
+        self.index.remove('cpp', 3)
+        self.index.save(path)
+        loaded = SearchIndex.load(path)
+        self.assertEqual(loaded.search('pointer'), self.index.search('pointer'))
+        self.assertEqual(loaded.matching('func'), [('python', 2)])
+        loaded.add('cpp', 9, 'Pointer arithmetic', [], '')
+        self.assertEqual(loaded.search('pointer')[0][1:], ('cpp', 9))
+
+    def test_open_index_rebuilds_for_a_new_bank(self):
+        path = os.path.join(temp_dir(self), 'questions.index')
+        self.assertEqual(len(open_index(self.bank, path)), 5)
+        self.assertEqual(len(open_index(self.bank, path)), 5)
+        other = QuestionBank(make_bank(self, [('python', records(7))]))
+        self.assertEqual(len(open_index(other, path)), 7)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+"""Saving a quiz round and resuming it.
+
+    python -m unittest discover tests
+"""
+import os
+import time
+import unittest
+
+from support import make_bank, temp_dir
+from question_bank import QuestionBank
+from question_generator import QuestionGenerator
+from quiz_session import QuizSession
+from sampler import make_sampler
+import session_snapshot
+from session_snapshot import SnapshotWriter, capture, load, parse, restore
+
+
+class SessionSnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.questions = QuestionBank(make_bank(self))['python']
+        self.generator = QuestionGenerator()
+
+    def session(self, generated_share=0.0, seed=3):
+        return QuizSession('python', self.questions, make_sampler('shuffle', len(self.questions), seed=seed),
+                           self.generator, max_questions=8, generated_share=generated_share)
+
+    def play(self, session, answers):
+        for chosen in answers:
+            session.load_question()
+            session.answer(chosen)
+        return session.load_question()
+
+    def test_bank_question_round_trip(self):
+        session = self.session()
+        shown = self.play(session, [0, 1, 0])
+        path = os.path.join(temp_dir(self), 'session.snapshot')
+        writer = SnapshotWriter(path)
+        self.addCleanup(writer.close)
+        writer.save(capture(session, 'shuffle'))
+        writer.wait()
+
+        snapshot = load(path)
+        self.assertEqual((snapshot.language, snapshot.mode, snapshot.max_questions), ('python', 'shuffle', 8))
+        self.assertFalse(snapshot.showing_result)
+        resumed = self.session(seed=4)
+        self.assertTrue(restore(snapshot, resumed, self.questions))
+        self.assertEqual((resumed.answered, resumed.score, resumed.results), (3, 2, [True, False, True]))
+        index, question, text, options = resumed.load_question()
+        self.assertEqual((index, question.id, text, options), (shown[0], shown[1].id) + shown[2:])
+
+        writer.clear()
+        writer.wait()
+        self.assertFalse(os.path.exists(path))
+
+    def test_generated_question_is_rebuilt(self):
+        session = self.session(generated_share=1.0)
+        index, question, text, options = self.play(session, [1])
+        self.assertIsNone(index)
+        snapshot = parse(capture(session, 'shuffle'))
+        self.assertEqual(snapshot.canonical, tuple(question.canonical))
+
+        resumed = self.session()
+        self.assertTrue(restore(snapshot, resumed, self.questions, self.generator))
+        index, rebuilt, rebuilt_text, rebuilt_options = resumed.upcoming
+        self.assertEqual((rebuilt.id, rebuilt_text, rebuilt_options), (question.id, text, options))
+        self.assertFalse(restore(snapshot, self.session(), self.questions))
+
+    def test_answered_question_is_not_asked_again(self):
+        session = self.session()
+        self.play(session, [])
+        session.answer(2)
+        snapshot = parse(capture(session, 'shuffle', chosen=2))
+        self.assertTrue(snapshot.showing_result)
+        self.assertEqual(snapshot.chosen, 2)
+        resumed = self.session()
+        self.assertFalse(restore(snapshot, resumed, self.questions))
+        self.assertIsNone(resumed.upcoming)
+        self.assertEqual(resumed.answered, 1)
+
+    def test_moved_question_is_found_by_id(self):
+        session = self.session()
+        index, question = self.play(session, [])[:2]
+        snapshot = parse(capture(session, 'shuffle'))
+        snapshot.index = (index + 1) % len(self.questions)
+        found_index, found = session_snapshot.find_question(snapshot, self.questions)
+        self.assertEqual((found_index, found.id), (None, question.id))
+
+    def test_unusable_snapshots_are_ignored(self):
+        session = self.session()
+        self.play(session, [0])
+        record = capture(session, 'shuffle')
+        path = os.path.join(temp_dir(self), 'session.snapshot')
+        for data in (record[:-1], b'QSNP', b'x' * len(record)):
+            with open(path, 'wb') as f:
+                f.write(data)
+            self.assertIsNone(load(path))
+        with open(path, 'wb') as f:
+            f.write(record)
+        self.assertIsNotNone(load(path))
+        self.assertIsNone(load(path, max_age=-1))
+        self.assertIsNone(load(os.path.join(temp_dir(self), 'missing')))
+
+
+if __name__ == '__main__':
+    unittest.main()
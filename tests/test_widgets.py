@@ -0,0 +1,157 @@
+"""Shared widgets and their caches, drawn in an off-screen window.
+
+    python -m unittest discover tests
+"""
+import unittest
+
+from support import kivy_window
+
+
+def setUpModule():
+    kivy_window()
+
+
+class WidgetPoolTest(unittest.TestCase):
+    def setUp(self):
+        from widgets import WidgetPool
+        self.pool = WidgetPool()
+
+    def test_released_widgets_are_reused(self):
+        from kivy.uix.label import Label
+        self.pool.register('label', Label)
+        first = self.pool.acquire('label')
+        self.pool.release('label', first)
+        self.pool.release('label', first)
+        self.assertIs(self.pool.acquire('label'), first)
+        self.assertIsNot(self.pool.acquire('label'), first)
+        self.assertEqual(self.pool.stats(), {'label': {'hits': 1, 'misses': 2, 'free': 0}})
+
+    def test_modals_return_once_closed(self):
+        from kivy.uix.modalview import ModalView
+        self.pool.register('modal', ModalView)
+        modal = self.pool.acquire('modal')
+        modal.open(animation=False)
+        self.assertEqual(self.pool.stats()['modal']['free'], 0)
+        modal.dismiss(animation=False)
+        self.assertIs(self.pool.acquire('modal'), modal)
+
+
+class PressAnimatorTest(unittest.TestCase):
+    def test_one_driver_for_every_pressed_button(self):
+        from widgets import PressAnimator, RoundedButton
+        animator = PressAnimator(duration=0.1)
+        self.addCleanup(animator.tick_event.cancel)
+        first, second = RoundedButton(), RoundedButton()
+        animator.press(first)
+        animator.tick(0.1)
+        animator.press(second)
+        self.assertEqual(animator.active_tweens, 2)
+        self.assertEqual(list(first.button_color), list(first.PRESSED_COLOR))
+        self.assertEqual(list(second.button_color), list(second.NORMAL_COLOR))
+
+        animator.tick(0.05)
+        for value, expected in zip(first.button_color, [0.15, 0.5, 0.7, 1]):
+            self.assertAlmostEqual(value, expected)
+        animator.tick(0.05)
+        self.assertEqual(animator.active_tweens, 1)
+        self.assertEqual(list(first.button_color), list(first.NORMAL_COLOR))
+        animator.tick(0.2)
+        self.assertEqual(animator.active_tweens, 0)
+
+    def test_press_restarts_a_running_tween(self):
+        from widgets import PressAnimator, RoundedButton
+        animator = PressAnimator(duration=0.1)
+        self.addCleanup(animator.tick_event.cancel)
+        button = RoundedButton()
+        animator.press(button)
+        animator.tick(0.15)
+        animator.press(button)
+        self.assertEqual(button.tween_state[0], 0.0)
+        self.assertEqual(animator.active_tweens, 1)
+
+
+class LazyScreenManagerTest(unittest.TestCase):
+    def test_screens_are_built_on_first_use(self):
+        from kivy.uix.screenmanager import Screen
+        from widgets import LazyScreenManager
+        built = []
+
+        def factory():
+            built.append(Screen(name='quiz'))
+            return built[-1]
+
+        manager = LazyScreenManager()
+        manager.add_widget(Screen(name='language'))
+        manager.register('quiz', factory)
+        self.assertTrue(manager.has_screen('quiz'))
+        self.assertEqual(built, [])
+        manager.current = 'quiz'
+        self.assertEqual(len(built), 1)
+        self.assertIs(manager.get_screen('quiz'), built[0])
+        self.assertEqual(len(built), 1)
+
+
+class TextureCacheTest(unittest.TestCase):
+    def setUp(self):
+        from widgets import text_cache
+        self.cache = text_cache
+        self.cache.context_lost()
+
+    def label(self, text, **kwargs):
+        from widgets import CachedLabel
+        label = CachedLabel(text=text, font_size=20, **kwargs)
+        label.texture_update()
+        return label
+
+    def test_same_text_shares_a_texture(self):
+        first = self.label('pointer')
+        texture = first.texture
+        hits = self.cache.hits
+        second = self.label('pointer')
+        self.assertIs(second.texture, texture)
+        self.assertEqual(self.cache.hits, hits + 1)
+        self.assertIsNot(self.label('pointer', bold=True).texture, texture)
+
+        # A new text of the same size doesn't draw over the shared texture
+        first.text = 'pointee'
+        first.texture_update()
+        self.assertIsNot(first.texture, texture)
+        self.assertIs(self.label('pointer').texture, texture)
+
+    def test_prerendered_text_is_a_hit(self):
+        label = self.label('question 1')
+        self.cache.prerender(label, 'question 2')
+        hits = self.cache.hits
+        label.text = 'question 2'
+        label.texture_update()
+        self.assertEqual(self.cache.hits, hits + 1)
+        self.assertEqual(label.texture_size, self.label('question 2').texture_size)
+
+    def test_bounded_by_texture_memory(self):
+        from widgets import TextureCache
+
+        class Texture:
+            width, height = 16, 16
+
+        cache = TextureCache(max_bytes=3 * 16 * 16 * 4)
+        for key in 'abcd':
+            cache.put(key, Texture(), {}, {}, False)
+        cache.get('b')
+        cache.put('e', Texture(), {}, {}, False)
+        self.assertEqual(list(cache.entries), ['d', 'b', 'e'])
+        self.assertEqual(cache.bytes, 3 * 16 * 16 * 4)
+
+    def test_labels_render_again_after_the_context_is_lost(self):
+        from kivy.clock import Clock
+        label = self.label('reloaded')
+        texture = label.texture
+        self.cache.context_lost()
+        self.assertEqual(self.cache.stats()['entries'], 0)
+        Clock.tick()
+        self.assertIsNot(label.texture, texture)
+        self.assertEqual(label.texture_size, list(texture.size))
+        self.assertIs(self.label('reloaded').texture, label.texture)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,306 @@
+"""Widgets shared by the app's screens"""
+import weakref
+from collections import OrderedDict
+
+from kivy.clock import Clock
+from kivy.graphics import Color, RoundedRectangle
+from kivy.properties import ColorProperty
+from kivy.uix.button import Button
+from kivy.uix.label import Label
+from kivy.uix.screenmanager import ScreenManager
+from kivy.utils import get_hex_from_color
+
+class PressAnimator:
+    """Tweens the color of every pressed RoundedButton from one Clock callback.
+
+    Each button keeps its tween state in a list allocated with the button,
+    so a press only resets that state and adds the button to the active
+    set; a new press simply restarts the button's running tween.
+    """
+    def __init__(self, duration=0.1):
+        self.duration = duration
+        self.active = set()
+        self.finished = []
+        self.rgba = [0, 0, 0, 0]
+        self.tick_event = Clock.create_trigger(self.tick, 0, interval=True)
+    
+    @property
+    def active_tweens(self):
+        return len(self.active)
+    
+    def press(self, button):
+        state = button.tween_state
+        state[0] = 0.0  # Elapsed time
+        for i in range(4):
+            state[i + 1] = button.button_color[i]  # Color at the time of the press
+        if not self.active:
+            self.tick_event()
+        self.active.add(button)
+    
+    def tick(self, dt):
+        rgba = self.rgba
+        for button in self.active:
+            state = button.tween_state
+            state[0] += dt
+            progress = state[0] / self.duration
+            
+            # Darken towards the pressed color, then fade back to normal
+            if progress < 1:
+                for i in range(4):
+                    rgba[i] = state[i + 1] + (button.PRESSED_COLOR[i] - state[i + 1]) * progress
+            elif progress < 2:
+                for i in range(4):
+                    rgba[i] = button.PRESSED_COLOR[i] + (button.NORMAL_COLOR[i] - button.PRESSED_COLOR[i]) * (progress - 1)
+            else:
+                for i in range(4):
+                    rgba[i] = button.NORMAL_COLOR[i]
+                self.finished.append(button)
+            button.button_color = rgba
+        
+        for button in self.finished:
+            self.active.discard(button)
+        self.finished.clear()
+        if not self.active:
+            self.tick_event.cancel()
+
+press_animator = PressAnimator()
+
+def _freeze(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+class TextureCache:
+    """LRU cache of rendered label textures, bounded by texture memory.
+    
+    Entries are keyed by the text plus everything that affects how it is
+    rendered (font, size, color, alignment, wrapping width), so a label
+    showing text it has shown before skips markup parsing and rendering.
+    
+    Cached textures are detached from the core labels that rendered them,
+    so nothing can refill them when the GL context is lost (Android pause,
+    window recreated): the cache is emptied then, and the labels showing
+    a cached texture render their text again.
+    """
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.entries = OrderedDict()  # key -> (texture, refs, anchors, is_shortened, bytes)
+        self.hits = 0
+        self.misses = 0
+        self.scratch = {}  # core label class -> label used by prerender
+        self.labels = weakref.WeakSet()  # labels showing a cached texture
+        self.watching = False
+    
+    def key(self, text, markup, disabled, usersize, options):
+        return (text, markup, disabled, _freeze(usersize),
+                tuple((name, _freeze(value)) for name, value in sorted(options.items()) if name != 'text'))
+    
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+    
+    def watch_context(self):
+        if not self.watching:
+            from kivy.graphics.context import get_context
+            get_context().add_reload_observer(self.context_lost, before=True)
+            self.watching = True
+    
+    def context_lost(self, *args):
+        self.entries.clear()
+        self.bytes = 0
+        self.scratch.clear()
+        # Render again once the context is back
+        Clock.schedule_once(self.rerender)
+    
+    def rerender(self, dt):
+        labels = list(self.labels)
+        self.labels.clear()
+        for label in labels:
+            label.texture_update()
+    
+    def put(self, key, texture, refs, anchors, is_shortened):
+        self.watch_context()
+        size = texture.width * texture.height * 4  # RGBA
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.bytes -= old[-1]
+        self.entries[key] = (texture, refs, anchors, is_shortened, size)
+        self.bytes += size
+        while self.bytes > self.max_bytes and len(self.entries) > 1:
+            self.bytes -= self.entries.popitem(last=False)[1][-1]
+    
+    def prerender(self, label, text, disabled=False):
+        """Render ``text`` as ``label`` would show it, without touching ``label``"""
+        core = label._label
+        options = dict(core.options)
+        if label.disabled and not disabled:
+            options['color'] = label.color
+            options['outline_color'] = label.outline_color
+        key = self.key(text, label.markup, disabled, core.usersize, options)
+        if key in self.entries or not text:
+            return
+        
+        scratch = self.scratch.get(core.__class__)
+        if scratch is None:
+            scratch = self.scratch[core.__class__] = core.__class__()
+        scratch.options = options
+        scratch.usersize = core.usersize
+        if label.markup:
+            color = label.disabled_color if disabled else label.color
+            scratch.text = f'[color={get_hex_from_color(color)}]{text}[/color]'
+        else:
+            scratch.text = text
+        scratch.refresh()
+        texture = scratch.texture
+        if texture is not None and texture.width > 1 and texture.height > 1:
+            texture.bind()  # Fill it now, then give the core label a new one next time
+            scratch.texture = None
+            refs = scratch.refs if label.markup else {}
+            anchors = scratch.anchors if label.markup else {}
+            self.put(key, texture, refs, anchors, scratch.is_shortened)
+    
+    def stats(self):
+        return {'entries': len(self.entries), 'bytes': self.bytes, 'hits': self.hits, 'misses': self.misses}
+
+text_cache = TextureCache()
+
+class CachedTextureMixin:
+    """Label mixin that reuses textures from ``text_cache``"""
+    def texture_update(self, *largs):
+        text = self.text
+        if self.halign == 'justify' or self.strip:
+            text = text.strip()
+        if not text:
+            return super().texture_update(*largs)
+        
+        core = self._label
+        key = text_cache.key(text, self.markup, self.disabled, core.usersize, core.options)
+        entry = text_cache.get(key)
+        if entry is not None:
+            texture, refs, anchors, is_shortened, size = entry
+            text_cache.labels.add(self)
+            self.texture = texture
+            self.texture_size = list(texture.size)
+            self.is_shortened = is_shortened
+            if self.markup:
+                self.refs = refs
+                self.anchors = anchors
+            return
+        
+        super().texture_update(*largs)
+        texture = self.texture
+        if texture is not None and texture.width > 1 and texture.height > 1:
+            # The core label would re-render into this texture if the next
+            # text has the same size, so fill it now and detach it
+            texture.bind()
+            core.texture = None
+            text_cache.labels.add(self)
+            text_cache.put(key, texture, self.refs, self.anchors, self.is_shortened)
+
+class CachedLabel(CachedTextureMixin, Label):
+    """Label whose rendered texts are kept in ``text_cache``"""
+
+class RoundedButton(Button):
+    """Custom button with rounded corners"""
+    NORMAL_COLOR = (0.2, 0.6, 0.8, 1)
+    PRESSED_COLOR = (0.1, 0.4, 0.6, 1)
+    button_color = ColorProperty([0.2, 0.6, 0.8, 1])
+    
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # Elapsed time and starting color of this button's press tween
+        self.tween_state = [0.0, 0, 0, 0, 0]
+        self.background_normal = ''
+        self.background_color = (0, 0, 0, 0)  # Transparent background
+        self.color = (1, 1, 1, 1)
+        self.font_size = '18sp'
+        self.bold = False
+        self.size_hint = (None, None)
+        self.height = 50
+        self.width = 200
+        self.padding = (10, 10)
+        
+        with self.canvas.before:
+            self.bg_color = Color(rgba=self.button_color)
+            self.rect = RoundedRectangle(pos=self.pos, size=self.size, radius=[15])
+            
+        self.bind(pos=self.update_rect, size=self.update_rect, button_color=self.update_color)
+    
+    def update_rect(self, *args):
+        self.rect.pos = self.pos
+        self.rect.size = self.size
+        
+    def update_color(self, *args):
+        self.bg_color.rgba = self.button_color
+        
+    def on_press(self):
+        press_animator.press(self)
+
+class WidgetPool:
+    """Keeps built widgets around so dialogs are reused instead of rebuilt"""
+    def __init__(self):
+        self.factories = {}
+        self.free = {}
+        self.hits = {}
+        self.misses = {}
+    
+    def register(self, kind, factory):
+        self.factories[kind] = factory
+        self.free.setdefault(kind, [])
+        self.hits.setdefault(kind, 0)
+        self.misses.setdefault(kind, 0)
+    
+    def __contains__(self, kind):
+        return kind in self.factories
+    
+    def acquire(self, kind):
+        free = self.free[kind]
+        if free:
+            self.hits[kind] += 1
+            return free.pop()
+        
+        self.misses[kind] += 1
+        widget = self.factories[kind]()
+        from kivy.uix.modalview import ModalView
+        if isinstance(widget, ModalView):
+            # Modals return to the pool once they have fully closed
+            widget.fbind('_is_open', self.modal_closed, kind)
+        return widget
+    
+    def modal_closed(self, kind, widget, is_open):
+        if not is_open:
+            self.release(kind, widget)
+    
+    def release(self, kind, widget):
+        if widget not in self.free[kind]:
+            self.free[kind].append(widget)
+    
+    def stats(self):
+        return {
+            kind: {'hits': self.hits[kind], 'misses': self.misses[kind], 'free': len(self.free[kind])}
+            for kind in self.factories
+        }
+
+class LazyScreenManager(ScreenManager):
+    """ScreenManager that builds registered screens on first use"""
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.factories = {}
+    
+    def register(self, name, factory):
+        self.factories[name] = factory
+    
+    def get_screen(self, name):
+        factory = self.factories.pop(name, None)
+        if factory is not None:
+            self.add_widget(factory())
+        return super().get_screen(name)
+    
+    def has_screen(self, name):
+        return name in self.factories or super().has_screen(name)